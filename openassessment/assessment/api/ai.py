@@ -56,6 +56,53 @@ def assessment_is_finished(submission_uuid, requirements):
     return bool(get_latest_assessment(submission_uuid))
 
 
+def submitters_are_finished(submission_uuids, requirements):
+    """
+    Determine which submitters have finished their requirements for Example
+    Based Assessment. This is always all of them.
+
+    Args:
+        submission_uuids (list): The UUIDs of the submissions.
+        requirements (dict): Not used.
+
+    Returns:
+        set of the submission UUIDs.
+
+    """
+    return set(submission_uuids)
+
+
+def assessments_are_finished(submission_uuids, requirements):
+    """
+    Determine which submissions the AI has finished assessing, using a single query.
+
+    Args:
+        submission_uuids (list): The UUIDs of the submissions being graded.
+        requirements (dict): Not used.
+
+    Returns:
+        set of the submission UUIDs that have an AI assessment.
+
+    Raises:
+        AIGradingInternalError
+
+    """
+    try:
+        return set(
+            Assessment.objects.filter(
+                submission_uuid__in=submission_uuids,
+                score_type=AI_ASSESSMENT_TYPE,
+            ).values_list('submission_uuid', flat=True)
+        )
+    except DatabaseError as ex:
+        msg = (
+            u"An error occurred while retrieving AI graded assessments "
+            u"for {count} submissions: {ex}"
+        ).format(count=len(submission_uuids), ex=ex)
+        logger.exception(msg)
+        raise AIGradingInternalError(msg)
+
+
 def get_score(submission_uuid, requirements):
     """
     Generate a score based on a completed assessment for the given submission.
@@ -87,6 +87,79 @@ def get_grading_task_params(grading_workflow_uuid):
         raise AIGradingInternalError(msg)
 
 
+@dog_stats_api.timed('openassessment.assessment.ai.get_grading_batch_params')
+def get_grading_batch_params(grading_workflow_uuids):
+    """
+    Retrieve the essays, classifier set and algorithm ID
+    for a batch of grading workflows that share a classifier set.
+
+    Args:
+        grading_workflow_uuids (list of str): The UUIDs of the grading workflows.
+
+    Returns:
+        dict with keys:
+            * essays (dict): Maps the UUIDs of the workflows that are not yet complete
+                to the text of their essay submissions.
+            * classifier_set (dict): Maps criterion names to serialized classifiers.
+            * valid_scores (dict): Maps criterion names to a list of valid scores for that criterion.
+            * algorithm_id (unicode): ID of the algorithm used to perform training.
+        or None if every workflow in the batch is already complete.
+
+    Raises:
+        AIGradingRequestError
+        AIGradingInternalError
+
+    """
+    try:
+        workflows = list(
+            AIGradingWorkflow.objects.filter(
+                uuid__in=grading_workflow_uuids, completed_at__isnull=True
+            ).select_related('classifier_set')
+        )
+    except DatabaseError as ex:
+        msg = (
+            u"An unexpected error occurred while retrieving the "
+            u"AI grading workflows with uuids {uuids}: {ex}"
+        ).format(uuids=grading_workflow_uuids, ex=ex)
+        logger.exception(msg)
+        raise AIGradingInternalError(msg)
+
+    if not workflows:
+        return None
+
+    classifier_set_ids = set(workflow.classifier_set_id for workflow in workflows)
+    if None in classifier_set_ids:
+        msg = (
+            u"AI grading workflows in the batch {} have no classifier set, but were scheduled for grading"
+        ).format(grading_workflow_uuids)
+        logger.exception(msg)
+        raise AIGradingInternalError(msg)
+    if len(classifier_set_ids) > 1:
+        msg = (
+            u"AI grading workflows in the batch {} do not share a classifier set"
+        ).format(grading_workflow_uuids)
+        raise AIGradingRequestError(msg)
+
+    classifier_set = workflows[0].classifier_set
+    try:
+        return {
+            'essays': {workflow.uuid: workflow.essay_text for workflow in workflows},
+            'classifier_set': classifier_set.classifier_data_by_criterion,
+            'algorithm_id': workflows[0].algorithm_id,
+            'valid_scores': classifier_set.valid_scores_by_criterion,
+        }
+    except (
+        DatabaseError, ClassifierSerializeError, IncompleteClassifierSet,
+        ValueError, IOError, HTTPException
+    ) as ex:
+        msg = (
+            u"An unexpected error occurred while retrieving "
+            u"classifiers for the grading workflows with UUIDs {uuids}: {ex}"
+        ).format(uuids=grading_workflow_uuids, ex=ex)
+        logger.exception(msg)
+        raise AIGradingInternalError(msg)
+
+
 @dog_stats_api.timed('openassessment.assessment.ai.create_assessment')
 def create_assessment(grading_workflow_uuid, criterion_scores):
     """
@@ -150,6 +223,48 @@ def create_assessment(grading_workflow_uuid, criterion_scores):
     assessment_complete_signal.send(sender=None, submission_uuid=workflow.submission_uuid)
 
 
+@dog_stats_api.timed('openassessment.assessment.ai.create_assessments')
+def create_assessments(criterion_scores_by_workflow):
+    """
+    Create AI assessments for a batch of grading workflows (complete the AI grading tasks).
+
+    Workflows that have already been marked complete are skipped.
+
+    Args:
+        criterion_scores_by_workflow (dict): Maps grading workflow UUIDs to
+            dictionaries mapping criteria names to integer scores.
+
+    Returns:
+        None
+
+    Raises:
+        AIGradingInternalError
+
+    """
+    try:
+        workflows = list(AIGradingWorkflow.objects.filter(
+            uuid__in=criterion_scores_by_workflow.keys(), completed_at__isnull=True
+        ))
+        workflows = AIGradingWorkflow.complete_many(workflows, criterion_scores_by_workflow)
+        logger.info((
+            u"Created assessments for AI grading workflows with UUIDs {workflow_uuids}"
+        ).format(workflow_uuids=[workflow.uuid for workflow in workflows]))
+    except (DatabaseError, InvalidRubricSelection) as ex:
+        msg = (
+            u"An unexpected error occurred while creating the assessments "
+            u"for the AI grading workflows with uuids {uuids}: {ex}"
+        ).format(uuids=criterion_scores_by_workflow.keys(), ex=ex)
+        logger.exception(msg)
+        raise AIGradingInternalError(msg)
+
+    # Fire a single signal to update the workflow API for every assessment that was created
+    if workflows:
+        from openassessment.assessment.signals import assessments_complete_signal
+        assessments_complete_signal.send(
+            sender=None, submission_uuids=[workflow.submission_uuid for workflow in workflows]
+        )
+
+
 @dog_stats_api.timed('openassessment.assessment.ai.get_training_task_params')
 def get_training_task_params(training_workflow_uuid):
     """
@@ -7,17 +7,19 @@ the workflow for a given submission.
 import logging
 from django.utils import timezone
 from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Case, IntegerField, F, Sum, Value, When
 from dogapi import dog_stats_api
 
 from openassessment.assessment.models import (
     Assessment, AssessmentFeedback, AssessmentPart,
-    InvalidRubricSelection, PeerWorkflow, PeerWorkflowItem,
+    InvalidRubricSelection, PeerWorkflow, PeerWorkflowItem, PeerWorkflowQueueEntry,
 )
 from openassessment.assessment.serializers import (
     AssessmentFeedbackSerializer, RubricSerializer,
     full_assessment_dict, rubric_from_dict, serialize_assessments,
     InvalidRubric
 )
+from openassessment.assessment.signals import assessment_created_signal
 from openassessment.assessment.errors import (
     PeerAssessmentRequestError, PeerAssessmentWorkflowError, PeerAssessmentInternalError
 )
@@ -94,6 +96,78 @@ def assessment_is_finished(submission_uuid, requirements):
     return scored_items.count() >= requirements["must_be_graded_by"]
 
 
+def submitters_are_finished(submission_uuids, requirements):
+    """
+    Check which submitters have made the required number of assessments.
+
+    This is the bulk equivalent of `submitter_is_finished`, counting
+    the assessments for all the submissions with a single grouped query.
+
+    Args:
+        submission_uuids (list): The UUIDs of the submissions being tracked.
+        requirements (dict): Dictionary with the key "must_grade" indicating
+            the required number of submissions the student must grade.
+
+    Returns:
+        set of the submission UUIDs whose submitters are finished.
+
+    """
+    if requirements is None:
+        return set()
+
+    workflows = PeerWorkflow.objects.filter(submission_uuid__in=submission_uuids)
+    finished = set(workflows.filter(completed_at__isnull=False).values_list('submission_uuid', flat=True))
+    newly_finished = set(
+        workflows.filter(completed_at__isnull=True).annotate(
+            num_graded=Sum(Case(
+                When(graded__assessment__isnull=False, then=Value(1)),
+                default=Value(0), output_field=IntegerField()
+            ))
+        ).filter(
+            num_graded__gte=requirements["must_grade"]
+        ).values_list('submission_uuid', flat=True)
+    )
+    if newly_finished:
+        PeerWorkflow.objects.filter(submission_uuid__in=newly_finished).update(completed_at=timezone.now())
+    return finished | newly_finished
+
+
+def assessments_are_finished(submission_uuids, requirements):
+    """
+    Check which submissions have received enough assessments to get a score.
+
+    This is the bulk equivalent of `assessment_is_finished`, counting
+    the assessments for all the submissions with a single grouped query.
+
+    Args:
+        submission_uuids (list): The UUIDs of the submissions being tracked.
+        requirements (dict): Dictionary with the key "must_be_graded_by"
+            indicating the required number of assessments the student
+            must receive to get a score.
+
+    Returns:
+        set of the submission UUIDs that have been fully assessed.
+
+    """
+    if requirements is None:
+        return set()
+
+    return set(
+        PeerWorkflow.objects.filter(submission_uuid__in=submission_uuids).annotate(
+            num_scored=Sum(Case(
+                When(
+                    graded_by__assessment__submission_uuid=F('submission_uuid'),
+                    graded_by__assessment__score_type=PEER_TYPE,
+                    then=Value(1)
+                ),
+                default=Value(0), output_field=IntegerField()
+            ))
+        ).filter(
+            num_scored__gte=requirements["must_be_graded_by"]
+        ).values_list('submission_uuid', flat=True)
+    )
+
+
 def on_start(submission_uuid):
     """Create a new peer workflow for a student item and submission.
 
@@ -121,6 +195,7 @@ def on_start(submission_uuid):
             submission_uuid=submission_uuid
         )
         workflow.save()
+        PeerWorkflowQueueEntry.refresh(workflow)
     except IntegrityError:
         # If we get an integrity error, it means someone else has already
         # created a workflow for this submission, so we don't need to do anything.
@@ -168,27 +243,28 @@ def get_score(submission_uuid, requirements):
         assessment__score_type=PEER_TYPE
     ).order_by('-assessment')
 
-    submission_finished = items.count() >= requirements["must_be_graded_by"]
+    # Retrieve only the IDs of the items we will use for the score,
+    # which also tells us whether the submission has received enough assessments.
+    must_be_graded_by = requirements["must_be_graded_by"]
+    scored_items = list(items.values_list('id', 'assessment')[:must_be_graded_by])
+    submission_finished = len(scored_items) >= must_be_graded_by
     if not submission_finished:
         return None
 
-    # Unfortunately, we cannot use update() after taking a slice,
-    # so we need to update the and save the items individually.
-    # One might be tempted to first query for the first n assessments,
-    # then select items that have those assessments.
-    # However, this generates a SQL query with a LIMIT in a subquery,
-    # which is not supported by some versions of MySQL.
-    # Although this approach generates more database queries, the number is likely to
-    # be relatively small (at least 1 and very likely less than 5).
-    for scored_item in items[:requirements["must_be_graded_by"]]:
-        scored_item.scored = True
-        scored_item.save()
+    # Mark the items as scored with a single query.  We cannot use update()
+    # after taking a slice, and selecting the items with a subquery would
+    # generate a LIMIT in a subquery, which is not supported by some versions
+    # of MySQL, so we filter by the IDs we already retrieved instead.
+    PeerWorkflowItem.objects.filter(
+        id__in=[item_id for item_id, __ in scored_items]
+    ).update(scored=True)
 
+    latest_assessment = Assessment.objects.select_related('rubric').get(pk=scored_items[0][1])
     return {
         "points_earned": sum(
-            get_assessment_median_scores(submission_uuid).values()
+            _median_scores_for_workflow(workflow).values()
         ),
-        "points_possible": items[0].assessment.points_possible,
+        "points_possible": latest_assessment.points_possible,
     }
 
 
@@ -272,6 +348,9 @@ def create_assessment(
         )
 
         _log_assessment(assessment, scorer_workflow)
+        assessment_created_signal.send(
+            sender=None, submission_uuid=peer_submission_uuid, scorer_submission_uuid=scorer_submission_uuid
+        )
         return full_assessment_dict(assessment)
     except PeerWorkflow.DoesNotExist:
         message = (
@@ -425,10 +504,7 @@ def get_assessment_median_scores(submission_uuid):
     """
     try:
         workflow = PeerWorkflow.objects.get(submission_uuid=submission_uuid)
-        items = workflow.graded_by.filter(scored=True)
-        assessments = [item.assessment for item in items]
-        scores = Assessment.scores_by_criterion(assessments)
-        return Assessment.get_median_score_dict(scores)
+        return _median_scores_for_workflow(workflow)
     except DatabaseError:
         error_message = (
             u"Error getting assessment median scores for submission {uuid}"
@@ -437,6 +513,25 @@ def get_assessment_median_scores(submission_uuid):
         raise PeerAssessmentInternalError(error_message)
 
 
+def _median_scores_for_workflow(workflow):
+    """
+    Get the median score for each rubric criterion from the scored
+    assessments of a peer workflow, using one query for the scored
+    items and one query for the points of all their assessment parts.
+
+    Args:
+        workflow (PeerWorkflow): The peer workflow of the submission being scored.
+
+    Returns:
+        dict: A dictionary of rubric criterion names,
+        with a median score of the peer assessments.
+
+    """
+    assessment_ids = workflow.graded_by.filter(scored=True).values_list('assessment', flat=True)
+    scores = Assessment.scores_by_criterion_for_ids(assessment_ids, workflow.submission_uuid)
+    return Assessment.get_median_score_dict(scores)
+
+
 def has_finished_required_evaluating(submission_uuid, required_assessments):
     """Check if a student still needs to evaluate more submissions
 
@@ -735,6 +830,7 @@ def create_peer_workflow(submission_uuid):
             submission_uuid=submission_uuid
         )
         workflow.save()
+        PeerWorkflowQueueEntry.refresh(workflow)
     except IntegrityError:
         # If we get an integrity error, it means someone else has already
         # created a workflow for this submission, so we don't need to do anything.
@@ -828,7 +924,7 @@ def set_assessment_feedback(feedback_dict):
         # If we receive an integrity error, assume that someone else is trying to create
         # another feedback model for this submission, and raise an exception.
         if submission_uuid:
-            feedback, created = AssessmentFeedback.objects.get_or_create(submission_uuid=submission_uuid)
+            feedback, __ = AssessmentFeedback.objects.get_or_create(submission_uuid=submission_uuid)
         else:
             error_message = u"An error occurred creating assessment feedback: bad or missing submission_uuid."
             logger.error(error_message)
@@ -839,8 +935,10 @@ def set_assessment_feedback(feedback_dict):
             feedback.feedback_text = feedback_text
 
         # Save the feedback model.  We need to do this before setting m2m relations.
-        if created or feedback_text is not None:
-            feedback.save()
+        # The feedback is saved even if only its options change,
+        # so that its modification time is updated.
+        feedback.modified_at = timezone.now()
+        feedback.save()
 
         # Associate the feedback with selected options
         feedback.add_options(selected_options)
@@ -988,6 +1086,9 @@ def on_cancel(submission_uuid):
         if workflow:
             workflow.cancelled_at = timezone.now()
             workflow.save()
+
+            # Remove the submission from the peer assessment queue and release its leases
+            PeerWorkflowQueueEntry.refresh(workflow)
     except (PeerAssessmentWorkflowError, DatabaseError):
         error_message = (
             u"An internal error occurred while cancelling the peer"
@@ -12,6 +12,7 @@ from openassessment.assessment.serializers import (
 from openassessment.assessment.models import (
     Assessment, AssessmentPart, InvalidRubricSelection
 )
+from openassessment.assessment.signals import assessment_created_signal
 from openassessment.assessment.errors import (
     SelfAssessmentRequestError, SelfAssessmentInternalError
 )
@@ -62,6 +63,42 @@ def assessment_is_finished(submission_uuid, requirements):
     return submitter_is_finished(submission_uuid, requirements)
 
 
+def submitters_are_finished(submission_uuids, requirements):
+    """
+    Check which submissions have been self-assessed, using a single query.
+
+    Args:
+        submission_uuids (list): The unique identifiers of the submissions.
+        requirements (dict): Not used; there are currently no requirements
+            for a self-assessment.
+
+    Returns:
+        set of the submission UUIDs whose submitters have assessed their answer.
+
+    """
+    return set(
+        Assessment.objects.filter(
+            score_type=SELF_TYPE, submission_uuid__in=submission_uuids
+        ).values_list('submission_uuid', flat=True)
+    )
+
+
+def assessments_are_finished(submission_uuids, requirements):
+    """
+    Check which submissions have a completed self-assessment.  For self-assessment,
+    this function is synonymous with submitters_are_finished.
+
+    Args:
+        submission_uuids (list): The unique identifiers of the submissions.
+        requirements (dict): Not used.
+
+    Returns:
+        set of the submission UUIDs whose assessment is complete.
+
+    """
+    return submitters_are_finished(submission_uuids, requirements)
+
+
 def get_score(submission_uuid, requirements):
     """
     Get the score for this particular assessment.
@@ -162,6 +199,9 @@ def create_assessment(
             scored_at
         )
         _log_assessment(assessment, submission)
+        assessment_created_signal.send(
+            sender=None, submission_uuid=submission_uuid, scorer_submission_uuid=submission_uuid
+        )
     except InvalidRubric as ex:
         msg = "Invalid rubric definition: " + str(ex)
         logger.warning(msg, exc_info=True)
@@ -9,6 +9,7 @@ Public interface for student training:
 import logging
 from django.utils.translation import ugettext as _
 from django.db import DatabaseError
+from django.db.models import Case, IntegerField, Sum, Value, When
 from submissions import api as sub_api
 from openassessment.assessment.models import StudentTrainingWorkflow, InvalidRubricSelection
 from openassessment.assessment.serializers import (
@@ -44,12 +45,7 @@ def submitter_is_finished(submission_uuid, requirements):   # pylint:disable=W06
     if requirements is None:
         return False
 
-    try:
-        num_required = int(requirements['num_required'])
-    except KeyError:
-        raise StudentTrainingRequestError(u'Requirements dict must contain "num_required" key')
-    except ValueError:
-        raise StudentTrainingRequestError(u'Number of requirements must be an integer')
+    num_required = _num_required(requirements)
 
     try:
         workflow = StudentTrainingWorkflow.objects.get(submission_uuid=submission_uuid)
@@ -59,6 +55,57 @@ def submitter_is_finished(submission_uuid, requirements):   # pylint:disable=W06
         return workflow.num_completed >= num_required
 
 
+def submitters_are_finished(submission_uuids, requirements):
+    """
+    Check which students have correctly assessed all the training example responses.
+
+    This is the bulk equivalent of `submitter_is_finished`, counting
+    the completed examples for all the submissions with a single grouped query.
+
+    Args:
+        submission_uuids (list): The UUIDs of the students' submissions.
+        requirements (dict): Must contain "num_required" indicating
+            the number of examples the student must assess.
+
+    Returns:
+        set of the submission UUIDs whose submitters are finished.
+
+    Raises:
+        StudentTrainingRequestError
+
+    """
+    if requirements is None:
+        return set()
+
+    num_required = _num_required(requirements)
+    return set(
+        StudentTrainingWorkflow.objects.filter(submission_uuid__in=submission_uuids).annotate(
+            num_items_completed=Sum(Case(
+                When(items__completed_at__isnull=False, then=Value(1)),
+                default=Value(0), output_field=IntegerField()
+            ))
+        ).filter(
+            num_items_completed__gte=num_required
+        ).values_list('submission_uuid', flat=True)
+    )
+
+
+def _num_required(requirements):
+    """
+    Retrieve the number of examples the student must assess from the requirements.
+
+    Raises:
+        StudentTrainingRequestError
+
+    """
+    try:
+        return int(requirements['num_required'])
+    except KeyError:
+        raise StudentTrainingRequestError(u'Requirements dict must contain "num_required" key')
+    except ValueError:
+        raise StudentTrainingRequestError(u'Number of requirements must be an integer')
+
+
 def on_start(submission_uuid):
     """
     Creates a new student training workflow.
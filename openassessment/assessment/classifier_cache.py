@@ -0,0 +1,278 @@
+"""
+Shared on-disk cache for trained classifiers.
+
+Every worker process on a host shares one cache directory, so a classifier
+downloaded by one process can be read by all the others (and by processes
+started after the first one dies) without another trip to S3.
+
+Entries are files named by a hash of their key.  Classifier data is stored
+under a hash of its contents, so an entry never needs to be updated, and
+small index entries map other keys (such as a classifier set) to the
+content hashes of the classifiers they refer to.
+
+* Writes go to a temporary file in the cache directory that is renamed into
+  place, so readers never see a partial entry, even if the writer dies.
+* Classifiers downloaded from storage are streamed into the cache in chunks,
+  hashing them as they are written, so they are never held in memory.
+* Reads memory-map the entry and touch its modification time, which the
+  cache uses to track how recently each entry was used.
+* After each write, the least recently used entries are evicted until
+  the total size of the directory fits within the configured limit.
+
+The cache is best-effort: errors reading or writing the directory are
+logged and treated as cache misses.  Hits, misses and the number of bytes
+read and written are reported to DataDog.
+"""
+from hashlib import sha1
+import errno
+import logging
+import mmap
+import os
+import tempfile
+from dogapi import dog_stats_api
+
+
+logger = logging.getLogger(__name__)
+
+# Temporary files are created with this prefix, so eviction can skip them
+TEMP_PREFIX = ".tmp-"
+
+# Files are copied into the cache in chunks of this size
+READ_CHUNK_SIZE = 64 * 1024
+
+METRIC_PREFIX = 'openassessment.assessment.classifier_cache'
+
+
+class ClassifierFileCache(object):
+    """
+    Content-addressed file cache, bounded by the total size of its entries.
+    """
+
+    def __init__(self, location, max_size):
+        """
+        Args:
+            location (unicode): The cache directory, created if necessary.
+            max_size (int): The maximum total size (in bytes) of the entries.
+        """
+        self.location = location
+        self.max_size = max_size
+
+    @staticmethod
+    def content_key(data):
+        """
+        Return the key under which data is stored by its contents.
+
+        Args:
+            data (str): The data to store.
+
+        Returns:
+            str
+
+        """
+        return sha1(data).hexdigest()
+
+    def load(self, key, parse):
+        """
+        Memory-map a cache entry and parse it.
+
+        Args:
+            key (unicode): The key of the entry.
+            parse (callable): Called with a buffer holding the entry's
+                contents; its return value is returned.  The buffer is only
+                valid until `parse` returns.
+
+        Returns:
+            The value returned by `parse`, or None if the entry is not cached.
+
+        Raises:
+            Any exception raised by `parse`.
+
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry_file:
+                size = os.fstat(entry_file.fileno()).st_size
+                # Empty files cannot be memory-mapped
+                buf = mmap.mmap(entry_file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else ""
+        except (IOError, OSError, mmap.error) as ex:
+            if getattr(ex, 'errno', None) != errno.ENOENT:
+                logger.exception(u"Could not read classifier cache entry {path}".format(path=path))
+            dog_stats_api.increment(METRIC_PREFIX + '.miss')
+            return None
+
+        try:
+            value = parse(buf)
+        finally:
+            if size > 0:
+                buf.close()
+
+        self._touch(path)
+        dog_stats_api.increment(METRIC_PREFIX + '.hit')
+        dog_stats_api.increment(METRIC_PREFIX + '.bytes_read', value=size)
+        return value
+
+    def put(self, key, data):
+        """
+        Atomically write a cache entry, then evict the least recently
+        used entries if the cache is over its size limit.
+
+        Entries larger than the size limit are not cached.
+
+        Args:
+            key (unicode): The key of the entry.
+            data (str): The contents of the entry.
+
+        Returns:
+            bool: Whether the entry was written.
+
+        """
+        if len(data) > self.max_size:
+            return False
+
+        try:
+            self._makedirs()
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.location)
+            try:
+                with os.fdopen(fd, 'wb') as temp_file:
+                    temp_file.write(data)
+                    temp_file.flush()
+                    os.fsync(temp_file.fileno())
+                os.rename(temp_path, self._path(key))
+            except:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError):
+            logger.exception(u"Could not write classifier cache entry for key {key}".format(key=key))
+            return False
+
+        dog_stats_api.increment(METRIC_PREFIX + '.bytes_written', value=len(data))
+        self._evict()
+        return True
+
+    def put_file(self, fileobj):
+        """
+        Atomically copy a file into the cache, in chunks, under the key
+        of its contents, then evict the least recently used entries
+        if the cache is over its size limit.
+
+        Files larger than the size limit are not cached, and are
+        only read until they exceed the limit.
+
+        Args:
+            fileobj (file-like): Supports `read(size)`.
+
+        Returns:
+            str or None: The key of the entry (see `content_key`),
+                or None if the entry was not written.
+
+        """
+        digest = sha1()
+        size = 0
+        try:
+            self._makedirs()
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.location)
+            try:
+                with os.fdopen(fd, 'wb') as temp_file:
+                    for chunk in iter(lambda: fileobj.read(READ_CHUNK_SIZE), ''):
+                        size += len(chunk)
+                        if size > self.max_size:
+                            break
+                        digest.update(chunk)
+                        temp_file.write(chunk)
+                    temp_file.flush()
+                    os.fsync(temp_file.fileno())
+                if size > self.max_size:
+                    os.remove(temp_path)
+                    return None
+                key = digest.hexdigest()
+                os.rename(temp_path, self._path(key))
+            except:
+                self._remove(temp_path)
+                raise
+        except (IOError, OSError):
+            logger.exception(u"Could not copy classifier data into the cache")
+            return None
+
+        dog_stats_api.increment(METRIC_PREFIX + '.bytes_written', value=size)
+        self._evict()
+        return key
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        for name in self._names():
+            self._remove(os.path.join(self.location, name))
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache fits its size limit.
+        Other processes may be evicting at the same time, so entries that
+        have already been removed are skipped.
+        """
+        entries = []
+        total_size = 0
+        for name in self._names():
+            if name.startswith(TEMP_PREFIX):
+                continue
+            path = os.path.join(self.location, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for __, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def _path(self, key):
+        """
+        Return the path of the file for a cache entry.
+        """
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return os.path.join(self.location, sha1(key).hexdigest())
+
+    def _names(self):
+        """
+        Return the names of the files in the cache directory.
+        """
+        try:
+            return os.listdir(self.location)
+        except OSError:
+            return []
+
+    def _makedirs(self):
+        """
+        Create the cache directory if it does not already exist.
+        """
+        try:
+            os.makedirs(self.location)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def _touch(path):
+        """
+        Mark an entry as recently used.
+        """
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        """
+        Remove a file, ignoring files that have already been removed.
+        """
+        try:
+            os.remove(path)
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                logger.exception(u"Could not remove classifier cache entry {path}".format(path=path))
@@ -0,0 +1,344 @@
+"""
+Binary container format for storing trained classifiers.
+
+Classifiers used to be stored as JSON, and the classifiers trained by EASE are
+JSON dictionaries of base64-encoded pickles, so a third of each file was
+base64 overhead and reading one meant holding the whole file in memory as a
+string before parsing it.  The container stores each top-level field of a
+classifier dictionary as a length-prefixed record, with the fields that the
+algorithm declares binary (base64-encoded strings) stored as the raw bytes
+they encode.  The records are optionally compressed with zlib, and are read
+incrementally from a file-like object (such as a Django `File` or a
+memory-mapped file).
+
+Layout (all integers are big-endian):
+
+    MAGIC (7 bytes) | version (1 byte) | flags (1 byte) | body
+
+The body (zlib-compressed if the COMPRESSED flag is set) starts with one byte
+for the kind of the classifier: DICT, followed by one record per field, or
+JSON, followed by a single record holding the JSON-encoded classifier.
+Each record is:
+
+    name length (2 bytes) | name (UTF-8) | kind (1 byte) | value length (8 bytes) | value
+
+where the kind is JSON for a JSON-encoded value, or BASE64 for the
+decoded bytes of a base64-encoded string.
+
+Files that do not start with the magic bytes are read as JSON,
+so classifiers stored in the old format can still be used.
+
+Classifier dictionaries are read as `ClassifierData`, which also holds a
+digest of each field, computed once when the classifier is read.  The
+binary fields are read as bytes, rather than being base64-encoded again, so
+the algorithm can deserialize them without another copy; every other field
+is returned exactly as the algorithm serialized it.
+`ClassifierData.encoded()` restores the binary fields as they were serialized.
+"""
+import base64
+import binascii
+from hashlib import sha1
+import json
+import struct
+import zlib
+
+
+MAGIC = "ORA2CLF"
+VERSION = 1
+
+# Header flags
+COMPRESSED = 0x01
+
+# Kinds of classifiers and fields
+DICT = "D"
+JSON = "J"
+BASE64 = "B"
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_HEADER = struct.Struct(">7sBB")
+_NAME_LENGTH = struct.Struct(">H")
+_VALUE_LENGTH = struct.Struct(">cQ")
+
+
+def dumps(classifier_data, compress=True, binary_fields=()):
+    """
+    Serialize classifier data in the container format.
+
+    Args:
+        classifier_data (JSON-serializable): The classifier data.
+
+    Keyword Arguments:
+        compress (bool): Whether to compress the body with zlib.
+        binary_fields (iterable): The names of the fields that the algorithm
+            declares hold base64-encoded bytes.  Those fields are stored as
+            the bytes they encode; every other field is stored as JSON.
+
+    Returns:
+        str
+
+    Raises:
+        TypeError
+        ValueError
+        UnicodeDecodeError
+
+    """
+    if isinstance(classifier_data, dict):
+        raw_fields = getattr(classifier_data, 'raw_fields', frozenset())
+        parts = [DICT]
+        for name, value in sorted(classifier_data.iteritems()):
+            if name in raw_fields:
+                raw = value
+            elif name in binary_fields:
+                raw = _decode_base64(value)
+            else:
+                raw = None
+            if raw is not None:
+                parts.append(_record(name, BASE64, raw))
+            else:
+                parts.append(_record(name, JSON, json.dumps(value)))
+    else:
+        parts = [JSON, _record(u"", JSON, json.dumps(classifier_data))]
+
+    body = "".join(parts)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= COMPRESSED
+    return _HEADER.pack(MAGIC, VERSION, flags) + body
+
+
+def load(fileobj, binary_fields=()):
+    """
+    Read classifier data from a file-like object, in either
+    the container format or the old JSON format.
+
+    Args:
+        fileobj (file-like): Supports `read(size)`.
+
+    Keyword Arguments:
+        binary_fields (iterable): The names of the fields that the algorithm
+            declares hold base64-encoded bytes.
+
+    Returns:
+        JSON-serializable: The classifier data, as a `ClassifierData` if it is
+            a dictionary.  The binary fields are returned as the bytes they
+            encode, and named in `raw_fields`; the other fields are returned
+            as they were serialized.
+
+    Raises:
+        ValueError: The data could not be read.
+
+    """
+    header = fileobj.read(_HEADER.size)
+    if not header.startswith(MAGIC):
+        classifier_data = json.loads(header + fileobj.read())
+        if not isinstance(classifier_data, dict):
+            return classifier_data
+        raw_fields = set()
+        for name in binary_fields:
+            raw = _decode_base64(classifier_data.get(name))
+            if raw is not None:
+                classifier_data[name] = raw
+                raw_fields.add(name)
+        return ClassifierData(classifier_data, raw_fields=raw_fields)
+
+    if len(header) < _HEADER.size:
+        raise ValueError(u"Truncated classifier header")
+    __, version, flags = _HEADER.unpack(header)
+    if version != VERSION:
+        raise ValueError(u"Unsupported classifier format version {}".format(version))
+
+    reader = _BodyReader(fileobj, compressed=bool(flags & COMPRESSED))
+    try:
+        kind = reader.read(1)
+        records = reader.records()
+        if kind == DICT:
+            fields = dict()
+            raw_fields = set()
+            for name, field_kind, value in records:
+                if field_kind == BASE64 and name in binary_fields:
+                    raw_fields.add(name)
+                elif field_kind == BASE64:
+                    # Give algorithms back the strings they serialized
+                    value = unicode(base64.b64encode(value))
+                fields[name] = value
+            return ClassifierData(fields, raw_fields=raw_fields)
+        elif kind == JSON:
+            __, __, value = next(records)
+            return value
+        else:
+            raise ValueError(u"Unknown classifier kind {!r}".format(kind))
+    except (struct.error, zlib.error, StopIteration) as ex:
+        raise ValueError(u"Could not read classifier data: {}".format(ex))
+
+
+def loads(data, binary_fields=()):
+    """
+    Read classifier data from a string (or a buffer, such as a memory-mapped file).
+
+    Args:
+        data (str): The serialized classifier data.
+
+    Keyword Arguments:
+        binary_fields (iterable): See `load()`.
+
+    Returns:
+        JSON-serializable
+
+    Raises:
+        ValueError
+
+    """
+    return load(_BufferFile(data), binary_fields=binary_fields)
+
+
+def field_digest(value):
+    """
+    Return a digest of a single field of a classifier.
+
+    Args:
+        value (JSON-serializable): The value of the field.
+
+    Returns:
+        str: The hex digest.
+
+    """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return sha1(value).hexdigest()
+
+
+class ClassifierData(dict):
+    """
+    Classifier dictionary read from storage.
+
+    Fields named in `raw_fields` hold the bytes that a base64-encoded
+    string encoded, which is how they are stored.
+
+    Serialized classifiers are often several megabytes, so the digest of
+    each field is computed once here, and callers that key caches by the
+    contents of a classifier can use `digests` instead of hashing the
+    fields again each time the classifier is used.  The digests are
+    pickled along with the dictionary, so they survive in-memory caching.
+    """
+    def __init__(self, fields=(), raw_fields=()):
+        super(ClassifierData, self).__init__(fields)
+        self.raw_fields = frozenset(raw_fields)
+        self.digests = {name: field_digest(value) for name, value in self.iteritems()}
+
+    def encoded(self):
+        """
+        Return the classifier as it was serialized, with the
+        fields stored as bytes base64-encoded again.
+
+        Returns:
+            dict
+        """
+        return {
+            name: unicode(base64.b64encode(value)) if name in self.raw_fields else value
+            for name, value in self.iteritems()
+        }
+
+
+def _record(name, kind, value):
+    """
+    Pack a single field of the classifier.
+    """
+    name = name.encode('utf-8')
+    return "".join([_NAME_LENGTH.pack(len(name)), name, _VALUE_LENGTH.pack(kind, len(value)), value])
+
+
+def _decode_base64(value):
+    """
+    Return the bytes encoded by a base64 string, or None if the value
+    is not a string that can be restored exactly from those bytes.
+    """
+    if not isinstance(value, basestring):
+        return None
+    try:
+        value = value.encode('ascii')
+        raw = base64.b64decode(value)
+    except (UnicodeError, TypeError, binascii.Error):
+        return None
+    return raw if base64.b64encode(raw) == value else None
+
+
+class _BufferFile(object):
+    """
+    Minimal file-like wrapper that reads from a string or buffer.
+    """
+    def __init__(self, data):
+        self._data = data
+        self._offset = 0
+
+    def read(self, size=-1):
+        end = len(self._data) if size < 0 else self._offset + size
+        chunk = self._data[self._offset:end]
+        self._offset = min(end, len(self._data))
+        return chunk
+
+
+class _BodyReader(object):
+    """
+    Read the (possibly compressed) body of a container incrementally.
+    """
+    def __init__(self, fileobj, compressed):
+        self._fileobj = fileobj
+        self._decompressor = zlib.decompressobj() if compressed else None
+        self._buffer = ""
+
+    def read(self, size):
+        """
+        Read exactly `size` bytes of the body.
+
+        Raises:
+            ValueError: The body ended early.
+        """
+        chunks = []
+        needed = size
+        while needed > 0:
+            if not self._buffer:
+                self._buffer = self._next_chunk()
+                if not self._buffer:
+                    raise ValueError(u"Truncated classifier data")
+            chunk, self._buffer = self._buffer[:needed], self._buffer[needed:]
+            chunks.append(chunk)
+            needed -= len(chunk)
+        return "".join(chunks)
+
+    def records(self):
+        """
+        Yield (name, kind, value) tuples until the body is exhausted.
+        """
+        while True:
+            if not self._buffer:
+                self._buffer = self._next_chunk()
+                if not self._buffer:
+                    return
+            name_length, = _NAME_LENGTH.unpack(self.read(_NAME_LENGTH.size))
+            name = self.read(name_length).decode('utf-8')
+            kind, value_length = _VALUE_LENGTH.unpack(self.read(_VALUE_LENGTH.size))
+            value = self.read(value_length)
+            if kind == BASE64:
+                yield name, kind, value
+            elif kind == JSON:
+                yield name, kind, json.loads(value)
+            else:
+                raise ValueError(u"Unknown classifier field kind {!r}".format(kind))
+
+    def _next_chunk(self):
+        """
+        Return the next chunk of the body, or an empty string at the end.
+        """
+        while True:
+            data = self._fileobj.read(READ_CHUNK_SIZE)
+            if self._decompressor is None:
+                return data
+            if not data:
+                return self._decompressor.flush()
+            chunk = self._decompressor.decompress(data)
+            if chunk:
+                return chunk
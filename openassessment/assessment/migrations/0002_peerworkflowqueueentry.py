@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.utils.timezone
+from django.utils.timezone import now
+
+# PeerWorkflow.TIME_LIMIT at the time of this migration
+TIME_LIMIT = datetime.timedelta(hours=8)
+
+# Number of peer workflows to add to the queue at a time
+CHUNK_SIZE = 500
+
+
+def create_queue_entries(apps, schema_editor):
+    """
+    Add the existing peer workflows that have not been cancelled to the queue.
+    """
+    PeerWorkflow = apps.get_model('assessment', 'PeerWorkflow')
+    PeerWorkflowItem = apps.get_model('assessment', 'PeerWorkflowItem')
+    PeerWorkflowQueueEntry = apps.get_model('assessment', 'PeerWorkflowQueueEntry')
+
+    workflows = PeerWorkflow.objects.filter(cancelled_at__isnull=True).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(workflows.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        items = PeerWorkflowItem.objects.filter(author_id__in=[workflow.id for workflow in chunk]).order_by()
+        num_completed = dict(
+            items.filter(assessment__isnull=False).values('author_id').annotate(
+                num_completed=Count('id')
+            ).values_list('author_id', 'num_completed')
+        )
+        open_counts = {
+            row['author_id']: (row['num_open'], row['oldest_open_started_at'])
+            for row in items.filter(assessment__isnull=True, started_at__gt=now() - TIME_LIMIT).values(
+                'author_id'
+            ).annotate(num_open=Count('id'), oldest_open_started_at=Min('started_at'))
+        }
+
+        entries = []
+        for workflow in chunk:
+            num_open, oldest_open_started_at = open_counts.get(workflow.id, (0, None))
+            entries.append(PeerWorkflowQueueEntry(
+                author_id=workflow.id,
+                student_id=workflow.student_id,
+                item_id=workflow.item_id,
+                course_id=workflow.course_id,
+                submission_uuid=workflow.submission_uuid,
+                created_at=workflow.created_at,
+                grading_completed=workflow.grading_completed_at is not None,
+                num_completed=num_completed.get(workflow.id, 0),
+                num_open=num_open,
+                next_lease_expiry=(
+                    oldest_open_started_at + TIME_LIMIT
+                    if oldest_open_started_at is not None else None
+                ),
+            ))
+        PeerWorkflowQueueEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeerWorkflowQueueEntry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('student_id', models.CharField(max_length=40)),
+                ('item_id', models.CharField(max_length=128)),
+                ('course_id', models.CharField(max_length=40)),
+                ('submission_uuid', models.CharField(max_length=128)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('grading_completed', models.BooleanField(default=False)),
+                ('num_completed', models.PositiveIntegerField(default=0)),
+                ('num_open', models.PositiveIntegerField(default=0)),
+                ('next_lease_expiry', models.DateTimeField(default=None, null=True)),
+                ('author', models.OneToOneField(related_name='queue_entry', to='assessment.PeerWorkflow')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='peerworkflowqueueentry',
+            index_together=set([('course_id', 'item_id', 'grading_completed', 'created_at')]),
+        ),
+        migrations.RunPython(create_queue_entries, migrations.RunPython.noop),
+    ]
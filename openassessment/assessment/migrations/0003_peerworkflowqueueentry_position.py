@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0002_peerworkflowqueueentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='peerworkflowqueueentry',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='peerworkflowqueueentry',
+            index_together=set([('course_id', 'item_id', 'grading_completed', 'created_at'), ('course_id', 'item_id', 'position')]),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+from django.utils.timezone import now
+
+# PeerWorkflow.TIME_LIMIT at the time of this migration
+TIME_LIMIT = datetime.timedelta(hours=8)
+
+
+def create_open_leases(apps, schema_editor):
+    """
+    Create leases for the assessments that are currently open.
+    """
+    PeerWorkflowItem = apps.get_model('assessment', 'PeerWorkflowItem')
+    PeerWorkflowLease = apps.get_model('assessment', 'PeerWorkflowLease')
+
+    open_items = PeerWorkflowItem.objects.filter(
+        assessment__isnull=True,
+        started_at__gt=now() - TIME_LIMIT,
+        author__cancelled_at__isnull=True,
+    ).values_list('id', 'scorer_id', 'author_id', 'started_at')
+    PeerWorkflowLease.objects.bulk_create([
+        PeerWorkflowLease(
+            item_id=item_id, scorer_id=scorer_id, author_id=author_id, expires_at=started_at + TIME_LIMIT
+        )
+        for item_id, scorer_id, author_id, started_at in open_items.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0004_peerworkflowitem_scorer_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeerWorkflowLease',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('author', models.ForeignKey(related_name='leased_by', to='assessment.PeerWorkflow')),
+                ('item', models.OneToOneField(related_name='lease', to='assessment.PeerWorkflowItem')),
+                ('scorer', models.ForeignKey(related_name='leases', to='assessment.PeerWorkflow')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='peerworkflowlease',
+            index_together=set([('author', 'expires_at'), ('scorer', 'expires_at')]),
+        ),
+        migrations.RunPython(create_open_leases, migrations.RunPython.noop),
+    ]
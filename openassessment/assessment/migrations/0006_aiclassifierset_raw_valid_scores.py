@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0005_peerworkflowlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiclassifierset',
+            name='raw_valid_scores',
+            field=models.TextField(default='', blank=True),
+        ),
+    ]
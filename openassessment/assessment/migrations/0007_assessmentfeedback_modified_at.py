@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0006_aiclassifierset_raw_valid_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessmentfeedback',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, db_index=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def number_queue_entries(apps, schema_editor):
+    """
+    Number the entries in each course item's queue in the order their
+    submissions were created.  Entries that existed before positions were
+    added all have position 0, which would skew picking submissions by position.
+    """
+    PeerWorkflowQueueEntry = apps.get_model('assessment', 'PeerWorkflowQueueEntry')
+
+    course_items = PeerWorkflowQueueEntry.objects.order_by().values_list('course_id', 'item_id').distinct()
+    for course_id, item_id in course_items:
+        entries = PeerWorkflowQueueEntry.objects.filter(
+            course_id=course_id, item_id=item_id
+        ).order_by('created_at', 'id').values_list('id', 'position')
+        for position, (entry_id, old_position) in enumerate(entries):
+            if position != old_position:
+                PeerWorkflowQueueEntry.objects.filter(id=entry_id).update(position=position)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0007_assessmentfeedback_modified_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(number_queue_entries, migrations.RunPython.noop),
+    ]
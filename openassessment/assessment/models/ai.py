@@ -7,12 +7,15 @@ import logging
 from django.conf import settings
 from django.core import signals
 from django.core.files.base import ContentFile
-from django.core.cache import cache, _create_cache
+from django.core.cache import _create_cache
 from django.db import models, transaction, DatabaseError
+from django.db.models import Case, When, Value
 from django.utils.timezone import now
 from django_extensions.db.fields import UUIDField
 from dogapi import dog_stats_api
 from submissions import api as sub_api
+from openassessment.assessment import classifier_format
+from openassessment.assessment.classifier_cache import ClassifierFileCache
 from .base import Rubric, Criterion, Assessment, AssessmentPart
 from .training import TrainingExample
 
@@ -44,15 +47,72 @@ CLASSIFIERS_CACHE_IN_MEM = getattr(
     )
 )
 
-CLASSIFIERS_CACHE_IN_FILE = getattr(
-    settings, 'ORA2_CLASSIFIERS_CACHE_IN_FILE',
-    create_cache(
-        'django.core.cache.backends.filebased.FileBasedCache',
-        LOCATION='/tmp/ora2_classifier_cache'
-    )
+# Keep classifier data on disk as well, in a directory shared by all
+# the worker processes on a host, bounded by the total size of the classifiers.
+CLASSIFIERS_CACHE_ON_DISK = ClassifierFileCache(
+    getattr(settings, 'ORA2_CLASSIFIERS_CACHE_DIR', '/tmp/ora2_classifier_files'),
+    getattr(settings, 'ORA2_CLASSIFIERS_CACHE_DIR_SIZE', 1024 * 1024 * 1024)
 )
 
 
+def classifier_binary_fields(algorithm_id):
+    """
+    Return the fields of the classifiers trained by an algorithm
+    that the algorithm declares hold base64-encoded bytes.
+
+    Args:
+        algorithm_id (unicode): The ID of the algorithm.
+
+    Returns:
+        tuple of field names, which is empty if the algorithm is not configured.
+
+    """
+    # The algorithms are imported here, since they need libraries
+    # (such as NumPy) that are only installed where essays are graded.
+    # Without them, the binary fields are stored and read as base64 strings,
+    # which the algorithms also accept.
+    try:
+        from openassessment.assessment.worker.algorithm import AIAlgorithm, AIAlgorithmError
+    except ImportError:
+        return ()
+    try:
+        return tuple(AIAlgorithm.algorithm_for_id(algorithm_id).BINARY_FIELDS)
+    except AIAlgorithmError:
+        return ()
+
+
+def serialize_classifier_data(classifier_data, binary_fields=()):
+    """
+    Serialize classifier data for storage.
+
+    By default, classifiers are stored in the compressed binary container format.
+    Setting ORA2_AI_CLASSIFIER_FORMAT to "json" stores them as JSON instead,
+    which older versions of the workers can read.
+
+    Args:
+        classifier_data (JSON-serializable): The classifier data.
+
+    Keyword Arguments:
+        binary_fields (iterable): The fields that the algorithm declares
+            hold base64-encoded bytes (see `classifier_binary_fields`).
+
+    Returns:
+        str
+
+    Raises:
+        TypeError
+        ValueError
+        UnicodeDecodeError
+
+    """
+    if getattr(settings, 'ORA2_AI_CLASSIFIER_FORMAT', 'binary') == 'json':
+        return json.dumps(classifier_data)
+    return classifier_format.dumps(
+        classifier_data, compress=getattr(settings, 'ORA2_AI_CLASSIFIER_COMPRESSION', True),
+        binary_fields=binary_fields
+    )
+
+
 def essay_text_from_submission(submission):
     """
     Retrieve the submission text.
@@ -155,6 +215,12 @@ class AIClassifierSet(models.Model):
     course_id = models.CharField(max_length=40, db_index=True)
     item_id = models.CharField(max_length=128, db_index=True)
 
+    # The valid scores for each classifier in the set, serialized as a JSON
+    # dictionary mapping criteria names to sorted lists of scores.
+    # Classifier sets created before this was stored have an empty string,
+    # and the scores are filled in the first time they are needed.
+    raw_valid_scores = models.TextField(blank=True, default=u"")
+
     @classmethod
     @transaction.atomic
     def create_classifier_set(cls, classifiers_dict, rubric, algorithm_id, course_id, item_id):
@@ -209,18 +275,21 @@ class AIClassifierSet(models.Model):
             raise IncompleteClassifierSet(missing_criteria)
 
         # Create classifiers for each criterion
+        binary_fields = classifier_binary_fields(algorithm_id)
+        valid_scores_by_criterion = dict()
         for criterion_name, classifier_data in classifiers_dict.iteritems():
             classifier = AIClassifier.objects.create(
                 classifier_set=classifier_set,
                 criterion=rubric_index.find_criterion(criterion_name)
             )
+            valid_scores_by_criterion[criterion_name] = classifier.valid_scores
 
             # Serialize the classifier data and upload
             try:
-                contents = ContentFile(json.dumps(classifier_data))
+                contents = ContentFile(serialize_classifier_data(classifier_data, binary_fields))
             except (TypeError, ValueError, UnicodeDecodeError) as ex:
                 msg = (
-                    u"Could not serialize classifier data as JSON: {ex}"
+                    u"Could not serialize classifier data: {ex}"
                 ).format(ex=ex)
                 raise ClassifierSerializeError(msg)
 
@@ -234,6 +303,11 @@ class AIClassifierSet(models.Model):
                 ).format(filename=full_filename, ex=ex)
                 raise ClassifierUploadError(msg)
 
+        # Store the valid scores with the classifier set,
+        # so the grading tasks can retrieve them without additional queries
+        classifier_set.raw_valid_scores = json.dumps(valid_scores_by_criterion)
+        classifier_set.save()
+
         return classifier_set
 
     @classmethod
@@ -321,7 +395,8 @@ class AIClassifierSet(models.Model):
         that maps criteria names to classifier data.
 
         Returns:
-            dict: keys are criteria names, values are JSON-serializable classifier data
+            dict: keys are criteria names, values are classifier data
+                (see `classifier_format.load`)
 
         Raises:
             ValueError
@@ -336,16 +411,19 @@ class AIClassifierSet(models.Model):
         cache_key = self._cache_key("classifier_data_by_criterion")
         classifiers_dict = CLASSIFIERS_CACHE_IN_MEM.get(cache_key)
 
-        # If we can't find the classifier in-memory, check the filesystem cache
+        # If we can't find the classifier in-memory, check the on-disk cache
         # We can't always rely on the in-memory cache because worker processes
-        # terminate when max retries are exceeded.
+        # terminate when max retries are exceeded, and the on-disk cache
+        # is shared by all the worker processes on the host.
         if classifiers_dict is None:
             msg = (
                 u"Could not find classifiers dict in the in-memory "
-                u"cache for key {key}.  Falling back to the file-based cache."
+                u"cache for key {key}.  Falling back to the on-disk cache."
             ).format(key=cache_key)
             logger.info(msg)
-            classifiers_dict = CLASSIFIERS_CACHE_IN_FILE.get(cache_key)
+            classifiers_dict = self._classifier_data_from_disk(cache_key)
+            if classifiers_dict is not None:
+                CLASSIFIERS_CACHE_IN_MEM.set(cache_key, classifiers_dict)
         else:
             msg = (
                 u"Found classifiers dict in the in-memory cache "
@@ -357,39 +435,97 @@ class AIClassifierSet(models.Model):
         # we need to look up the classifiers in the database,
         # then download the classifier data.
         if classifiers_dict is None:
-            classifiers_dict = {
-                classifier.criterion.name: classifier.download_classifier_data()
-                for classifier in self.classifiers.select_related().all()   # pylint: disable=E1101
-            }
+            binary_fields = classifier_binary_fields(self.algorithm_id)
+            classifiers_dict = dict()
+            content_keys = dict()
+            for classifier in self.classifiers.select_related().all():   # pylint: disable=E1101
+                # Stream the classifier into the on-disk cache,
+                # then read it from the memory-mapped cache entry.
+                content_key = CLASSIFIERS_CACHE_ON_DISK.put_file(classifier.classifier_data)
+                classifier_data = None
+                if content_key is not None:
+                    classifier_data = CLASSIFIERS_CACHE_ON_DISK.load(
+                        content_key, lambda buf: classifier_format.loads(buf, binary_fields=binary_fields)
+                    )
+                    content_keys[classifier.criterion.name] = content_key
+
+                # If the classifier could not be cached (for example, because
+                # it is larger than the cache), read it from storage again.
+                if classifier_data is None:
+                    storage = classifier.classifier_data.storage
+                    with storage.open(classifier.classifier_data.name) as classifier_file:
+                        classifier_data = classifier_format.load(classifier_file, binary_fields=binary_fields)
+                classifiers_dict[classifier.criterion.name] = classifier_data
+
             CLASSIFIERS_CACHE_IN_MEM.set(cache_key, classifiers_dict)
-            CLASSIFIERS_CACHE_IN_FILE.set(cache_key, classifiers_dict)
+            if len(content_keys) == len(classifiers_dict):
+                CLASSIFIERS_CACHE_ON_DISK.put(cache_key, json.dumps(content_keys))
             msg = (
                 u"Could not find classifiers dict in either the in-memory "
-                u"or file-based cache.  Downloaded the data from S3 and cached "
+                u"or on-disk cache.  Downloaded the data from S3 and cached "
                 u"it using key {key}"
             ).format(key=cache_key)
             logger.info(msg)
 
         return classifiers_dict
 
+    def _classifier_data_from_disk(self, cache_key):
+        """
+        Load the classifiers in this set from the on-disk cache.
+
+        The cache entry for the classifier set maps criteria names to
+        the keys of the classifier data, which is stored by its contents.
+
+        Args:
+            cache_key (unicode): The cache key for the classifier set.
+
+        Returns:
+            dict or None: maps criteria names to classifier data, or None
+                if any of the classifiers are not in the cache.
+
+        """
+        try:
+            content_keys = CLASSIFIERS_CACHE_ON_DISK.load(cache_key, lambda buf: json.loads(buf[:]))
+            if content_keys is None:
+                return None
+
+            binary_fields = classifier_binary_fields(self.algorithm_id)
+            classifiers_dict = dict()
+            for criterion_name, content_key in content_keys.iteritems():
+                classifier_data = CLASSIFIERS_CACHE_ON_DISK.load(
+                    content_key, lambda buf: classifier_format.loads(buf, binary_fields=binary_fields)
+                )
+                if classifier_data is None:
+                    return None
+                classifiers_dict[criterion_name] = classifier_data
+            return classifiers_dict
+        except ValueError:
+            logger.exception(
+                u"Could not read classifiers from the on-disk cache for key {key}".format(key=cache_key)
+            )
+            return None
+
     @property
     def valid_scores_by_criterion(self):
         """
         Return the valid scores for each classifier in this classifier set.
 
         Returns:
-            dict: maps rubric criterion names to lists of valid scores.
+            dict: maps rubric criterion names to lists of valid scores,
+                in ascending order.
+
+        Raises:
+            DatabaseError
 
         """
-        cache_key = self._cache_key("valid_scores_by_criterion")
-        valid_scores_by_criterion = cache.get(cache_key)
-        if valid_scores_by_criterion is None:
+        if not self.raw_valid_scores:
             valid_scores_by_criterion = {
                 classifier.criterion.name: classifier.valid_scores
-                for classifier in self.classifiers.select_related().all()  # pylint: disable=E1101
+                for classifier in self.classifiers.select_related().prefetch_related('criterion__options')  # pylint: disable=E1101
             }
-            cache.set(cache_key, valid_scores_by_criterion)
-        return valid_scores_by_criterion
+            self.raw_valid_scores = json.dumps(valid_scores_by_criterion)
+            AIClassifierSet.objects.filter(pk=self.pk).update(raw_valid_scores=self.raw_valid_scores)
+        return json.loads(self.raw_valid_scores)
 
     def _cache_key(self, data_name):
         """
@@ -464,10 +600,11 @@ class AIClassifier(models.Model):
 
     def download_classifier_data(self):
         """
-        Download and deserialize the classifier data.
+        Download and deserialize the classifier data,
+        reading it incrementally rather than all at once.
 
         Returns:
-            JSON-serializable
+            JSON-serializable, or `classifier_format.ClassifierData`
 
         Raises:
             ValueError
@@ -475,7 +612,10 @@ class AIClassifier(models.Model):
             httplib.HTTPException
 
         """
-        return json.loads(self.classifier_data.read())  # pylint:disable=E1101
+        return classifier_format.load(
+            self.classifier_data,
+            binary_fields=classifier_binary_fields(self.classifier_set.algorithm_id)
+        )
 
     @property
     def valid_scores(self):
@@ -568,22 +708,51 @@ class AIWorkflow(models.Model):
 
         Raises:
             DatabaseError
-            cls.DoesNotExist
         """
+        for chunk in cls.incomplete_workflow_chunks(course_id, item_id):
+            for workflow in chunk:
+                yield workflow
 
-        # Finds all of the uuid's for workflows contained within the query
-        grade_workflow_uuids = [
-            wflow['uuid'] for wflow in cls.objects.filter(
-                course_id=course_id, item_id=item_id, completed_at__isnull=True
-            ).values('uuid')
-        ]
+    @classmethod
+    def incomplete_workflow_chunks(cls, course_id, item_id, chunk_size=1000, fields=None):
+        """
+        Gets the incomplete workflows for a given course and item in chunks,
+        ordered by primary key.  Each chunk is retrieved with a single query
+        starting after the last primary key of the previous chunk, so the
+        workflows are never all held in memory, and workflows completed
+        while the chunks are being processed do not shift the later chunks.
+
+        Args:
+            course_id (unicode): Uniquely identifies the course
+            item_id (unicode): The discriminator for the item we are looking for
 
-        # Continues to generate output until all workflows in the queryset have been output
-        for workflow_uuid in grade_workflow_uuids:
+        Keyword Arguments:
+            chunk_size (int): The maximum number of workflows in each chunk.
+            fields (list of str): If provided, retrieve dictionaries containing
+                only these fields (and the primary key) instead of model instances.
 
-            # Returns the grading workflow associated with the uuid stored in the initial query
-            workflow = cls.objects.get(uuid=workflow_uuid)
-            yield workflow
+        Yields:
+            lists of workflows (or dictionaries of field values)
+
+        Raises:
+            DatabaseError
+        """
+        queryset = cls.objects.filter(
+            course_id=course_id, item_id=item_id, completed_at__isnull=True
+        ).order_by('pk')
+        if fields is not None:
+            queryset = queryset.values('pk', *fields)
+
+        last_pk = None
+        while True:
+            chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk_queryset[:chunk_size])
+            if len(chunk) == 0:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last_pk = chunk[-1]['pk'] if fields is not None else chunk[-1].pk
 
     @classmethod
     def is_workflow_complete(cls, workflow_uuid):
@@ -805,6 +974,23 @@ class AIGradingWorkflow(AIWorkflow):
             self.save()
         return classifier_set is not None
 
+    @classmethod
+    def assign_classifier_set(cls, workflow_pks, classifier_set):
+        """
+        Assign a classifier set to many workflows with a single update.
+
+        Args:
+            workflow_pks (list): The primary keys of the workflows.
+            classifier_set (AIClassifierSet): The classifier set to assign.
+
+        Returns:
+            int: The number of workflows updated.
+
+        Raises:
+            DatabaseError
+        """
+        return cls.objects.filter(pk__in=workflow_pks).update(classifier_set=classifier_set)
+
     @classmethod
     @transaction.atomic
     def start_workflow(cls, submission_uuid, rubric_dict, algorithm_id):
@@ -871,3 +1057,74 @@ class AIGradingWorkflow(AIWorkflow):
         )
         AssessmentPart.create_from_option_points(self.assessment, criterion_scores)
         self.mark_complete_and_save()
+
+    @classmethod
+    @transaction.atomic
+    def complete_many(cls, workflows, criterion_scores_by_workflow):
+        """
+        Create assessments for many workflows and mark them complete.
+
+        The workflows are locked until the transaction commits, and workflows
+        that another process completed first are skipped.  The assessment
+        parts are created with a single bulk insert, and the workflows are
+        marked complete with a single update.
+
+        Args:
+            workflows (list of AIGradingWorkflow): Incomplete workflows.
+            criterion_scores_by_workflow (dict): Maps workflow UUIDs to
+                dictionaries mapping criteria names to integer scores.
+
+        Returns:
+            list of AIGradingWorkflow: The workflows that were marked complete.
+
+        Raises:
+            InvalidRubricSelection
+            DatabaseError
+
+        """
+        if not workflows:
+            return []
+
+        # Lock the workflows, then check that they are still incomplete,
+        # so that no workflow gets more than one assessment.
+        incomplete_pks = set(
+            cls.objects.select_for_update().filter(
+                pk__in=[workflow.pk for workflow in workflows], completed_at__isnull=True
+            ).values_list('pk', flat=True)
+        )
+        workflows = [workflow for workflow in workflows if workflow.pk in incomplete_pks]
+        if not workflows:
+            return []
+
+        # Create the assessments one at a time, since bulk inserts
+        # do not return the IDs of the new assessments.
+        timestamp = now()
+        for workflow in workflows:
+            workflow.assessment = Assessment.objects.create(
+                rubric_id=workflow.rubric_id, scorer_id=workflow.algorithm_id,
+                submission_uuid=workflow.submission_uuid, score_type=AI_ASSESSMENT_TYPE,
+                scored_at=timestamp
+            )
+
+        # Create the assessment parts, loading each rubric once
+        rubrics = Rubric.objects.in_bulk(set(workflow.rubric_id for workflow in workflows))
+        parts = []
+        for workflow in workflows:
+            parts.extend(AssessmentPart.build_from_option_points(
+                workflow.assessment, criterion_scores_by_workflow[workflow.uuid],
+                rubric_index=rubrics[workflow.rubric_id].index
+            ))
+        AssessmentPart.objects.bulk_create(parts)
+
+        # Mark the workflows complete
+        cls.objects.filter(pk__in=[workflow.pk for workflow in workflows]).update(
+            completed_at=timestamp,
+            assessment=Case(
+                *[When(pk=workflow.pk, then=Value(workflow.assessment.pk)) for workflow in workflows],
+                output_field=models.IntegerField()
+            )
+        )
+        for workflow in workflows:
+            workflow.completed_at = timestamp
+            workflow._log_complete_workflow()   # pylint:disable=W0212
+        return workflows
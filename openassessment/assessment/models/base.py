@@ -13,6 +13,7 @@ need to then generate a matching migration for it using:
 
 """
 import math
+from array import array
 from collections import defaultdict
 from copy import deepcopy
 from hashlib import sha1
@@ -20,9 +21,15 @@ import json
 
 from django.core.cache import cache
 from django.db import models
+from django.dispatch import receiver
 from django.utils.timezone import now
+from dogapi import dog_stats_api
 from lazy import lazy
 
+from openassessment.assessment.signals import (
+    assessment_complete_signal, assessments_complete_signal, assessment_created_signal
+)
+
 import logging
 logger = logging.getLogger("openassessment.assessment.models")
 
@@ -411,6 +418,9 @@ class Assessment(models.Model):
     """
     MAX_FEEDBACK_SIZE = 1024 * 100
 
+    # The number of sets of scores to keep in the score summary of each submission
+    SCORE_SUMMARY_MAX_ENTRIES = 4
+
     submission_uuid = models.CharField(max_length=128, db_index=True)
     rubric = models.ForeignKey(Rubric)
 
@@ -573,26 +583,130 @@ class Assessment(models.Model):
         """
         assessments = list(assessments)  # Force us to read it all
         if not assessments:
-            return []
-
-        # Generate a cache key that represents all the assessments we're being
-        # asked to grab scores from (comma separated list of assessment IDs)
-        cache_key = "assessments.scores_by_criterion.{}".format(
-            ",".join(str(assessment.id) for assessment in assessments)
+            return {}
+        return cls.scores_by_criterion_for_ids(
+            [assessment.id for assessment in assessments],
+            assessments[0].submission_uuid
         )
-        scores = cache.get(cache_key)
-        if scores:
-            return scores
 
-        scores = defaultdict(list)
-        for assessment in assessments:
-            for part in assessment.parts.all().select_related():
-                criterion_name = part.criterion.name
-                scores[criterion_name].append(part.points_earned)
+    @classmethod
+    def scores_by_criterion_for_ids(cls, assessment_ids, submission_uuid):
+        """Create a dictionary of lists for scores associated with criterion
+
+        Same as `scores_by_criterion`, but for assessment IDs, so callers that
+        already know which assessments they need do not have to load them.
+        The points of every part are retrieved in a single query, instead of
+        one query per assessment.
+
+        The scores are cached in a summary for the submission, which holds
+        the scores of the last few sets of assessments requested for it.
+        Each set is identified by a hash of its assessment IDs, so the cache
+        key has a fixed length however many assessments there are, and
+        assessments added later can never be served stale scores.
+
+        Args:
+            assessment_ids (list): List of assessment IDs.  The scores in each
+                list are in the same order as the assessments.
+            submission_uuid (str): The submission the assessments were made for.
+
+        Returns:
+            dict: criterion names mapped to lists of points earned.
+
+        """
+        assessment_ids = list(assessment_ids)
+        if not assessment_ids:
+            return {}
+
+        cache_key = cls.score_summary_cache_key(submission_uuid)
+        ids_hash = sha1(",".join(str(assessment_id) for assessment_id in assessment_ids)).hexdigest()
+        try:
+            summary = cache.get(cache_key) or []
+        except Exception:   # pylint: disable=broad-except
+            # The cache backend could raise an exception
+            logger.exception(u"Error retrieving the score summary for submission {}".format(submission_uuid))
+            summary = []
+
+        for cached_hash, cached_scores in summary:
+            if cached_hash == ids_hash:
+                dog_stats_api.increment('openassessment.assessment.score_summary.cache_hit')
+                return {
+                    criterion_name: list(points)
+                    for criterion_name, points in cached_scores.iteritems()
+                }
+        dog_stats_api.increment('openassessment.assessment.score_summary.cache_miss')
+
+        parts_by_assessment = defaultdict(list)
+        parts = AssessmentPart.objects.filter(
+            assessment__in=assessment_ids
+        ).order_by('id').values_list('assessment', 'criterion__name', 'option__points')
+        for assessment_id, criterion_name, points in parts:
+            parts_by_assessment[assessment_id].append((criterion_name, points))
+
+        scores = {}
+        for assessment_id in assessment_ids:
+            for criterion_name, points in parts_by_assessment[assessment_id]:
+                # By convention, a part with no option (only feedback) earns 0 points.
+                scores.setdefault(criterion_name, []).append(points if points is not None else 0)
+
+        # Store the points as compact integer arrays, replacing
+        # the oldest set of scores once the summary is full.
+        compact_scores = {
+            criterion_name: array('i', points)
+            for criterion_name, points in scores.iteritems()
+        }
+        summary = summary[-(cls.SCORE_SUMMARY_MAX_ENTRIES - 1):] + [(ids_hash, compact_scores)]
+        try:
+            cache.set(cache_key, summary)
+        except Exception:   # pylint: disable=broad-except
+            logger.exception(u"Error caching the score summary for submission {}".format(submission_uuid))
 
-        cache.set(cache_key, scores)
         return scores
 
+    @staticmethod
+    def score_summary_cache_key(submission_uuid):
+        """
+        Return the key of the cached score summary for a submission.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+
+        Returns:
+            str
+
+        """
+        return "assessments.score_summary.{}".format(sha1(submission_uuid.encode('utf-8')).hexdigest())
+
+    @classmethod
+    def clear_score_summary(cls, submission_uuid):
+        """
+        Discard the cached score summary for a submission.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+
+        """
+        cache.delete(cls.score_summary_cache_key(submission_uuid))
+
+
+@receiver(assessment_created_signal)
+@receiver(assessment_complete_signal)
+def clear_cached_score_summary(sender, **kwargs):   # pylint: disable=unused-argument
+    """
+    Discard the score summary of a submission when it receives a new assessment.
+    """
+    submission_uuid = kwargs.get('submission_uuid')
+    if submission_uuid is not None:
+        Assessment.clear_score_summary(submission_uuid)
+
+
+@receiver(assessments_complete_signal)
+def clear_cached_score_summaries(sender, **kwargs):   # pylint: disable=unused-argument
+    """
+    Discard the score summaries of a batch of submissions that received new assessments.
+    """
+    for submission_uuid in kwargs.get('submission_uuids', []):
+        Assessment.clear_score_summary(submission_uuid)
+
 
 class AssessmentPart(models.Model):
     """Part of an Assessment corresponding to a particular Criterion.
@@ -731,7 +845,33 @@ class AssessmentPart(models.Model):
             DatabaseError
 
         """
-        rubric_index = assessment.rubric.index
+        return cls.objects.bulk_create(cls.build_from_option_points(assessment, selected))
+
+    @classmethod
+    def build_from_option_points(cls, assessment, selected, rubric_index=None):
+        """
+        Build (but do not save) the assessment parts for an assessment,
+        so the parts of many assessments can be created together.
+
+        Args:
+            assessment (Assessment): The assessment we're adding parts to.
+            selected (dict): A dictionary mapping criterion names to option point values.
+
+        Keyword Arguments:
+            rubric_index (RubricIndex): The index of the assessment's rubric,
+                which can be shared by assessments with the same rubric.
+                If not provided, the assessment's rubric is loaded.
+
+        Returns:
+            list of unsaved `AssessmentPart`s
+
+        Raises:
+            InvalidRubricSelection
+            DatabaseError
+
+        """
+        if rubric_index is None:
+            rubric_index = assessment.rubric.index
 
         # Retrieve the criteria/option/feedback for criteria that have options.
         # Since we're using the rubric's index, we'll get an `InvalidRubricSelection` error
@@ -758,9 +898,9 @@ class AssessmentPart(models.Model):
             part['criterion'].name for part in assessment_parts
         ))
 
-        # Create assessment parts for each criterion and associate them with the assessment
+        # Build assessment parts for each criterion and associate them with the assessment
         # Since we're not accepting written feedback, set all feedback to an empty string.
-        return cls.objects.bulk_create([
+        return [
             cls(
                 assessment=assessment,
                 criterion=assessment_part['criterion'],
@@ -768,7 +908,7 @@ class AssessmentPart(models.Model):
                 feedback=u""
             )
             for assessment_part in assessment_parts
-        ])
+        ]
 
     @classmethod
     def _check_has_all_criteria(cls, rubric_index, selected_criteria):
@@ -10,7 +10,8 @@ need to then generate a matching migration for it using:
 import random
 from datetime import timedelta
 
-from django.db import models, DatabaseError
+from django.db import models, transaction, DatabaseError, IntegrityError
+from django.db.models import Count, F, Max, Min, Q
 from django.utils.timezone import now
 
 from openassessment.assessment.models.base import Assessment
@@ -57,6 +58,10 @@ class AssessmentFeedback(models.Model):
     feedback_text = models.TextField(max_length=10000, default="")
     options = models.ManyToManyField(AssessmentFeedbackOption, related_name='assessment_feedback', default=None)
 
+    # Updated whenever the feedback or its options change, so incremental
+    # data exports can find the feedback that changed since the last export.
+    modified_at = models.DateTimeField(default=now, db_index=True)
+
     class Meta:
         app_label = "assessment"
 
@@ -203,6 +208,20 @@ class PeerWorkflow(models.Model):
                 )
             item.started_at = now()
             item.save()
+
+            # Check the submission out to the scorer until the lease expires
+            if item.assessment is None:
+                PeerWorkflowLease.objects.update_or_create(
+                    item=item,
+                    defaults={
+                        'scorer': scorer_workflow,
+                        'author': peer_workflow,
+                        'expires_at': item.started_at + cls.TIME_LIMIT,
+                    }
+                )
+
+            # The author now has one more open assessment
+            PeerWorkflowQueueEntry.refresh(peer_workflow)
             return item
         except DatabaseError:
             error_message = (
@@ -232,24 +251,14 @@ class PeerWorkflow(models.Model):
                 student has open for active assessment.
 
         """
-        oldest_acceptable = now() - self.TIME_LIMIT
-        items = list(self.graded.all().select_related('author').order_by("-started_at", "-id"))
-        valid_open_items = []
-        completed_sub_uuids = []
-        # First, remove all completed items.
-        for item in items:
-            if item.assessment is not None or item.author.is_cancelled:
-                completed_sub_uuids.append(item.submission_uuid)
-            else:
-                valid_open_items.append(item)
-
-        # Remove any open items which have a submission which has been completed.
-        for item in valid_open_items:
-            if (item.started_at < oldest_acceptable or
-                    item.submission_uuid in completed_sub_uuids):
-                valid_open_items.remove(item)
-
-        return valid_open_items[0] if valid_open_items else None
+        # Leases are released when the assessment is completed or the
+        # author's workflow is cancelled, so any unexpired lease is active.
+        leases = list(
+            self.leases.filter(
+                expires_at__gt=now()
+            ).select_related('item').order_by("-expires_at", "-id")[:1]
+        )
+        return leases[0].item if leases else None
 
     def get_submission_for_review(self, graded_by):
         """
@@ -268,52 +277,50 @@ class PeerWorkflow(models.Model):
                 the workflows or workflow items for this request.
 
         """
-        timeout = (now() - self.TIME_LIMIT).strftime("%Y-%m-%d %H:%M:%S")
-        # The follow query behaves as the Peer Assessment Queue. This will
-        # find the next submission (via PeerWorkflow) in this course / question
+        # The queue entries behave as the Peer Assessment Queue. This will
+        # find the next submission (via PeerWorkflowQueueEntry) in this course / question
         # that:
         #  1) Does not belong to you
         #  2) Does not have enough completed assessments
         #  3) Is not something you have already scored.
         #  4) Does not have a combination of completed assessments or open
         #     assessments equal to or more than the requirement.
-        #  5) Has not been cancelled.
+        #  5) Has not been cancelled (cancelled workflows have no queue entry).
+        #
+        # Entries with an expired lease that has not yet been released by
+        # `release_expired_peer_leases` may be counting open assessments that
+        # no longer block the submission, so they are also selected and
+        # recounted before we decide whether to hand them out.
         try:
-            peer_workflows = list(PeerWorkflow.objects.raw(
-                "select pw.id, pw.submission_uuid "
-                "from assessment_peerworkflow pw "
-                "where pw.item_id=%s "
-                "and pw.course_id=%s "
-                "and pw.student_id<>%s "
-                "and pw.grading_completed_at is NULL "
-                "and pw.cancelled_at is NULL "
-                "and pw.id not in ("
-                "   select pwi.author_id "
-                "   from assessment_peerworkflowitem pwi "
-                "   where pwi.scorer_id=%s "
-                "   and pwi.assessment_id is not NULL "
-                ") "
-                "and ("
-                "   select count(pwi.id) as c "
-                "   from assessment_peerworkflowitem pwi "
-                "   where pwi.author_id=pw.id "
-                "   and (pwi.assessment_id is not NULL or pwi.started_at > %s) "
-                ") < %s "
-                "order by pw.created_at, pw.id "
-                "limit 1; ",
-                [
-                    self.item_id,
-                    self.course_id,
-                    self.student_id,
-                    self.id,
-                    timeout,
-                    graded_by
-                ]
-            ))
-            if not peer_workflows:
-                return None
-
-            return peer_workflows[0].submission_uuid
+            scored_authors = self.graded.filter(assessment__isnull=False).values('author_id')
+            candidates = PeerWorkflowQueueEntry.objects.filter(
+                course_id=self.course_id,
+                item_id=self.item_id,
+                grading_completed=False,
+            ).exclude(
+                student_id=self.student_id
+            ).exclude(
+                author_id__in=scored_authors
+            ).annotate(
+                # The counts are unsigned, so compare their sum rather than
+                # subtracting one from the requirement, which can underflow
+                # once a submission has more assessments than required.
+                num_assessments=F('num_completed') + F('num_open')
+            ).filter(
+                Q(num_assessments__lt=graded_by) |
+                Q(next_lease_expiry__lte=now())
+            ).order_by('created_at', 'id')
+
+            while True:
+                entries = list(candidates[:PeerWorkflowQueueEntry.QUEUE_BATCH_SIZE])
+                if not entries:
+                    return None
+
+                for entry in entries:
+                    if entry.has_expired_lease():
+                        entry = PeerWorkflowQueueEntry.refresh(entry.author)
+                    if entry is not None and entry.num_completed + entry.num_open < graded_by:
+                        return entry.submission_uuid
         except DatabaseError:
             error_message = (
                 u"An internal error occurred while retrieving a peer submission "
@@ -326,34 +333,40 @@ class PeerWorkflow(models.Model):
         """
         Retrieve the next submission uuid for over grading in peer assessment.
         """
-        # The follow query behaves as the Peer Assessment Over Grading Queue. This
-        # will find a random submission (via PeerWorkflow) in this course / question
+        # The queue entries behave as the Peer Assessment Over Grading Queue. This
+        # will find a random submission (via PeerWorkflowQueueEntry) in this course / question
         # that:
         #  1) Does not belong to you
         #  2) Is not something you have already scored
-        #  3) Has not been cancelled.
+        #  3) Has not been cancelled (cancelled workflows have no queue entry).
+        #
+        # We pick a random position in the queue and take the first eligible
+        # entry at or after it (wrapping around to the start of the queue),
+        # so each pick is a lookup on the (course_id, item_id, position) index
+        # rather than a count or an offset scan.  Entries that follow gaps in
+        # the positions, such as the submissions the learner has already
+        # graded, are somewhat more likely to be picked.
         try:
-            query = list(PeerWorkflow.objects.raw(
-                "select pw.id, pw.submission_uuid "
-                "from assessment_peerworkflow pw "
-                "where course_id=%s "
-                "and item_id=%s "
-                "and student_id<>%s "
-                "and pw.cancelled_at is NULL "
-                "and pw.id not in ( "
-                    "select pwi.author_id "
-                    "from assessment_peerworkflowitem pwi "
-                    "where pwi.scorer_id=%s); ",
-                [self.course_id, self.item_id, self.student_id, self.id]
-            ))
-            workflow_count = len(query)
-            if workflow_count < 1:
+            queue = PeerWorkflowQueueEntry.objects.filter(
+                course_id=self.course_id,
+                item_id=self.item_id,
+            )
+            last_position = queue.aggregate(last=Max('position'))['last']
+            if last_position is None:
                 return None
 
-            random_int = random.randint(0, workflow_count - 1)
-            random_workflow = query[random_int]
+            eligible = queue.exclude(
+                student_id=self.student_id
+            ).exclude(
+                author_id__in=self.graded.values('author_id')
+            ).order_by('position', 'id')
 
-            return random_workflow.submission_uuid
+            position = random.randint(0, last_position)
+            selected = (
+                list(eligible.filter(position__gte=position)[:1]) or
+                list(eligible.filter(position__lt=position)[:1])
+            )
+            return selected[0].submission_uuid if selected else None
         except DatabaseError:
             error_message = (
                 u"An internal error occurred while retrieving a peer submission "
@@ -391,10 +404,16 @@ class PeerWorkflow(models.Model):
             item.assessment = assessment
             item.save()
 
+            # The submission is no longer checked out to the scorer
+            self.leases.filter(author=item.author).delete()
+
             if (not item.author.grading_completed_at
                     and item.author.graded_by.filter(assessment__isnull=False).count() >= num_required_grades):
                 item.author.grading_completed_at = now()
                 item.author.save()
+
+            # The open assessment is now complete
+            PeerWorkflowQueueEntry.refresh(item.author)
         except (DatabaseError, PeerWorkflowItem.DoesNotExist):
             error_message = (
                 u"An internal error occurred while retrieving a workflow item for "
@@ -455,16 +474,17 @@ class PeerWorkflowItem(models.Model):
 
         """
         return Assessment.objects.filter(
-            pk__in=[
-                item.assessment.pk for item in PeerWorkflowItem.objects.filter(
-                    submission_uuid=submission_uuid, scored=True
-                )
-            ]
+            pk__in=PeerWorkflowItem.objects.filter(
+                submission_uuid=submission_uuid, scored=True
+            ).values('assessment')
         )
 
     class Meta:
         ordering = ["started_at", "id"]
         app_label = "assessment"
+        index_together = [
+            ("scorer", "assessment", "started_at"),
+        ]
 
     def __repr__(self):
         return (
@@ -476,3 +496,302 @@ class PeerWorkflowItem(models.Model):
 
     def __unicode__(self):
         return repr(self)
+
+
+class PeerWorkflowLease(models.Model):
+    """
+    A submission checked out to a scorer for peer assessment.
+
+    A lease is created when a PeerWorkflowItem is handed to a scorer and
+    is deleted when the scorer completes the assessment or the author's
+    workflow is cancelled.  Leases that reach `expires_at` no longer count
+    as open assessments, and are deleted in bulk by `release_expired`.
+
+    """
+    # Number of expired leases to release at a time
+    RELEASE_BATCH_SIZE = 500
+
+    item = models.OneToOneField(PeerWorkflowItem, related_name='lease')
+    scorer = models.ForeignKey(PeerWorkflow, related_name='leases')
+    author = models.ForeignKey(PeerWorkflow, related_name='leased_by')
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        app_label = "assessment"
+        index_together = [
+            ("scorer", "expires_at"),
+            ("author", "expires_at"),
+        ]
+
+    @classmethod
+    def release_expired(cls, batch_size=None):
+        """
+        Delete a batch of expired leases and recount the queue entries of their submissions.
+
+        Kwargs:
+            batch_size (int): The maximum number of leases to release.
+
+        Returns:
+            int: The number of leases released.
+
+        Raises:
+            DatabaseError
+
+        """
+        batch_size = batch_size or cls.RELEASE_BATCH_SIZE
+        expired = list(
+            cls.objects.filter(
+                expires_at__lte=now()
+            ).order_by('expires_at', 'id').values_list('id', 'author_id')[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        with transaction.atomic():
+            cls.objects.filter(id__in=[lease_id for lease_id, __ in expired]).delete()
+            PeerWorkflowQueueEntry.recount(set(author_id for __, author_id in expired))
+        return len(expired)
+
+    def __repr__(self):
+        return (
+            "PeerWorkflowLease(scorer={0.scorer_id}, author={0.author_id}, "
+            "item={0.item_id}, expires_at={0.expires_at})"
+        ).format(self)
+
+    def __unicode__(self):
+        return repr(self)
+
+
+class PeerWorkflowQueueEntry(models.Model):
+    """
+    Denormalized entry in the Peer Assessment Queue for a submission.
+
+    Each PeerWorkflow that is available for peer assessment has one entry,
+    which stores the number of completed and open assessments for the
+    submission.  This lets us find the next submission to review with a
+    single indexed scan over (course_id, item_id), rather than counting
+    PeerWorkflowItems for every candidate workflow.
+
+    The counts are recomputed from the PeerWorkflowItems and
+    PeerWorkflowLeases whenever an assessment is opened or closed, and when
+    expired leases are released.  `next_lease_expiry` records when the oldest
+    open lease runs out; if that time passes before the lease is released,
+    the entry is recounted the next time it is considered.
+
+    Entries are also numbered by position within their course item, which
+    gives each item's queue a stable order to choose over grading submissions from.
+    Entries for cancelled workflows are removed from the queue.
+
+    """
+    # Number of entries to retrieve from the queue at a time
+    QUEUE_BATCH_SIZE = 20
+
+    author = models.OneToOneField(PeerWorkflow, related_name='queue_entry')
+    student_id = models.CharField(max_length=40)
+    item_id = models.CharField(max_length=128)
+    course_id = models.CharField(max_length=40)
+    submission_uuid = models.CharField(max_length=128)
+    created_at = models.DateTimeField(default=now)
+
+    # Sequence number of the entry within the course item, used to
+    # select entries at random for over grading.
+    position = models.PositiveIntegerField(default=0)
+
+    grading_completed = models.BooleanField(default=False)
+    num_completed = models.PositiveIntegerField(default=0)
+    num_open = models.PositiveIntegerField(default=0)
+    next_lease_expiry = models.DateTimeField(null=True, default=None)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        app_label = "assessment"
+        index_together = [
+            ("course_id", "item_id", "grading_completed", "created_at"),
+            ("course_id", "item_id", "position"),
+        ]
+
+    def has_expired_lease(self):
+        """
+        Check whether an open assessment counted by this entry has expired.
+
+        Returns:
+            bool
+
+        """
+        return self.next_lease_expiry is not None and self.next_lease_expiry <= now()
+
+    @classmethod
+    def _counts_by_author(cls, items, leases):
+        """
+        Count the completed and open assessments for each author.
+
+        Uses one grouped query for the completed assessments
+        and one for the unexpired leases.
+
+        Args:
+            items (QuerySet): The PeerWorkflowItems to count completed assessments from.
+            leases (QuerySet): The PeerWorkflowLeases to count open assessments from.
+
+        Returns:
+            dict mapping author IDs to `(num_completed, num_open, next_lease_expiry)`.
+            Authors without assessments are omitted.
+
+        """
+        counts = {
+            row['author_id']: (row['num_completed'], 0, None)
+            for row in items.filter(assessment__isnull=False).order_by().values('author_id').annotate(
+                num_completed=Count('id')
+            )
+        }
+        for row in leases.filter(expires_at__gt=now()).order_by().values('author_id').annotate(
+            num_open=Count('id'), next_lease_expiry=Min('expires_at')
+        ):
+            num_completed = counts.get(row['author_id'], (0,))[0]
+            counts[row['author_id']] = (num_completed, row['num_open'], row['next_lease_expiry'])
+        return counts
+
+    @classmethod
+    def _count_values(cls, author_id, counts):
+        """
+        Build the count fields of the queue entry for an author.
+        """
+        num_completed, num_open, next_lease_expiry = counts.get(author_id, (0, 0, None))
+        return {
+            'num_completed': num_completed,
+            'num_open': num_open,
+            'next_lease_expiry': next_lease_expiry,
+        }
+
+    @classmethod
+    def _entry_values(cls, author, counts):
+        """
+        Build the field values of the queue entry for an author.
+        """
+        values = cls._count_values(author.id, counts)
+        values.update({
+            'student_id': author.student_id,
+            'item_id': author.item_id,
+            'course_id': author.course_id,
+            'submission_uuid': author.submission_uuid,
+            'created_at': author.created_at,
+            'grading_completed': author.grading_completed_at is not None,
+        })
+        return values
+
+    @classmethod
+    def _next_position(cls, course_id, item_id):
+        """
+        Return the position after the last entry in a course item's queue.
+        """
+        last = cls.objects.filter(course_id=course_id, item_id=item_id).aggregate(last=Max('position'))['last']
+        return 0 if last is None else last + 1
+
+    @classmethod
+    def refresh(cls, author):
+        """
+        Recompute the queue entry for a submission from its PeerWorkflowItems and leases.
+
+        Args:
+            author (PeerWorkflow): The workflow of the submission's author.
+
+        Returns:
+            PeerWorkflowQueueEntry, or None if the workflow has been cancelled.
+
+        Raises:
+            DatabaseError
+
+        """
+        if author.is_cancelled:
+            # Cancelled submissions leave the queue, and release any checkouts
+            PeerWorkflowLease.objects.filter(author=author).delete()
+            cls.objects.filter(author=author).delete()
+            return None
+
+        values = cls._entry_values(author, cls._counts_by_author(author.graded_by.all(), author.leased_by.all()))
+        if not cls.objects.filter(author=author).update(**values):
+            values['position'] = cls._next_position(author.course_id, author.item_id)
+            try:
+                with transaction.atomic():
+                    cls.objects.create(author=author, **values)
+            except IntegrityError:
+                # Someone else created the entry first, so overwrite it with our counts.
+                cls.objects.filter(author=author).update(**values)
+        return cls(author=author, **values)
+
+    @classmethod
+    def rebuild(cls, authors):
+        """
+        Recreate the queue entries for many submissions at once.
+
+        Uses a fixed number of queries for the whole batch,
+        so this is suitable for backfilling the queue.
+
+        Args:
+            authors (list of PeerWorkflow): The workflows of the submissions' authors.
+
+        Returns:
+            int: The number of entries created.
+
+        Raises:
+            DatabaseError
+
+        """
+        author_ids = [author.id for author in authors]
+        counts = cls._counts_by_author(
+            PeerWorkflowItem.objects.filter(author_id__in=author_ids),
+            PeerWorkflowLease.objects.filter(author_id__in=author_ids)
+        )
+
+        # Rebuilt entries keep their positions, and missing entries are
+        # appended to the end of their item's queue, so rebuilding the
+        # queue again does not leave gaps in the positions.
+        positions = dict(cls.objects.filter(author_id__in=author_ids).values_list('author_id', 'position'))
+        next_positions = {}
+        entries = []
+        for author in authors:
+            if author.is_cancelled:
+                continue
+            position = positions.get(author.id)
+            if position is None:
+                key = (author.course_id, author.item_id)
+                if key not in next_positions:
+                    next_positions[key] = cls._next_position(*key)
+                position = next_positions[key]
+                next_positions[key] += 1
+            entries.append(cls(author=author, position=position, **cls._entry_values(author, counts)))
+
+        with transaction.atomic():
+            cls.objects.filter(author_id__in=author_ids).delete()
+            cls.objects.bulk_create(entries)
+        return len(entries)
+
+    @classmethod
+    def recount(cls, author_ids):
+        """
+        Recompute the counts of existing queue entries, keeping their positions.
+
+        Args:
+            author_ids (iterable of int): The IDs of the submissions' author workflows.
+
+        Raises:
+            DatabaseError
+
+        """
+        author_ids = list(author_ids)
+        counts = cls._counts_by_author(
+            PeerWorkflowItem.objects.filter(author_id__in=author_ids),
+            PeerWorkflowLease.objects.filter(author_id__in=author_ids)
+        )
+        for author_id in author_ids:
+            cls.objects.filter(author_id=author_id).update(**cls._count_values(author_id, counts))
+
+    def __repr__(self):
+        return (
+            "PeerWorkflowQueueEntry(submission_uuid={0.submission_uuid}, "
+            "course_id={0.course_id}, item_id={0.item_id}, "
+            "num_completed={0.num_completed}, num_open={0.num_open}, "
+            "next_lease_expiry={0.next_lease_expiry})"
+        ).format(self)
+
+    def __unicode__(self):
+        return repr(self)
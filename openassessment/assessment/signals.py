@@ -9,3 +9,15 @@ import django.dispatch
 # You can fire this signal from asynchronous processes (such as AI grading)
 # to notify receivers that an assessment is available.
 assessment_complete_signal = django.dispatch.Signal(providing_args=['submission_uuid'])    # pylint: disable=C0103
+
+# Indicate that a batch of assessments has completed, such as when
+# AI grading completes many workflows at once.  Receivers can handle
+# the whole batch together instead of one submission at a time.
+assessments_complete_signal = django.dispatch.Signal(providing_args=['submission_uuids'])    # pylint: disable=C0103
+
+# Indicate that an assessment has been created, which may change the workflows
+# of both the submission that was assessed and the scorer's own submission.
+# Receivers can use this to discard information they cached about either submission.
+assessment_created_signal = django.dispatch.Signal(    # pylint: disable=C0103
+    providing_args=['submission_uuid', 'scorer_submission_uuid']
+)
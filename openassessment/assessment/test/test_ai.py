@@ -545,7 +545,7 @@ class AIReschedulingTest(CacheResetTest):
             with self.assertRaises(AITrainingInternalError):
                 ai_api.reschedule_unfinished_tasks(course_id=COURSE_ID, item_id=ITEM_ID, task_type=None)
 
-    @mock.patch.object(AIGradingWorkflow, 'get_incomplete_workflows')
+    @mock.patch.object(AIGradingWorkflow, 'incomplete_workflow_chunks')
     def test_get_incomplete_workflows_error_grading(self, mock_incomplete):
         mock_incomplete.side_effect = DatabaseError
         with self.assertRaises(AIReschedulingInternalError):
@@ -587,6 +587,43 @@ class AIAutomaticGradingTest(CacheResetTest):
         # Check to make sure that all work is done.
         self._assert_complete(training_done=True, grading_done=True)
 
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS, ORA2_AI_GRADING_BATCH_SIZE=4)
+    def test_automatic_grade_in_batches(self):
+        for _ in range(0, 10):
+            submission = sub_api.create_submission(STUDENT_ITEM, ANSWER)
+            ai_api.on_init(submission['uuid'], rubric=RUBRIC, algorithm_id=ALGORITHM_ID)
+
+        # The workflows share a classifier set, so they are graded in batches
+        patched_method = 'openassessment.assessment.worker.grading.grade_essays_batch.apply_async'
+        with mock.patch(patched_method) as mock_grade:
+            ai_api.train_classifiers(RUBRIC, EXAMPLES, COURSE_ID, ITEM_ID, ALGORITHM_ID)
+            batch_sizes = [len(call[1]['args'][0]) for call in mock_grade.call_args_list]
+            self.assertEqual(batch_sizes, [4, 4, 2])
+
+    @override_settings(
+        ORA2_AI_ALGORITHMS=AI_ALGORITHMS, ORA2_AI_GRADING_BATCH_SIZE=4, ORA2_AI_RESCHEDULE_CHUNK_SIZE=3
+    )
+    def test_automatic_grade_in_chunks(self):
+        for _ in range(0, 10):
+            submission = sub_api.create_submission(STUDENT_ITEM, ANSWER)
+            ai_api.on_init(submission['uuid'], rubric=RUBRIC, algorithm_id=ALGORITHM_ID)
+
+        # The incomplete workflows are retrieved, assigned classifiers,
+        # and scheduled for grading a chunk at a time
+        patched_method = 'openassessment.assessment.worker.grading.grade_essays_batch.apply_async'
+        with mock.patch(patched_method) as mock_grade:
+            ai_api.train_classifiers(RUBRIC, EXAMPLES, COURSE_ID, ITEM_ID, ALGORITHM_ID)
+            batch_sizes = [len(call[1]['args'][0]) for call in mock_grade.call_args_list]
+            self.assertEqual(batch_sizes, [3, 3, 3, 1])
+
+        # Every workflow was assigned the new classifier set
+        classifier_set = AITrainingWorkflow.objects.get(course_id=COURSE_ID, item_id=ITEM_ID).classifier_set
+        workflows = AIGradingWorkflow.objects.filter(course_id=COURSE_ID, item_id=ITEM_ID)
+        self.assertEqual(
+            set(workflow.classifier_set_id for workflow in workflows),
+            set([classifier_set.pk])
+        )
+
     @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
     def test_automatic_grade_error(self):
         # Create some submissions which will not succeed. No classifiers yet exist.
@@ -4,11 +4,17 @@ Tests for AI algorithm implementations.
 """
 import unittest
 import json
+import multiprocessing
+import pickle
 import mock
+import numpy
 from openassessment.test_utils import CacheResetTest
+from django.test.utils import override_settings
+from openassessment.assessment import classifier_format
 from openassessment.assessment.worker.algorithm import (
-    AIAlgorithm, FakeAIAlgorithm, EaseAIAlgorithm,
-    TrainingError, InvalidClassifier
+    AIAlgorithm, FakeAIAlgorithm, EaseAIAlgorithm, HashedNgramAIAlgorithm,
+    TrainingError, InvalidClassifier,
+    ClassifierObjectCache, CLASSIFIER_OBJECT_CACHE
 )
 
 
@@ -23,6 +29,17 @@ EXAMPLES = [
     AIAlgorithm.ExampleEssay(u"one", 4),
 ]
 
+def _train_in_process(algorithm, examples_by_criterion, results):
+    """
+    Train classifiers in a pool of two processes, and put
+    the classifiers (or the error) on a queue.
+    """
+    try:
+        results.put(algorithm.train_classifiers(examples_by_criterion, processes=2))
+    except Exception as ex:   # pylint: disable=broad-except
+        results.put(repr(ex))
+
+
 INPUT_ESSAYS = [
     u"Good times, 𝑩𝒂𝒅 𝑻𝒊𝒎𝒆𝒔, you know I had my share",
     u"When my woman left home for a 𝒃𝒓𝒐𝒘𝒏 𝒆𝒚𝒆𝒅 𝒎𝒂𝒏",
@@ -42,6 +59,7 @@ class AIAlgorithmTest(CacheResetTest):
 
     def setUp(self):
         self.algorithm = self.ALGORITHM_CLASS()   # pylint:disable=E1102
+        CLASSIFIER_OBJECT_CACHE.clear()
 
     def _scores(self, classifier, input_essays):
         """
@@ -81,6 +99,308 @@ class FakeAIAlgorithmTest(AIAlgorithmTest):
         with self.assertRaises(InvalidClassifier):
             self.algorithm.score(u"Test input", {'scores': []}, {})
 
+    def test_train_classifiers(self):
+        examples_by_criterion = {
+            u"vøȼȺƀᵾłȺɍɏ": EXAMPLES,
+            u"ﻭɼค๓๓คɼ": [AIAlgorithm.ExampleEssay(example.text, 1) for example in EXAMPLES],
+        }
+        expected = {
+            u"vøȼȺƀᵾłȺɍɏ": {'scores': [0, 1, 2, 4]},
+            u"ﻭɼค๓๓คɼ": {'scores': [1]},
+        }
+        self.assertEqual(self.algorithm.train_classifiers(examples_by_criterion), expected)
+
+        # Train the criteria concurrently in a process pool
+        self.assertEqual(self.algorithm.train_classifiers(examples_by_criterion, processes=2), expected)
+
+    def test_train_classifiers_in_daemonic_process(self):
+        # Daemonic processes, such as Celery's worker processes,
+        # cannot start a pool, so they train the criteria serially.
+        examples_by_criterion = {
+            u"vøȼȺƀᵾłȺɍɏ": EXAMPLES,
+            u"ﻭɼค๓๓คɼ": [AIAlgorithm.ExampleEssay(example.text, 1) for example in EXAMPLES],
+        }
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_train_in_process, args=(self.algorithm, examples_by_criterion, results)
+        )
+        process.daemon = True
+        process.start()
+        classifiers = results.get(timeout=30)
+        process.join()
+        self.assertEqual(classifiers, {
+            u"vøȼȺƀᵾłȺɍɏ": {'scores': [0, 1, 2, 4]},
+            u"ﻭɼค๓๓คɼ": {'scores': [1]},
+        })
+
+
+class HashedNgramAIAlgorithmTest(AIAlgorithmTest):
+    """
+    Test for the NumPy hashed n-gram algorithm.
+    """
+    ALGORITHM_CLASS = HashedNgramAIAlgorithm
+
+    def test_algorithm_for_id(self):
+        self.assertIsInstance(AIAlgorithm.algorithm_for_id('ngram'), HashedNgramAIAlgorithm)
+
+    def test_train_and_score(self):
+        classifier = self.algorithm.train_classifier(EXAMPLES)
+        scores = self._scores(classifier, INPUT_ESSAYS)
+
+        # Check that we got scores in the correct range
+        valid_scores = set(example.score for example in EXAMPLES)
+        for score in scores:
+            self.assertIn(score, valid_scores)
+
+        # Scoring the essays together gives the same scores
+        self.assertEqual(self.algorithm.score_batch(INPUT_ESSAYS, classifier, {}), scores)
+
+    def test_scores_similar_essays(self):
+        examples = [
+            AIAlgorithm.ExampleEssay(u"the cat sat on the mat", 0),
+            AIAlgorithm.ExampleEssay(u"the cat purrs", 0),
+            AIAlgorithm.ExampleEssay(u"dogs bark loudly at night", 1),
+            AIAlgorithm.ExampleEssay(u"a dog barks", 1),
+            AIAlgorithm.ExampleEssay(u"Ṫ'ẅäṡ in Ṁöṛḋöṛ", 2),
+        ]
+        classifier = self.algorithm.train_classifier(examples)
+        self.assertEqual(
+            self._scores(classifier, [example.text for example in examples]),
+            [example.score for example in examples]
+        )
+        self.assertEqual(self._scores(classifier, [u"THE CAT", u"dogs bark", u"ṁöṛḋöṛ"]), [0, 1, 2])
+
+    def test_deterministic(self):
+        self.assertEqual(
+            self.algorithm.train_classifier(EXAMPLES),
+            self.algorithm.train_classifier(list(EXAMPLES))
+        )
+
+    def test_all_examples_have_same_score(self):
+        examples = [
+            AIAlgorithm.ExampleEssay(u"Test ëṡṡäÿ", 1),
+            AIAlgorithm.ExampleEssay(u"Another test ëṡṡäÿ", 1),
+        ]
+        classifier = self.algorithm.train_classifier(examples)
+        self.assertEqual(self._scores(classifier, INPUT_ESSAYS), [1] * len(INPUT_ESSAYS))
+
+    def test_examples_without_words(self):
+        examples = [
+            AIAlgorithm.ExampleEssay(u"", 1),
+            AIAlgorithm.ExampleEssay(u".!?", 2),
+        ]
+        classifier = self.algorithm.train_classifier(examples)
+        for score in self._scores(classifier, INPUT_ESSAYS):
+            self.assertIn(score, [1, 2])
+
+    def test_no_examples(self):
+        with self.assertRaises(TrainingError):
+            self.algorithm.train_classifier([])
+
+    def test_json_serializable(self):
+        classifier = self.algorithm.train_classifier(EXAMPLES)
+        deserialized = json.loads(json.dumps(classifier))
+        self.assertEqual(self._scores(deserialized, INPUT_ESSAYS), self._scores(classifier, INPUT_ESSAYS))
+
+    def test_features_shared_across_criteria(self):
+        first = self.algorithm.train_classifier(EXAMPLES)
+        second = self.algorithm.train_classifier([
+            AIAlgorithm.ExampleEssay(example.text, index % 2)
+            for index, example in enumerate(EXAMPLES)
+        ])
+        cache = {}
+        with mock.patch.object(self.algorithm, '_featurize', wraps=self.algorithm._featurize) as mock_featurize:
+            self.algorithm.score_batch(INPUT_ESSAYS, first, cache)
+            self.algorithm.score_batch(INPUT_ESSAYS, second, cache)
+        self.assertEqual(mock_featurize.call_count, 1)
+
+    def test_serialized_classifier_not_a_dict(self):
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm.score(u"Test ëṡṡäÿ", "not a dict", {})
+
+    def test_unsupported_version(self):
+        classifier = self.algorithm.train_classifier(EXAMPLES)
+        classifier['version'] = HashedNgramAIAlgorithm.VERSION + 1
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm.score(u"Test ëṡṡäÿ", classifier, {})
+
+    def test_classifier_missing_key(self):
+        classifier = self.algorithm.train_classifier(EXAMPLES)
+        del classifier['weights']
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm.score(u"Test ëṡṡäÿ", classifier, {})
+
+    def test_classifier_weights_do_not_match(self):
+        classifier = self.algorithm.train_classifier(EXAMPLES)
+        classifier['weights'] = classifier['weights'][1:]
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm.score(u"Test ëṡṡäÿ", classifier, {})
+
+
+class ClassifierObjectCacheTest(unittest.TestCase):
+    """
+    Tests for the process-local cache of deserialized classifiers.
+    """
+
+    def setUp(self):
+        self.cache = ClassifierObjectCache()
+
+    def test_get_and_put(self):
+        self.assertIs(self.cache.get('a'), None)
+        self.cache.put('a', 'classifier', 10, 100)
+        self.assertEqual(self.cache.get('a'), 'classifier')
+        self.assertEqual(self.cache.size, 10)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', 'first', 40, 100)
+        self.cache.put('b', 'second', 40, 100)
+
+        # Using the first classifier makes the second one the least recently used
+        self.cache.get('a')
+        self.cache.put('c', 'third', 40, 100)
+
+        self.assertEqual(self.cache.get('a'), 'first')
+        self.assertIs(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('c'), 'third')
+        self.assertEqual(self.cache.size, 80)
+
+    def test_replace(self):
+        self.cache.put('a', 'first', 40, 100)
+        self.cache.put('a', 'replaced', 30, 100)
+        self.assertEqual(self.cache.get('a'), 'replaced')
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.size, 30)
+
+    def test_too_large_to_cache(self):
+        self.cache.put('a', 'first', 40, 100)
+        self.cache.put('b', 'huge', 101, 100)
+        self.assertIs(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('a'), 'first')
+
+    def test_clear(self):
+        self.cache.put('a', 'first', 40, 100)
+        self.cache.clear()
+        self.assertIs(self.cache.get('a'), None)
+        self.assertEqual(self.cache.size, 0)
+
+
+class EaseLoadClassifiersTest(CacheResetTest):
+    """
+    Test that the EASE wrapper deserializes each classifier once per process.
+    This does not require EASE, since any picklable object can stand in for the classifiers.
+    """
+
+    def setUp(self):
+        self.algorithm = EaseAIAlgorithm()
+        self.classifier = self.algorithm._serialize_classifiers(['feature extractor'], {'score': 'classifier'})
+        CLASSIFIER_OBJECT_CACHE.clear()
+
+    def test_deserialize_once(self):
+        with mock.patch('openassessment.assessment.worker.algorithm.pickle.loads') as mock_loads:
+            mock_loads.side_effect = pickle.loads
+            for __ in range(3):
+                feature_extractor, score_classifier = self.algorithm._load_classifiers(self.classifier)
+
+            # Once for the feature extractor and once for the score classifier
+            self.assertEqual(mock_loads.call_count, 2)
+        self.assertEqual(feature_extractor, ['feature extractor'])
+        self.assertEqual(score_classifier, {'score': 'classifier'})
+
+    def test_retrained_classifier(self):
+        self.algorithm._load_classifiers(self.classifier)
+        retrained = self.algorithm._serialize_classifiers(['retrained'], {'score': 'classifier'})
+        feature_extractor, __ = self.algorithm._load_classifiers(retrained)
+        self.assertEqual(feature_extractor, ['retrained'])
+
+    def test_loaded_classifier_not_hashed_again(self):
+        # Classifiers read from storage carry the digests of their fields,
+        # so using them does not hash the serialized classifiers again.
+        data = classifier_format.dumps(self.classifier, binary_fields=EaseAIAlgorithm.BINARY_FIELDS)
+        loaded = classifier_format.loads(data, binary_fields=EaseAIAlgorithm.BINARY_FIELDS)
+        loaded = pickle.loads(pickle.dumps(loaded, pickle.HIGHEST_PROTOCOL))
+        with mock.patch.object(classifier_format, 'field_digest') as mock_digest:
+            for __ in range(3):
+                feature_extractor, __ = self.algorithm._load_classifiers(loaded)
+            self.algorithm._features([u"Test ëṡṡäÿ"], loaded, mock.Mock(), {}, lambda: None)
+        self.assertFalse(mock_digest.called)
+        self.assertEqual(feature_extractor, ['feature extractor'])
+
+    def test_loaded_classifier_not_base64_decoded(self):
+        # Classifiers read from storage hold the pickled bytes themselves
+        classifier = self.algorithm._serialize_classifiers(range(100), {'score': 'classifier' * 10})
+        data = classifier_format.dumps(classifier, binary_fields=EaseAIAlgorithm.BINARY_FIELDS)
+        loaded = classifier_format.loads(data, binary_fields=EaseAIAlgorithm.BINARY_FIELDS)
+        self.assertEqual(loaded.raw_fields, set(['feature_extractor', 'score_classifier']))
+        with mock.patch('openassessment.assessment.worker.algorithm.base64.b64decode') as mock_decode:
+            feature_extractor, score_classifier = self.algorithm._load_classifiers(loaded)
+        self.assertFalse(mock_decode.called)
+        self.assertEqual(feature_extractor, range(100))
+        self.assertEqual(score_classifier, {'score': 'classifier' * 10})
+
+    @override_settings(ORA2_AI_CLASSIFIER_OBJECT_CACHE_SIZE=0)
+    def test_cache_disabled(self):
+        self.algorithm._load_classifiers(self.classifier)
+        self.assertEqual(len(CLASSIFIER_OBJECT_CACHE), 0)
+
+    def test_invalid_classifier(self):
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm._load_classifiers("not a dict")
+        with self.assertRaises(InvalidClassifier):
+            self.algorithm._load_classifiers({'feature_extractor': "not base64"})
+
+
+class EaseFeatureCacheTest(CacheResetTest):
+    """
+    Test that the EASE wrapper re-uses the features extracted from essays.
+    This does not require EASE, since the feature extractor is mocked.
+    """
+
+    CLASSIFIER = {'feature_extractor': u"c2VyaWFsaXplZCBmZWF0dXJlIGV4dHJhY3Rvcg=="}
+    TEXTS = [u"Test ëṡṡäÿ", u"Another test ëṡṡäÿ"]
+
+    def setUp(self):
+        self.algorithm = EaseAIAlgorithm()
+        self.feature_extractor = mock.Mock()
+        self.feature_extractor.gen_feats.side_effect = lambda essay_set: numpy.array(
+            [[len(text), 1.0] for text in essay_set]
+        )
+
+    def test_reuse_across_criteria(self):
+        cache = {}
+        for __ in range(3):
+            features = self.algorithm._features(
+                self.TEXTS, self.CLASSIFIER, self.feature_extractor, cache, lambda: self.TEXTS
+            )
+        self.assertEqual(self.feature_extractor.gen_feats.call_count, 1)
+        self.assertEqual(features.tolist(), [[10.0, 1.0], [18.0, 1.0]])
+
+    def test_different_feature_extractors(self):
+        cache = {}
+        other_classifier = {'feature_extractor': u"b3RoZXIgZmVhdHVyZSBleHRyYWN0b3I="}
+        self.algorithm._features(self.TEXTS, self.CLASSIFIER, self.feature_extractor, cache, lambda: self.TEXTS)
+        self.algorithm._features(self.TEXTS, other_classifier, self.feature_extractor, cache, lambda: self.TEXTS)
+        self.assertEqual(self.feature_extractor.gen_feats.call_count, 2)
+
+    @override_settings(ORA2_AI_FEATURE_CACHE_TIMEOUT=60)
+    def test_persist_across_tasks(self):
+        first = self.algorithm._features(
+            self.TEXTS, self.CLASSIFIER, self.feature_extractor, {}, lambda: self.TEXTS
+        )
+
+        # A retried task (with a new in-memory cache) re-uses the stored features
+        second = self.algorithm._features(
+            self.TEXTS, self.CLASSIFIER, self.feature_extractor, {}, lambda: self.TEXTS
+        )
+        self.assertEqual(self.feature_extractor.gen_feats.call_count, 1)
+        self.assertEqual(first.tolist(), second.tolist())
+
+        # The features of a single essay can be re-used in a batch
+        third = self.algorithm._features(
+            self.TEXTS[:1], self.CLASSIFIER, self.feature_extractor, {}, lambda: self.TEXTS[:1]
+        )
+        self.assertEqual(self.feature_extractor.gen_feats.call_count, 1)
+        self.assertEqual(third.tolist(), [[10.0, 1.0]])
+
 
 # Try to import EASE -- if we can't, then skip the tests that require it
 try:
@@ -134,6 +454,23 @@ class EaseAIAlgorithmTest(AIAlgorithmTest):
         # checking that we got this far without an exception.
         self.assertEqual(len(scores), len(INPUT_ESSAYS))
 
+    def test_train_classifiers(self):
+        # Both criteria share the essay set created by EASE
+        examples_by_criterion = {
+            u"vøȼȺƀᵾłȺɍɏ": EXAMPLES,
+            u"ﻭɼค๓๓คɼ": [
+                AIAlgorithm.ExampleEssay(example.text, index % 2)
+                for index, example in enumerate(EXAMPLES)
+            ],
+        }
+        classifiers = self.algorithm.train_classifiers(examples_by_criterion, processes=2)
+        self.assertItemsEqual(classifiers.keys(), examples_by_criterion.keys())
+
+        for criterion_name, examples in examples_by_criterion.iteritems():
+            valid_scores = set(example.score for example in examples)
+            for score in self._scores(classifiers[criterion_name], INPUT_ESSAYS):
+                self.assertIn(score, valid_scores)
+
     def test_no_examples(self):
         with self.assertRaises(TrainingError):
             self.algorithm.train_classifier([])
@@ -2,16 +2,20 @@
 """
 Test AI Django models.
 """
+import base64
 import copy
+import json
 import ddt
+import mock
 from django.test import TestCase
 
 from django.test.utils import override_settings
 from openassessment.test_utils import CacheResetTest
 from openassessment.assessment.models import (
     AIClassifierSet, AIClassifier, AIGradingWorkflow, AI_CLASSIFIER_STORAGE,
-    CLASSIFIERS_CACHE_IN_MEM, essay_text_from_submission
+    CLASSIFIERS_CACHE_IN_MEM, CLASSIFIERS_CACHE_ON_DISK, essay_text_from_submission
 )
+from openassessment.assessment import classifier_format
 from openassessment.assessment.serializers import rubric_from_dict
 from .constants import RUBRIC
 
@@ -59,6 +63,24 @@ class AIClassifierTest(CacheResetTest):
         self.assertEqual(components[1], AI_CLASSIFIER_STORAGE)
         self.assertGreater(len(components[2]), 0)
 
+    def test_download_classifier_data(self):
+        classifier = self._create_classifier()
+        self.assertEqual(classifier.download_classifier_data(), CLASSIFIERS_DICT[classifier.criterion.name])
+
+        # Classifiers are stored in the binary container format
+        classifier = AIClassifier.objects.get(pk=classifier.pk)
+        self.assertTrue(classifier.classifier_data.read().startswith(classifier_format.MAGIC))
+
+    @override_settings(ORA2_AI_CLASSIFIER_FORMAT="json")
+    def test_download_json_classifier_data(self):
+        # Classifiers stored as JSON (as they were before the
+        # binary container format) can still be downloaded.
+        classifier = self._create_classifier()
+        self.assertEqual(json.loads(classifier.classifier_data.read()), CLASSIFIERS_DICT[classifier.criterion.name])
+
+        classifier = AIClassifier.objects.get(pk=classifier.pk)
+        self.assertEqual(classifier.download_classifier_data(), CLASSIFIERS_DICT[classifier.criterion.name])
+
     def _create_classifier(self):
         """
         Create and return an AIClassifier.
@@ -112,6 +134,72 @@ class AIClassifierSetTest(CacheResetTest):
         # Verify that we got the correct classifiers dict back
         self.assertEqual(first, second)
 
+    def test_disk_cache_missing_classifier(self):
+        first = self.classifier_set.classifier_data_by_criterion
+        CLASSIFIERS_CACHE_IN_MEM.clear()
+
+        # If another process evicted one of the classifiers,
+        # we download the classifiers again.
+        for criterion_name, classifier_data in first.iteritems():
+            content_key = CLASSIFIERS_CACHE_ON_DISK.content_key(
+                classifier_format.dumps(classifier_data)
+            )
+            CLASSIFIERS_CACHE_ON_DISK._remove(CLASSIFIERS_CACHE_ON_DISK._path(content_key))  # pylint:disable=W0212
+            break
+
+        with self.assertNumQueries(1):
+            second = self.classifier_set.classifier_data_by_criterion
+        self.assertEqual(first, second)
+
+
+    def test_classifiers_read_from_disk_cache(self):
+        # The downloaded classifiers are copied into the on-disk cache
+        # and read from there, instead of being read into memory.
+        content_keys = [
+            CLASSIFIERS_CACHE_ON_DISK.content_key(classifier.classifier_data.read())
+            for classifier in AIClassifier.objects.filter(classifier_set=self.classifier_set)
+        ]
+        with mock.patch.object(CLASSIFIERS_CACHE_ON_DISK, 'load', wraps=CLASSIFIERS_CACHE_ON_DISK.load) as mock_load:
+            classifiers = self.classifier_set.classifier_data_by_criterion
+        loaded_keys = [args[0] for args, __ in mock_load.call_args_list]
+        for content_key in content_keys:
+            self.assertIn(content_key, loaded_keys)
+        self.assertEqual(classifiers, CLASSIFIERS_DICT)
+
+    def test_classifiers_too_large_for_disk_cache(self):
+        # Classifiers that cannot be cached are read from storage again
+        with mock.patch.object(CLASSIFIERS_CACHE_ON_DISK, 'max_size', 1):
+            self.assertEqual(self.classifier_set.classifier_data_by_criterion, CLASSIFIERS_DICT)
+
+        # The classifier set is not cached on disk, since its classifiers are not
+        CLASSIFIERS_CACHE_IN_MEM.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.classifier_set.classifier_data_by_criterion, CLASSIFIERS_DICT)
+
+    def test_classifier_fields_returned_as_serialized(self):
+        # Classifiers of algorithms that do not declare binary fields
+        # are read back exactly as they were stored, even if their fields
+        # look like base64.
+        classifiers = {
+            name: {
+                'digest': u"0123456789abcdef" * 4,
+                'weights': base64.b64encode("\0" * 100),
+                'name': u"abcd" * 20,
+            }
+            for name in CLASSIFIERS_DICT
+        }
+        classifier_set = AIClassifierSet.create_classifier_set(
+            classifiers, rubric_from_dict(RUBRIC), "test_algorithm", COURSE_ID, ITEM_ID
+        )
+        self.assertEqual(classifier_set.classifier_data_by_criterion, classifiers)
+
+        # Also when read from the on-disk cache
+        CLASSIFIERS_CACHE_IN_MEM.clear()
+        self.assertEqual(classifier_set.classifier_data_by_criterion, classifiers)
+
+        for classifier in AIClassifier.objects.filter(classifier_set=classifier_set):
+            self.assertEqual(classifier.download_classifier_data(), classifiers[classifier.criterion.name])
+
 
 class AIGradingWorkflowTest(CacheResetTest):
     """
@@ -141,6 +229,40 @@ class AIGradingWorkflowTest(CacheResetTest):
         similar_rubric_dict['prompts'] = [{"description": 'Different prompt!'}]
         self.similar_rubric = rubric_from_dict(similar_rubric_dict)
 
+    def test_incomplete_workflow_chunks(self):
+        workflows = [self.workflow] + [
+            AIGradingWorkflow.objects.create(
+                submission_uuid='test', essay_text='test',
+                rubric=self.rubric, algorithm_id=self.ALGORITHM_ID,
+                item_id=self.ITEM_ID, course_id=self.COURSE_ID
+            )
+            for __ in range(4)
+        ]
+        workflows[1].mark_complete_and_save()
+        incomplete_pks = [workflow.pk for workflow in workflows if workflow.pk != workflows[1].pk]
+
+        # Each chunk is retrieved by a single query
+        with self.assertNumQueries(2):
+            chunks = list(AIGradingWorkflow.incomplete_workflow_chunks(self.COURSE_ID, self.ITEM_ID, chunk_size=3))
+        self.assertEqual([[workflow.pk for workflow in chunk] for chunk in chunks], [incomplete_pks[:3], incomplete_pks[3:]])
+
+        # Retrieve only some of the fields
+        chunks = list(AIGradingWorkflow.incomplete_workflow_chunks(
+            self.COURSE_ID, self.ITEM_ID, chunk_size=2, fields=['uuid']
+        ))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2])
+        self.assertEqual(set(chunks[0][0].keys()), set(['pk', 'uuid']))
+
+    def test_assign_classifier_set(self):
+        classifier_set = AIClassifierSet.create_classifier_set(
+            self.CLASSIFIERS_DICT, self.rubric, self.ALGORITHM_ID,
+            self.COURSE_ID, self.ITEM_ID
+        )
+        with self.assertNumQueries(1):
+            updated = AIGradingWorkflow.assign_classifier_set([self.workflow.pk], classifier_set)
+        self.assertEqual(updated, 1)
+        self.assertEqual(AIGradingWorkflow.objects.get(pk=self.workflow.pk).classifier_set, classifier_set)
+
     def test_assign_most_recent_classifier_set(self):
         # No classifier sets are available
         found = self.workflow.assign_most_recent_classifier_set()
@@ -6,14 +6,15 @@ import copy
 import datetime
 from uuid import uuid4
 import mock
-from django.db import DatabaseError
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 from django.core.files.base import ContentFile
 from submissions import api as sub_api
 from openassessment.test_utils import CacheResetTest
 from openassessment.assessment.api import ai_worker as ai_worker_api
 from openassessment.assessment.models import (
     AITrainingWorkflow, AIGradingWorkflow,
-    AIClassifier, AIClassifierSet, Assessment
+    AIClassifier, AIClassifierSet, Assessment, AssessmentPart
 )
 from openassessment.assessment.serializers import (
     rubric_from_dict, deserialize_training_examples
@@ -250,14 +251,27 @@ class AIWorkerGradingTest(CacheResetTest):
         self.assertItemsEqual(params, expected_params)
 
     def test_get_grading_task_params_num_queries(self):
-        with self.assertNumQueries(6):
+        # The valid scores are stored with the classifier set,
+        # so they do not require any queries of their own
+        with self.assertNumQueries(3):
             ai_worker_api.get_grading_task_params(self.workflow_uuid)
 
-        # The second time through we should be caching the queries
-        # to determine the valid scores for a classifier
+        # The second time through we should be caching the classifier data
         with self.assertNumQueries(2):
             ai_worker_api.get_grading_task_params(self.workflow_uuid)
 
+    def test_get_grading_task_params_valid_scores_not_stored(self):
+        # Classifier sets created before the valid scores were stored
+        # look them up once, then store them.
+        workflow = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid)
+        AIClassifierSet.objects.filter(pk=workflow.classifier_set_id).update(raw_valid_scores=u"")
+        params = ai_worker_api.get_grading_task_params(self.workflow_uuid)
+        self.assertEqual(params['valid_scores'], {
+            u"vøȼȺƀᵾłȺɍɏ": [0, 1, 2],
+            u"ﻭɼค๓๓คɼ": [0, 1, 2]
+        })
+        self.assertNotEqual(AIClassifierSet.objects.get(pk=workflow.classifier_set_id).raw_valid_scores, u"")
+
     def test_get_grading_task_params_no_workflow(self):
         with self.assertRaises(AIGradingRequestError):
             ai_worker_api.get_grading_task_params("invalid_uuid")
@@ -318,6 +332,132 @@ class AIWorkerGradingTest(CacheResetTest):
         with self.assertRaises(AIGradingInternalError):
             ai_worker_api.create_assessment(self.workflow_uuid, self.SCORES)
 
+    def test_get_grading_batch_params(self):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        params = ai_worker_api.get_grading_batch_params([self.workflow_uuid, other_workflow_uuid])
+        self.assertEqual(params['essays'], {self.workflow_uuid: ANSWER['text'], other_workflow_uuid: ANSWER['text']})
+        self.assertItemsEqual(params['classifier_set'], CLASSIFIERS)
+        self.assertEqual(params['algorithm_id'], ALGORITHM_ID)
+        self.assertEqual(params['valid_scores'], {
+            u"vøȼȺƀᵾłȺɍɏ": [0, 1, 2],
+            u"ﻭɼค๓๓คɼ": [0, 1, 2]
+        })
+
+    def test_get_grading_batch_params_skips_complete_workflows(self):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).mark_complete_and_save()
+        params = ai_worker_api.get_grading_batch_params([self.workflow_uuid, other_workflow_uuid])
+        self.assertEqual(params['essays'].keys(), [other_workflow_uuid])
+
+        # If every workflow is complete, there is nothing to grade
+        AIGradingWorkflow.objects.get(uuid=other_workflow_uuid).mark_complete_and_save()
+        self.assertIs(ai_worker_api.get_grading_batch_params([self.workflow_uuid, other_workflow_uuid]), None)
+
+    def test_get_grading_batch_params_different_classifier_sets(self):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        workflow = AIGradingWorkflow.objects.get(uuid=other_workflow_uuid)
+        workflow.classifier_set = AIClassifierSet.create_classifier_set(
+            CLASSIFIERS, rubric_from_dict(RUBRIC), ALGORITHM_ID,
+            STUDENT_ITEM.get('course_id'), STUDENT_ITEM.get('item_id')
+        )
+        workflow.save()
+        with self.assertRaises(AIGradingRequestError):
+            ai_worker_api.get_grading_batch_params([self.workflow_uuid, other_workflow_uuid])
+
+    def test_get_grading_batch_params_no_classifiers(self):
+        workflow = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid)
+        workflow.classifier_set = None
+        workflow.save()
+        with self.assertRaises(AIGradingInternalError):
+            ai_worker_api.get_grading_batch_params([self.workflow_uuid])
+
+    def test_create_assessments(self):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        ai_worker_api.create_assessments({
+            self.workflow_uuid: self.SCORES,
+            other_workflow_uuid: {u"vøȼȺƀᵾłȺɍɏ": 2, u"ﻭɼค๓๓คɼ": 2},
+        })
+        points = sorted(assessment.points_earned for assessment in Assessment.objects.all())
+        self.assertEqual(points, [1, 4])
+        self.assertFalse(AIGradingWorkflow.objects.filter(completed_at__isnull=True).exists())
+
+        # Workflows that are already complete are skipped
+        ai_worker_api.create_assessments({self.workflow_uuid: self.SCORES})
+        self.assertEqual(Assessment.objects.count(), 2)
+
+    def test_create_assessments_num_queries(self):
+        # Each assessment in a batch needs only one more query (to insert it)
+        with CaptureQueriesContext(connection) as single:
+            ai_worker_api.create_assessments({self.workflow_uuid: self.SCORES})
+
+        workflow_uuids = [self._create_workflow_with_same_classifiers() for __ in range(3)]
+        with CaptureQueriesContext(connection) as batch:
+            ai_worker_api.create_assessments({uuid: self.SCORES for uuid in workflow_uuids})
+
+        self.assertEqual(len(batch), len(single) + 2)
+        self.assertEqual(Assessment.objects.count(), 4)
+        for assessment in Assessment.objects.all():
+            self.assertEqual(assessment.parts.count(), 2)
+            self.assertEqual(assessment.points_earned, 1)
+        for workflow in AIGradingWorkflow.objects.all():
+            self.assertEqual(workflow.assessment.submission_uuid, workflow.submission_uuid)
+
+    @mock.patch('openassessment.assessment.signals.assessments_complete_signal.send')
+    def test_create_assessments_sends_one_signal(self, mock_send):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        other_submission_uuid = AIGradingWorkflow.objects.get(uuid=other_workflow_uuid).submission_uuid
+        ai_worker_api.create_assessments({
+            self.workflow_uuid: self.SCORES,
+            other_workflow_uuid: self.SCORES,
+        })
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertItemsEqual(
+            mock_send.call_args[1]['submission_uuids'],
+            [self.submission_uuid, other_submission_uuid]
+        )
+
+        # No signal is sent if every workflow was already complete
+        ai_worker_api.create_assessments({self.workflow_uuid: self.SCORES})
+        self.assertEqual(mock_send.call_count, 1)
+
+    def test_create_assessments_completed_concurrently(self):
+        # Another process completed one of the workflows after they were
+        # retrieved, so it is skipped when they are locked.
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+        workflows = list(AIGradingWorkflow.objects.filter(uuid__in=[self.workflow_uuid, other_workflow_uuid]))
+        AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).complete(self.SCORES)
+
+        completed = AIGradingWorkflow.complete_many(workflows, {
+            self.workflow_uuid: self.SCORES,
+            other_workflow_uuid: self.SCORES,
+        })
+        self.assertEqual([workflow.uuid for workflow in completed], [other_workflow_uuid])
+        self.assertEqual(Assessment.objects.count(), 2)
+        for workflow in AIGradingWorkflow.objects.all():
+            self.assertEqual(workflow.assessment.submission_uuid, workflow.submission_uuid)
+
+    def test_create_assessments_same_submission(self):
+        # Each workflow gets its own assessment, even if
+        # the workflows are for the same submission.
+        workflow = AIGradingWorkflow.start_workflow(self.submission_uuid, RUBRIC, ALGORITHM_ID)
+        workflow.classifier_set = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).classifier_set
+        workflow.save()
+        other_workflow_uuid = workflow.uuid
+        ai_worker_api.create_assessments({
+            self.workflow_uuid: self.SCORES,
+            other_workflow_uuid: self.SCORES,
+        })
+        assessment_ids = set(AIGradingWorkflow.objects.values_list('assessment', flat=True))
+        self.assertEqual(len(assessment_ids), 2)
+        self.assertEqual(Assessment.objects.count(), 2)
+
+    @mock.patch.object(AssessmentPart.objects, 'bulk_create')
+    def test_create_assessments_database_error(self, mock_call):
+        mock_call.side_effect = DatabaseError("KABOOM!")
+        with self.assertRaises(AIGradingInternalError):
+            ai_worker_api.create_assessments({self.workflow_uuid: self.SCORES})
+        self.assertFalse(AIGradingWorkflow.objects.filter(completed_at__isnull=False).exists())
+
     def test_is_workflow_complete(self):
         self.assertFalse(ai_worker_api.is_grading_workflow_complete(self.workflow_uuid))
         workflow = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid)
@@ -333,3 +473,17 @@ class AIWorkerGradingTest(CacheResetTest):
         mock_call.side_effect = DatabaseError("Oh no!")
         with self.assertRaises(AIGradingInternalError):
             ai_worker_api.is_grading_workflow_complete(self.workflow_uuid)
+
+    def _create_workflow_with_same_classifiers(self):
+        """
+        Create another grading workflow that uses the classifier set of the first.
+
+        Returns:
+            unicode: The UUID of the new workflow.
+
+        """
+        submission = sub_api.create_submission(STUDENT_ITEM, ANSWER)
+        workflow = AIGradingWorkflow.start_workflow(submission['uuid'], RUBRIC, ALGORITHM_ID)
+        workflow.classifier_set = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).classifier_set
+        workflow.save()
+        return workflow.uuid
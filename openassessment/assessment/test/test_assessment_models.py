@@ -10,6 +10,7 @@ from .constants import RUBRIC
 from openassessment.assessment.api.self import create_assessment
 from submissions.api import create_submission
 from openassessment.assessment.errors import SelfAssessmentRequestError
+from openassessment.assessment.signals import assessment_created_signal
 
 @ddt.ddt
 class AssessmentTest(CacheResetTest):
@@ -61,6 +62,49 @@ class AssessmentTest(CacheResetTest):
         self.assertEqual(assessment.points_earned, 0)
         self.assertEqual(assessment.points_possible, 0)
 
+    def test_scores_by_criterion(self):
+        rubric = self._rubric_with_one_feedback_only_criterion()
+        assessments = []
+        for scorer_id, option in [("Bob", u"𝓰𝓸𝓸𝓭"), ("Sue", u"𝒑𝒐𝒐𝒓")]:
+            assessment = Assessment.create(rubric, scorer_id, "submission UUID", "PE")
+            AssessmentPart.create_from_option_names(
+                assessment, {u"vøȼȺƀᵾłȺɍɏ": option, u"ﻭɼค๓๓คɼ": u"єχ¢єℓℓєηт"},
+                feedback={u"feedback": u"Nice"}
+            )
+            assessments.append(assessment)
+
+        with self.assertNumQueries(1):
+            scores = Assessment.scores_by_criterion(assessments)
+        self.assertEqual(scores, {u"vøȼȺƀᵾłȺɍɏ": [1, 0], u"ﻭɼค๓๓คɼ": [2, 2], u"feedback": [0, 0]})
+
+        # The second time, the scores are retrieved from the score summary
+        with self.assertNumQueries(0):
+            self.assertEqual(Assessment.scores_by_criterion(assessments), scores)
+
+        # A different set of assessments for the submission is cached separately
+        self.assertEqual(Assessment.scores_by_criterion(assessments[:1])[u"vøȼȺƀᵾłȺɍɏ"], [1])
+        with self.assertNumQueries(0):
+            self.assertEqual(Assessment.scores_by_criterion(assessments), scores)
+
+    def test_scores_by_criterion_caches_empty_scores(self):
+        assessment = Assessment.create(self._rubric_with_one_feedback_only_criterion(), "Bob", "submission UUID", "PE")
+        self.assertEqual(Assessment.scores_by_criterion([assessment]), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(Assessment.scores_by_criterion([assessment]), {})
+
+    def test_score_summary_cleared_by_new_assessment(self):
+        assessment = Assessment.create(self._rubric_with_one_feedback_only_criterion(), "Bob", "submission UUID", "PE")
+        Assessment.scores_by_criterion([assessment])
+
+        assessment_created_signal.send(sender=None, submission_uuid="submission UUID", scorer_submission_uuid=None)
+        with self.assertNumQueries(1):
+            Assessment.scores_by_criterion([assessment])
+
+    def test_score_summary_cache_key_length(self):
+        # Memcached keys must be shorter than 250 bytes
+        key = Assessment.score_summary_cache_key(u"𝓼𝓾𝓫𝓶𝓲𝓼𝓼𝓲𝓸𝓷" * 100)
+        self.assertLess(len(key), 250)
+
     def test_create_from_option_points_feedback_only_criterion(self):
         rubric = self._rubric_with_one_feedback_only_criterion()
         assessment = Assessment.create(rubric, "Bob", "submission UUID", "PE")
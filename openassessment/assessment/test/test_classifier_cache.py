@@ -0,0 +1,125 @@
+"""
+Tests for the shared on-disk classifier cache.
+"""
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+import time
+import unittest
+import mock
+from openassessment.assessment import classifier_cache
+from openassessment.assessment.classifier_cache import ClassifierFileCache
+
+
+class ClassifierFileCacheTest(unittest.TestCase):
+    """
+    Tests for the on-disk classifier cache.
+    """
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.cache = ClassifierFileCache(os.path.join(self.location, 'cache'), 100)
+
+    @mock.patch('openassessment.assessment.classifier_cache.dog_stats_api')
+    def test_put_and_load(self, mock_stats):
+        self.assertIs(self.cache.load('a', str), None)
+        self.assertTrue(self.cache.put('a', 'classifier data'))
+        self.assertEqual(self.cache.load('a', lambda buf: buf[:]), 'classifier data')
+        mock_stats.increment.assert_has_calls([
+            mock.call('openassessment.assessment.classifier_cache.miss'),
+            mock.call('openassessment.assessment.classifier_cache.bytes_written', value=15),
+            mock.call('openassessment.assessment.classifier_cache.hit'),
+            mock.call('openassessment.assessment.classifier_cache.bytes_read', value=15),
+        ])
+
+    @mock.patch.object(classifier_cache, 'READ_CHUNK_SIZE', 4)
+    def test_put_file(self):
+        key = self.cache.put_file(StringIO('classifier data'))
+        self.assertEqual(key, ClassifierFileCache.content_key('classifier data'))
+        self.assertEqual(self.cache.load(key, lambda buf: buf[:]), 'classifier data')
+
+    @mock.patch.object(classifier_cache, 'READ_CHUNK_SIZE', 4)
+    def test_put_file_too_large_to_cache(self):
+        fileobj = StringIO('x' * 200)
+        self.assertIs(self.cache.put_file(fileobj), None)
+        self.assertEqual(os.listdir(self.cache.location), [])
+
+        # The file is not read any further than the size limit
+        self.assertLessEqual(fileobj.tell(), 104)
+
+    def test_put_file_failed_read(self):
+        fileobj = mock.Mock()
+        fileobj.read.side_effect = IOError("Connection reset")
+        self.assertIs(self.cache.put_file(fileobj), None)
+        self.assertEqual(os.listdir(self.cache.location), [])
+
+    def test_shared_between_instances(self):
+        # Another process using the same directory sees the entry
+        self.cache.put('a', 'classifier data')
+        other = ClassifierFileCache(self.cache.location, 100)
+        self.assertEqual(other.load('a', lambda buf: buf[:]), 'classifier data')
+
+    def test_empty_entry(self):
+        self.cache.put('a', '')
+        self.assertEqual(self.cache.load('a', lambda buf: buf[:]), '')
+
+    def test_replace(self):
+        self.cache.put('a', 'first')
+        self.cache.put('a', 'replaced')
+        self.assertEqual(self.cache.load('a', lambda buf: buf[:]), 'replaced')
+        self.assertEqual(len(os.listdir(self.cache.location)), 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', 'x' * 40)
+        self.cache.put('b', 'y' * 40)
+        self._age('a', 20)
+        self._age('b', 10)
+
+        # Using the first entry makes the second one the least recently used
+        self.cache.load('a', len)
+        self.cache.put('c', 'z' * 40)
+
+        self.assertEqual(self.cache.load('a', len), 40)
+        self.assertIs(self.cache.load('b', len), None)
+        self.assertEqual(self.cache.load('c', len), 40)
+
+    def test_too_large_to_cache(self):
+        self.cache.put('a', 'x' * 40)
+        self.assertFalse(self.cache.put('b', 'x' * 101))
+        self.assertIs(self.cache.load('b', len), None)
+        self.assertEqual(self.cache.load('a', len), 40)
+
+    def test_failed_write(self):
+        # A write that fails part of the way through leaves no entry behind
+        self.cache.put('a', 'first')
+        with mock.patch('openassessment.assessment.classifier_cache.os.fsync') as mock_fsync:
+            mock_fsync.side_effect = OSError("Disk is full")
+            self.assertFalse(self.cache.put('a', 'replaced'))
+        self.assertEqual(self.cache.load('a', lambda buf: buf[:]), 'first')
+        self.assertEqual(len(os.listdir(self.cache.location)), 1)
+
+    def test_clear(self):
+        self.cache.put('a', 'classifier data')
+        self.cache.clear()
+        self.assertIs(self.cache.load('a', len), None)
+        self.assertEqual(os.listdir(self.cache.location), [])
+
+    def test_content_key(self):
+        self.assertEqual(
+            ClassifierFileCache.content_key('classifier data'),
+            ClassifierFileCache.content_key('classifier data')
+        )
+        self.assertNotEqual(
+            ClassifierFileCache.content_key('classifier data'),
+            ClassifierFileCache.content_key('retrained classifier data')
+        )
+
+    def _age(self, key, seconds):
+        """
+        Make an entry look as if it was last used `seconds` ago.
+        """
+        path = self.cache._path(key)  # pylint:disable=W0212
+        timestamp = time.time() - seconds
+        os.utime(path, (timestamp, timestamp))
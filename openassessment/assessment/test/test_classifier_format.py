@@ -0,0 +1,117 @@
+# coding=utf-8
+"""
+Tests for the binary container format used to store classifiers.
+"""
+import base64
+import json
+import mock
+import os
+import pickle
+from django.test import TestCase
+from openassessment.assessment import classifier_format
+
+
+CLASSIFIER = {
+    'feature_extractor': base64.b64encode(os.urandom(1000) + "\0" * 5000),
+    'score_classifier': base64.b64encode("\0" * 10000),
+    'scores': [0, 1, 2],
+    'name': u"𝒕𝒆𝒔𝒕 𝒄𝒍𝒂𝒔𝒔𝒊𝒇𝒊𝒆𝒓",
+}
+
+BINARY_FIELDS = ('feature_extractor', 'score_classifier')
+
+
+class ClassifierFormatTest(TestCase):
+    """
+    Tests for serializing and reading classifiers in the container format.
+    """
+
+    def test_round_trip(self):
+        for compress in [True, False]:
+            data = classifier_format.dumps(CLASSIFIER, compress=compress, binary_fields=BINARY_FIELDS)
+            self.assertEqual(classifier_format.loads(data, binary_fields=BINARY_FIELDS).encoded(), CLASSIFIER)
+
+    def test_base64_read_as_bytes(self):
+        data = classifier_format.dumps(CLASSIFIER, binary_fields=BINARY_FIELDS)
+        classifier = classifier_format.loads(data, binary_fields=BINARY_FIELDS)
+        self.assertEqual(classifier.raw_fields, set(BINARY_FIELDS))
+        self.assertEqual(classifier['score_classifier'], "\0" * 10000)
+        self.assertEqual(classifier['scores'], CLASSIFIER['scores'])
+
+        # The bytes are stored as they are, without being encoded again
+        self.assertEqual(classifier_format.dumps(classifier, binary_fields=BINARY_FIELDS), data)
+
+    def test_base64_stored_as_bytes(self):
+        # Without the base64 overhead (or compression), the container
+        # is smaller than the JSON-encoded classifier
+        data = classifier_format.dumps(CLASSIFIER, compress=False, binary_fields=BINARY_FIELDS)
+        self.assertLess(len(data), len(json.dumps(CLASSIFIER)) * 0.8)
+        self.assertLess(len(classifier_format.dumps(CLASSIFIER, binary_fields=BINARY_FIELDS)), len(data))
+
+    def test_strings_that_only_look_like_base64(self):
+        # Strings that base64-decode, but would not be re-encoded identically,
+        # must be stored as they are.
+        classifier = {'data': u"abcd" * 20 + u"\n", 'short': u"abcd"}
+        data = classifier_format.dumps(classifier, binary_fields=['data', 'short'])
+        self.assertEqual(classifier_format.loads(data, binary_fields=['data', 'short']).encoded(), classifier)
+
+    def test_only_binary_fields_read_as_bytes(self):
+        # Fields of other algorithms' classifiers are given back as they were
+        # serialized, even if they look like base64.
+        classifier = {
+            'digest': u"0123456789abcdef" * 4,
+            'weights': base64.b64encode("\0" * 100),
+            'name': u"abcd" * 20,
+            'scores': [0, 1, 2],
+        }
+        for compress in [True, False]:
+            loaded = classifier_format.loads(classifier_format.dumps(classifier, compress=compress))
+            self.assertEqual(loaded, classifier)
+            self.assertEqual(loaded.raw_fields, set())
+        self.assertEqual(classifier_format.loads(json.dumps(classifier), binary_fields=BINARY_FIELDS), classifier)
+
+    def test_binary_field_not_declared_when_read(self):
+        data = classifier_format.dumps(CLASSIFIER, binary_fields=BINARY_FIELDS)
+        self.assertEqual(classifier_format.loads(data), CLASSIFIER)
+
+    def test_digests(self):
+        for data in [classifier_format.dumps(CLASSIFIER, binary_fields=BINARY_FIELDS), json.dumps(CLASSIFIER)]:
+            classifier = classifier_format.loads(data, binary_fields=BINARY_FIELDS)
+            classifier = pickle.loads(pickle.dumps(classifier, pickle.HIGHEST_PROTOCOL))
+            self.assertEqual(classifier.encoded(), CLASSIFIER)
+            self.assertEqual(classifier.digests, {
+                name: classifier_format.field_digest(value)
+                for name, value in classifier.iteritems()
+            })
+
+    def test_classifier_not_a_dict(self):
+        for classifier in [[1, 2, 3], u"test data", None]:
+            self.assertEqual(classifier_format.loads(classifier_format.dumps(classifier)), classifier)
+
+    def test_read_json(self):
+        self.assertEqual(classifier_format.loads(json.dumps(CLASSIFIER)), CLASSIFIER)
+        classifier = classifier_format.loads(json.dumps(CLASSIFIER), binary_fields=BINARY_FIELDS)
+        self.assertEqual(classifier.raw_fields, set(BINARY_FIELDS))
+        self.assertEqual(classifier.encoded(), CLASSIFIER)
+
+    @mock.patch.object(classifier_format, 'READ_CHUNK_SIZE', 7)
+    def test_read_in_small_chunks(self):
+        for compress in [True, False]:
+            data = classifier_format.dumps(CLASSIFIER, compress=compress, binary_fields=BINARY_FIELDS)
+            self.assertEqual(classifier_format.loads(data, binary_fields=BINARY_FIELDS).encoded(), CLASSIFIER)
+
+    def test_read_from_buffer(self):
+        data = classifier_format.dumps(CLASSIFIER, compress=False, binary_fields=BINARY_FIELDS)
+        self.assertEqual(classifier_format.loads(buffer(data), binary_fields=BINARY_FIELDS).encoded(), CLASSIFIER)
+
+    def test_truncated(self):
+        data = classifier_format.dumps(CLASSIFIER, compress=False, binary_fields=BINARY_FIELDS)
+        for length in [len(classifier_format.MAGIC) + 1, len(data) / 2, len(data) - 1]:
+            with self.assertRaises(ValueError):
+                classifier_format.loads(data[:length])
+
+    def test_unsupported_version(self):
+        data = classifier_format.dumps(CLASSIFIER)
+        data = data[:len(classifier_format.MAGIC)] + chr(classifier_format.VERSION + 1) + data[len(classifier_format.MAGIC) + 1:]
+        with self.assertRaises(ValueError):
+            classifier_format.loads(data)
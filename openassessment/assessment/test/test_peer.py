@@ -4,6 +4,7 @@ import pytz
 import copy
 
 from django.db import DatabaseError, IntegrityError
+from django.core.cache import cache
 from django.utils import timezone
 from ddt import ddt, file_data
 from mock import patch
@@ -13,7 +14,7 @@ from openassessment.test_utils import CacheResetTest
 from openassessment.assessment.api import peer as peer_api
 from openassessment.assessment.models import (
     Assessment, AssessmentPart, AssessmentFeedback, AssessmentFeedbackOption,
-    PeerWorkflow, PeerWorkflowItem
+    PeerWorkflow, PeerWorkflowItem, PeerWorkflowLease, PeerWorkflowQueueEntry
 )
 from openassessment.workflow import api as workflow_api
 from submissions import api as sub_api
@@ -159,7 +160,7 @@ class TestPeerApi(CacheResetTest):
     Tests for the peer assessment API functions.
     """
 
-    CREATE_ASSESSMENT_NUM_QUERIES = 54
+    CREATE_ASSESSMENT_NUM_QUERIES = 58
 
     def test_create_assessment_points(self):
         self._create_student_and_submission("Tim", "Tim's answer")
@@ -391,6 +392,7 @@ class TestPeerApi(CacheResetTest):
         self.assertEqual(len(pwis), 1)
         pwis[0].started_at = yesterday
         pwis[0].save()
+        PeerWorkflowLease.objects.filter(item=pwis[0]).update(expires_at=yesterday + PeerWorkflow.TIME_LIMIT)
 
         sub = peer_api.get_submission_to_assess(tim_sub['uuid'], REQUIRED_GRADED)
         self.assertEqual(u"Bob's answer", sub['answer'])
@@ -902,6 +904,21 @@ class TestPeerApi(CacheResetTest):
         item = buffy_workflow.find_active_assessments()
         self.assertIsNone(item)
 
+    def test_find_active_assessments_expired(self):
+        buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        willow_answer, _ = self._create_student_and_submission("Willow", "Willow's answer")
+        buffy_workflow = PeerWorkflow.get_by_submission_uuid(buffy_answer['uuid'])
+
+        # Buffy opened assessments for both Xander and Willow, but both leases have expired
+        PeerWorkflow.create_item(buffy_workflow, xander_answer["uuid"])
+        PeerWorkflow.create_item(buffy_workflow, willow_answer["uuid"])
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        buffy_workflow.graded.update(started_at=yesterday)
+        buffy_workflow.leases.update(expires_at=yesterday + PeerWorkflow.TIME_LIMIT)
+
+        self.assertIsNone(buffy_workflow.find_active_assessments())
+
     def test_submission_cancelled_while_being_assessed(self):
         # Test that if student pulls the submission for review and the
         # submission is cancelled their assessment will not be accepted.
@@ -1012,6 +1029,145 @@ class TestPeerApi(CacheResetTest):
         submission_uuid = buffy_workflow.get_submission_for_review(3)
         self.assertNotEqual(xander_answer["uuid"], submission_uuid)
 
+    def test_review_queue_counts(self):
+        buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        willow_answer, willow = self._create_student_and_submission("Willow", "Willow's answer")
+
+        # Every submission starts in the queue with no assessments
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=xander_answer['uuid'])
+        self.assertEqual(entry.num_completed, 0)
+        self.assertEqual(entry.num_open, 0)
+        self.assertIsNone(entry.next_lease_expiry)
+
+        # Opening an assessment increments the open count
+        peer_api.get_submission_to_assess(willow_answer['uuid'], 1)
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=buffy_answer['uuid'])
+        self.assertEqual(entry.num_completed, 0)
+        self.assertEqual(entry.num_open, 1)
+        self.assertIsNotNone(entry.next_lease_expiry)
+
+        # Completing it moves the assessment from open to completed,
+        # and takes the submission out of the queue
+        peer_api.create_assessment(
+            willow_answer['uuid'], willow['student_id'],
+            ASSESSMENT_DICT['options_selected'],
+            ASSESSMENT_DICT['criterion_feedback'],
+            ASSESSMENT_DICT['overall_feedback'],
+            RUBRIC_DICT,
+            1,
+        )
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=buffy_answer['uuid'])
+        self.assertEqual(entry.num_completed, 1)
+        self.assertEqual(entry.num_open, 0)
+        self.assertTrue(entry.grading_completed)
+
+        # Cancelling a submission removes it from the queue
+        workflow_api.cancel_workflow(
+            submission_uuid=xander_answer['uuid'],
+            comments="Inappropriate language",
+            cancelled_by_id=willow['student_id'],
+            assessment_requirements=STEP_REQUIREMENTS
+        )
+        self.assertFalse(PeerWorkflowQueueEntry.objects.filter(submission_uuid=xander_answer['uuid']).exists())
+
+    def test_review_queue_more_assessments_than_required(self):
+        buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        willow_answer, _ = self._create_student_and_submission("Willow", "Willow's answer")
+        willow_workflow = PeerWorkflow.get_by_submission_uuid(willow_answer['uuid'])
+
+        # Xander's submission has more assessments than are now required
+        # (for example, after the requirement was lowered, or from over grading)
+        PeerWorkflowQueueEntry.objects.filter(submission_uuid=xander_answer['uuid']).update(num_completed=5)
+        self.assertEqual(willow_workflow.get_submission_for_review(2), buffy_answer['uuid'])
+
+        PeerWorkflowQueueEntry.objects.filter(submission_uuid=buffy_answer['uuid']).update(num_completed=3)
+        self.assertIsNone(willow_workflow.get_submission_for_review(2))
+
+    def test_review_queue_expired_lease(self):
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
+        willow_answer, _ = self._create_student_and_submission("Willow", "Willow's answer")
+        buffy_workflow = PeerWorkflow.get_by_submission_uuid(buffy_answer['uuid'])
+        willow_workflow = PeerWorkflow.get_by_submission_uuid(willow_answer['uuid'])
+
+        # Buffy leases Xander's submission, so Willow skips it
+        PeerWorkflow.create_item(buffy_workflow, xander_answer['uuid'])
+        self.assertEqual(willow_workflow.get_submission_for_review(1), buffy_answer['uuid'])
+
+        # Once Buffy's lease expires, Xander's submission is back in the queue
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        PeerWorkflowLease.objects.filter(item__submission_uuid=xander_answer['uuid']).update(
+            expires_at=yesterday + PeerWorkflow.TIME_LIMIT
+        )
+        PeerWorkflowQueueEntry.objects.filter(submission_uuid=xander_answer['uuid']).update(
+            next_lease_expiry=yesterday + PeerWorkflow.TIME_LIMIT
+        )
+        self.assertEqual(willow_workflow.get_submission_for_review(1), xander_answer['uuid'])
+
+        # The stale open count has been corrected
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=xander_answer['uuid'])
+        self.assertEqual(entry.num_open, 0)
+        self.assertIsNone(entry.next_lease_expiry)
+
+    def test_leases(self):
+        buffy_answer, buffy = self._create_student_and_submission("Buffy", "Buffy's answer")
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        willow_answer, _ = self._create_student_and_submission("Willow", "Willow's answer")
+        buffy_workflow = PeerWorkflow.get_by_submission_uuid(buffy_answer['uuid'])
+
+        # Opening an assessment checks the submission out to the scorer
+        item = PeerWorkflow.create_item(buffy_workflow, xander_answer['uuid'])
+        lease = PeerWorkflowLease.objects.get(item=item)
+        self.assertEqual(lease.scorer, buffy_workflow)
+        self.assertEqual(lease.expires_at, item.started_at + PeerWorkflow.TIME_LIMIT)
+        self.assertEqual(buffy_workflow.find_active_assessments(), item)
+
+        # Completing the assessment releases the lease
+        peer_api.create_assessment(
+            buffy_answer['uuid'], buffy['student_id'],
+            ASSESSMENT_DICT['options_selected'],
+            ASSESSMENT_DICT['criterion_feedback'],
+            ASSESSMENT_DICT['overall_feedback'],
+            RUBRIC_DICT,
+            REQUIRED_GRADED_BY,
+        )
+        self.assertFalse(PeerWorkflowLease.objects.filter(item=item).exists())
+        self.assertIsNone(buffy_workflow.find_active_assessments())
+
+        # Cancelling the author's workflow releases the lease
+        item = PeerWorkflow.create_item(buffy_workflow, willow_answer['uuid'])
+        self.assertTrue(PeerWorkflowLease.objects.filter(item=item).exists())
+        peer_api.on_cancel(willow_answer['uuid'])
+        self.assertFalse(PeerWorkflowLease.objects.filter(item=item).exists())
+        self.assertIsNone(buffy_workflow.find_active_assessments())
+
+    def test_release_expired_leases(self):
+        buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
+        xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
+        willow_answer, _ = self._create_student_and_submission("Willow", "Willow's answer")
+        buffy_workflow = PeerWorkflow.get_by_submission_uuid(buffy_answer['uuid'])
+        willow_workflow = PeerWorkflow.get_by_submission_uuid(willow_answer['uuid'])
+
+        # Buffy's lease on Xander's submission has expired, Willow's lease has not
+        PeerWorkflow.create_item(buffy_workflow, xander_answer['uuid'])
+        PeerWorkflow.create_item(willow_workflow, buffy_answer['uuid'])
+        buffy_workflow.leases.update(expires_at=timezone.now() - datetime.timedelta(minutes=1))
+
+        self.assertEqual(PeerWorkflowLease.release_expired(), 1)
+        self.assertEqual(PeerWorkflowLease.release_expired(), 0)
+        self.assertFalse(buffy_workflow.leases.exists())
+        self.assertTrue(willow_workflow.leases.exists())
+
+        # The queue entries have been recounted without moving them
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=xander_answer['uuid'])
+        self.assertEqual(entry.num_open, 0)
+        self.assertIsNone(entry.next_lease_expiry)
+        self.assertEqual(entry.position, 1)
+        entry = PeerWorkflowQueueEntry.objects.get(submission_uuid=buffy_answer['uuid'])
+        self.assertEqual(entry.num_open, 1)
+
     def test_get_submission_for_over_grading(self):
         buffy_answer, _ = self._create_student_and_submission("Buffy", "Buffy's answer")
         xander_answer, _ = self._create_student_and_submission("Xander", "Xander's answer")
@@ -1034,6 +1190,43 @@ class TestPeerApi(CacheResetTest):
         if not (buffy_answer["uuid"] == submission_uuid or willow_answer["uuid"] == submission_uuid):
             self.fail("Submission was not Buffy or Willow's.")
 
+    def test_over_grading_never_own_or_already_scored(self):
+        answers = [
+            self._create_student_and_submission(name, u"{}'s answer".format(name))[0]
+            for name in ["Buffy", "Xander", "Willow", "Giles", "Anya"]
+        ]
+        buffy_workflow = PeerWorkflow.get_by_submission_uuid(answers[0]['uuid'])
+
+        # Entries are numbered in the order the submissions were created
+        positions = [
+            PeerWorkflowQueueEntry.objects.get(submission_uuid=answer['uuid']).position
+            for answer in answers
+        ]
+        self.assertEqual(positions, range(5))
+
+        # Buffy has already looked at Xander's and Giles' submissions
+        PeerWorkflow.create_item(buffy_workflow, answers[1]['uuid'])
+        PeerWorkflow.create_item(buffy_workflow, answers[3]['uuid'])
+
+        # Buffy gets the first submission at or after a random position
+        # that is not her own and that she has not already looked at.
+        for position, expected in [(0, 2), (2, 2), (3, 4), (4, 4)]:
+            with patch('openassessment.assessment.models.peer.random.randint') as mock_randint:
+                mock_randint.return_value = position
+                submission_uuid = buffy_workflow.get_submission_for_over_grading()
+            mock_randint.assert_called_once_with(0, 4)
+            self.assertEqual(submission_uuid, answers[expected]['uuid'])
+
+        # If there is nothing after the position, the queue wraps around
+        PeerWorkflow.create_item(buffy_workflow, answers[4]['uuid'])
+        with patch('openassessment.assessment.models.peer.random.randint') as mock_randint:
+            mock_randint.return_value = 3
+            self.assertEqual(buffy_workflow.get_submission_for_over_grading(), answers[2]['uuid'])
+
+        # Once Buffy has looked at everything, there is nothing left to over grade
+        PeerWorkflow.create_item(buffy_workflow, answers[2]['uuid'])
+        self.assertIsNone(buffy_workflow.get_submission_for_over_grading())
+
     def test_create_feedback_on_an_assessment(self):
         tim_sub, tim = self._create_student_and_submission("Tim", "Tim's answer")
         bob_sub, bob = self._create_student_and_submission("Bob", "Bob's answer")
@@ -1125,7 +1318,7 @@ class TestPeerApi(CacheResetTest):
         submitted_assessments = peer_api.get_submitted_assessments(bob_sub["uuid"], scored_only=False)
         self.assertEqual(1, len(submitted_assessments))
 
-    @patch.object(PeerWorkflow.objects, 'raw')
+    @patch.object(PeerWorkflowQueueEntry.objects, 'filter')
     @raises(peer_api.PeerAssessmentInternalError)
     def test_failure_to_get_review_submission(self, mock_filter):
         tim_answer, _ = self._create_student_and_submission("Tim", "Tim's answer", MONDAY)
@@ -1528,6 +1721,39 @@ class TestPeerApi(CacheResetTest):
         self.assertEqual(len(scored_assessments), 1)
         self.assertEqual(scored_assessments[0]['scorer_id'], tim['student_id'])
 
+    def test_get_score_uses_first_assessments(self):
+        requirements = {'must_grade': 1, 'must_be_graded_by': 2}
+        bob_sub, bob = self._create_student_and_submission('Bob', 'Bob submission')
+
+        # Three students assess Bob, but only the first two count towards his score
+        for name in ['Tim', 'Sally', 'Jane']:
+            sub, student = self._create_student_and_submission(name, name + ' submission')
+            peer_api.create_peer_workflow_item(sub['uuid'], bob_sub['uuid'])
+            peer_api.create_assessment(
+                sub['uuid'], student['student_id'],
+                ASSESSMENT_DICT['options_selected'], dict(), "",
+                RUBRIC_DICT, requirements['must_be_graded_by']
+            )
+
+        # Bob assesses someone else, satisfying his requirements
+        peer_api.get_submission_to_assess(bob_sub['uuid'], requirements['must_be_graded_by'])
+        peer_api.create_assessment(
+            bob_sub['uuid'], bob['student_id'],
+            ASSESSMENT_DICT['options_selected'], dict(), "",
+            RUBRIC_DICT, requirements['must_be_graded_by']
+        )
+
+        score = peer_api.get_score(bob_sub['uuid'], requirements)
+        self.assertEqual(score, {'points_earned': 6, 'points_possible': 14})
+        self.assertEqual(PeerWorkflowItem.objects.filter(submission_uuid=bob_sub['uuid'], scored=True).count(), 2)
+
+        # The medians are computed from the points of all the scored
+        # assessment parts, however many assessments there are
+        cache.clear()
+        with self.assertNumQueries(3):
+            median_scores = peer_api.get_assessment_median_scores(bob_sub['uuid'])
+        self.assertEqual(sum(median_scores.values()), 6)
+
     @raises(peer_api.PeerAssessmentInternalError)
     def test_create_assessment_database_error(self):
         self._create_student_and_submission("Bob", "Bob's answer")
@@ -233,6 +233,8 @@ class StudentTrainingAssessmentTest(CacheResetTest):
     def test_submitter_is_finished_invalid_requirements(self, requirements):
         with self.assertRaises(StudentTrainingRequestError):
             training_api.submitter_is_finished(self.submission_uuid, requirements)
+        with self.assertRaises(StudentTrainingRequestError):
+            training_api.submitters_are_finished([self.submission_uuid], requirements)
 
     def _assert_workflow_status(self, submission_uuid, num_completed, num_required):
         """
@@ -260,6 +262,10 @@ class StudentTrainingAssessmentTest(CacheResetTest):
         is_finished = training_api.submitter_is_finished(submission_uuid, requirements)
         self.assertEqual(is_finished, bool(num_completed >= num_required))
 
+        # The bulk check agrees
+        finished = training_api.submitters_are_finished([submission_uuid], requirements)
+        self.assertEqual(finished, {submission_uuid} if is_finished else set())
+
     def _expected_example(self, input_example, rubric):
         """
         Return the training example we would expect to retrieve for an example.
@@ -4,12 +4,15 @@ Tests for AI worker tasks.
 """
 from contextlib import contextmanager
 import itertools
+import unittest
 import mock
 from django.test.utils import override_settings
 from submissions import api as sub_api
 from openassessment.test_utils import CacheResetTest
 from openassessment.assessment.worker.training import train_classifiers, InvalidExample
-from openassessment.assessment.worker.grading import grade_essay
+from openassessment.assessment.worker.grading import (
+    grade_essay, grade_essays_batch, _closest_valid_scores
+)
 from openassessment.assessment.api import ai_worker as ai_worker_api
 from openassessment.assessment.models import AITrainingWorkflow, AIGradingWorkflow, AIClassifierSet
 from openassessment.assessment.worker.algorithm import (
@@ -75,6 +78,22 @@ AI_ALGORITHMS = {
 }
 
 
+class ClosestValidScoresTest(unittest.TestCase):
+    """
+    Test mapping the scores assigned by an algorithm to valid scores.
+    """
+
+    def test_closest_valid_scores(self):
+        scores = [-100, 0, 0.7, 1.2, 2, 2.5, 3, 4, 100]
+        self.assertEqual(_closest_valid_scores(scores, [0, 1, 2, 5]), [0, 0, 1, 1, 2, 2, 2, 5, 5])
+
+    def test_single_valid_score(self):
+        self.assertEqual(_closest_valid_scores([-1, 3, 10], [3]), [3, 3, 3])
+
+    def test_no_scores(self):
+        self.assertEqual(_closest_valid_scores([], [0, 1]), [])
+
+
 class CeleryTaskTest(CacheResetTest):
     """
     Test case for Celery tasks.
@@ -392,6 +411,60 @@ class AIGradingTaskTest(CeleryTaskTest):
         with self.assert_retry(grade_essay, AIGradingInternalError):
             grade_essay(self.workflow_uuid)
 
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch(self):
+        other_workflow_uuid = self._create_workflow_with_same_classifiers()
+
+        # The classifiers are used once per criterion for the whole batch
+        with mock.patch.object(StubAIAlgorithm, 'score_batch', autospec=True) as mock_score:
+            mock_score.return_value = [1, 1]
+            grade_essays_batch([self.workflow_uuid, other_workflow_uuid])
+            self.assertEqual(mock_score.call_count, len(self.CLASSIFIERS))
+
+        for workflow_uuid in [self.workflow_uuid, other_workflow_uuid]:
+            workflow = AIGradingWorkflow.objects.get(uuid=workflow_uuid)
+            self.assertIsNot(workflow.completed_at, None)
+            self.assertEqual(workflow.assessment.points_earned, 2)
+
+    @mock.patch('openassessment.assessment.api.ai_worker.create_assessments')
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch_invalid_scores(self, mock_create_assessments):
+        # If an algorithm provides a score that isn't in the rubric,
+        # we should choose the closest valid score.
+        self._set_algorithm_id(INVALID_SCORE_ALGORITHM_ID)
+        InvalidScoreAlgorithm.SCORE_CYCLE = itertools.cycle([-100, 100])
+        grade_essays_batch([self.workflow_uuid])
+        mock_create_assessments.assert_called_with({
+            self.workflow_uuid: {u"vøȼȺƀᵾłȺɍɏ": 0, u"ﻭɼค๓๓คɼ": 2}
+        })
+
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch_skips_completed_workflows(self):
+        AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).mark_complete_and_save()
+        with mock.patch('openassessment.assessment.api.ai_worker.create_assessments') as mock_create:
+            grade_essays_batch([self.workflow_uuid])
+            self.assertFalse(mock_create.called)
+
+    @mock.patch('openassessment.assessment.worker.grading.ai_worker_api.get_grading_batch_params')
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch_params_error(self, mock_call):
+        mock_call.side_effect = AIGradingInternalError("Test error")
+        with self.assert_retry(grade_essays_batch, AIGradingInternalError):
+            grade_essays_batch([self.workflow_uuid])
+
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch_score_error(self):
+        self._set_algorithm_id(ERROR_STUB_ALGORITHM_ID)
+        with self.assert_retry(grade_essays_batch, ScoreError):
+            grade_essays_batch([self.workflow_uuid])
+
+    @mock.patch('openassessment.assessment.worker.grading.ai_worker_api.create_assessments')
+    @override_settings(ORA2_AI_ALGORITHMS=AI_ALGORITHMS)
+    def test_grade_essays_batch_create_assessments_error(self, mock_call):
+        mock_call.side_effect = AIGradingInternalError
+        with self.assert_retry(grade_essays_batch, AIGradingInternalError):
+            grade_essays_batch([self.workflow_uuid])
+
     def _set_algorithm_id(self, algorithm_id):
         """
         Override the default algorithm ID for the grading workflow.
@@ -415,3 +488,17 @@ class AIGradingTaskTest(CeleryTaskTest):
         workflow.completed_at = None
         workflow.assessment = None
         workflow.save()
+
+    def _create_workflow_with_same_classifiers(self):
+        """
+        Create another grading workflow that uses the classifier set of the first.
+
+        Returns:
+            unicode: The UUID of the new workflow.
+
+        """
+        submission = sub_api.create_submission(STUDENT_ITEM, ANSWER)
+        workflow = AIGradingWorkflow.start_workflow(submission['uuid'], RUBRIC, ALGORITHM_ID)
+        workflow.classifier_set = AIGradingWorkflow.objects.get(uuid=self.workflow_uuid).classifier_set
+        workflow.save()
+        return workflow.uuid
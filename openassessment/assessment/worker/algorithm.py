@@ -7,18 +7,32 @@ except ImportError:
     import pickle
 
 from abc import ABCMeta, abstractmethod
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from hashlib import sha1
+import copy
 import importlib
+import multiprocessing
+import re
+import threading
 import traceback
 import base64
+import zlib
+import numpy
 from django.conf import settings
+from django.core.cache import cache as django_cache
+from openassessment.assessment import classifier_format
 
 
 DEFAULT_AI_ALGORITHMS = {
     'fake': 'openassessment.assessment.worker.algorithm.FakeAIAlgorithm',
-    'ease': 'openassessment.assessment.worker.algorithm.EaseAIAlgorithm'
+    'ease': 'openassessment.assessment.worker.algorithm.EaseAIAlgorithm',
+    'ngram': 'openassessment.assessment.worker.algorithm.HashedNgramAIAlgorithm',
 }
 
+# The default limit on the total size (in bytes) of the serialized
+# classifiers whose deserialized objects are kept in memory by each worker process.
+DEFAULT_CLASSIFIER_OBJECT_CACHE_SIZE = 256 * 1024 * 1024
+
 
 class AIAlgorithmError(Exception):
     """
@@ -69,6 +83,88 @@ class InvalidClassifier(ScoreError):
     pass
 
 
+class ClassifierObjectCache(object):
+    """
+    Process-local LRU cache of deserialized classifier objects.
+
+    Deserializing a classifier can take much longer than using it to
+    score an essay, so workers keep the classifiers they have used recently.
+    The cache is limited by the total size of the serialized classifiers,
+    which is a reasonable proxy for the memory used by the objects;
+    the least recently used classifiers are evicted first.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """
+        The total size of the serialized classifiers in the cache.
+        """
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Retrieve the objects for a classifier, marking them as recently used.
+
+        Args:
+            key (str): Identifies the serialized classifier.
+
+        Returns:
+            The deserialized objects, or None if they are not cached.
+
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._entries[key] = entry
+            return entry[0]
+
+    def put(self, key, value, size, max_size):
+        """
+        Add the objects for a classifier, evicting the least recently
+        used classifiers until the cache fits in `max_size`.
+
+        Classifiers larger than `max_size` are not cached at all.
+
+        Args:
+            key (str): Identifies the serialized classifier.
+            value (object): The deserialized objects.
+            size (int): The size of the serialized classifier.
+            max_size (int): The maximum total size of the cache.
+
+        """
+        if size > max_size:
+            return
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._size -= old_entry[1]
+            while self._entries and self._size + size > max_size:
+                __, (__, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+            self._entries[key] = (value, size)
+            self._size += size
+
+    def clear(self):
+        """
+        Remove every classifier from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+CLASSIFIER_OBJECT_CACHE = ClassifierObjectCache()
+
+
 class AIAlgorithm(object):
     """
     Abstract base class for a supervised ML text classification algorithm.
@@ -82,6 +178,13 @@ class AIAlgorithm(object):
     # have a set of examples with non-adjacent scores.
     ExampleEssay = namedtuple('ExampleEssay', ['text', 'score'])
 
+    # Fields of the trained classifier that hold base64-encoded bytes.
+    # These are stored as the bytes they encode, and when the classifier is
+    # read back, they hold those bytes (and are listed in the classifier's
+    # `raw_fields`) instead of the base64-encoded string.  All other
+    # fields are given back to the algorithm exactly as it returned them.
+    BINARY_FIELDS = ()
+
     @abstractmethod
     def train_classifier(self, examples):
         """
@@ -118,6 +221,119 @@ class AIAlgorithm(object):
         """
         pass
 
+    def score_batch(self, texts, classifier, cache):
+        """
+        Score a batch of essays using a classifier.
+
+        The default implementation scores each essay separately;
+        algorithms that can score many essays at once should override this.
+
+        Args:
+            texts (list of unicode): The texts to classify.
+            classifier (JSON-serializable): A classifier, using the same format
+                as `train_classifier()`.
+            cache (dict): An in-memory cache that persists until all criteria
+                in the rubric have been scored for every essay in the batch.
+
+        Returns:
+            list of scores, in the same order as `texts`.
+
+        Raises:
+            InvalidClassifier: The provided classifier cannot be used by this algorithm.
+            ScoreError: An error occurred while scoring.
+
+        """
+        return [
+            self.score(text, classifier, cache.setdefault(('essay', index), dict()))
+            for index, text in enumerate(texts)
+        ]
+
+    def prepare_training(self, examples_by_criterion):
+        """
+        Do any work that is shared by the classifiers for every criterion
+        in a rubric, such as processing the text of the example essays.
+
+        The default implementation does nothing; algorithms that can
+        share work between criteria should override this along with
+        `train_prepared_classifier()`.
+
+        Args:
+            examples_by_criterion (dict): Maps criteria names to lists
+                of `AIAlgorithm.ExampleEssay`s.
+
+        Returns:
+            picklable: Data passed to `train_prepared_classifier()`, or None.
+
+        Raises:
+            TrainingError
+
+        """
+        return None
+
+    def train_prepared_classifier(self, examples, prepared):
+        """
+        Train a classifier using the data returned by `prepare_training()`.
+
+        The default implementation ignores the prepared data.
+
+        Args:
+            examples (list of AIAlgorithm.ExampleEssay): Example essays and scores.
+            prepared (picklable): The data returned by `prepare_training()`.
+
+        Returns:
+            JSON-serializable: The trained classifier.
+
+        Raises:
+            TrainingError
+
+        """
+        return self.train_classifier(examples)
+
+    def train_classifiers(self, examples_by_criterion, processes=1):
+        """
+        Train a classifier for each criterion in a rubric.
+
+        If `processes` is greater than one, the criteria are trained
+        concurrently in a pool of worker processes, each of which
+        also serializes the classifier it trains.  Daemonic processes
+        (such as the workers of a Celery prefork pool) are not allowed
+        to start child processes, so they always train serially.
+
+        Args:
+            examples_by_criterion (dict): Maps criteria names to lists
+                of `AIAlgorithm.ExampleEssay`s.
+
+        Keyword Arguments:
+            processes (int): The maximum number of processes to train with.
+
+        Returns:
+            dict: Maps criteria names to trained classifiers.
+
+        Raises:
+            TrainingError
+
+        """
+        prepared = self.prepare_training(examples_by_criterion)
+
+        # The examples are sent to the pool as plain tuples, since
+        # `AIAlgorithm.ExampleEssay` cannot be pickled.
+        jobs = [
+            (self, criterion_name, [tuple(example) for example in examples], prepared)
+            for criterion_name, examples in examples_by_criterion.iteritems()
+        ]
+
+        if processes > 1 and len(jobs) > 1 and not multiprocessing.current_process().daemon:
+            pool = multiprocessing.Pool(min(processes, len(jobs)))
+            try:
+                results = pool.map(_train_criterion, jobs)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            results = [_train_criterion(job) for job in jobs]
+
+        return dict(results)
+
     @classmethod
     def algorithm_for_id(cls, algorithm_id):
         """
@@ -148,6 +364,23 @@ class AIAlgorithm(object):
                 raise AlgorithmLoadError(algorithm_id, cls_path)
 
 
+def _train_criterion(job):
+    """
+    Train the classifier for a single criterion.
+    This is a module-level function so it can be run in a process pool.
+
+    Args:
+        job (tuple): `(algorithm, criterion_name, examples, prepared)`
+
+    Returns:
+        tuple of `(criterion_name, classifier)`
+
+    """
+    algorithm, criterion_name, examples, prepared = job
+    examples = [AIAlgorithm.ExampleEssay(*example) for example in examples]
+    return criterion_name, algorithm.train_prepared_classifier(examples, prepared)
+
+
 class FakeAIAlgorithm(AIAlgorithm):
     """
     Fake AI algorithm implementation that assigns scores randomly.
@@ -183,6 +416,8 @@ class EaseAIAlgorithm(AIAlgorithm):
     algorithm implementation instead.
     """
 
+    BINARY_FIELDS = ('feature_extractor', 'score_classifier')
+
     def train_classifier(self, examples):
         """
         Train a text classifier using the EASE library.
@@ -207,6 +442,77 @@ class EaseAIAlgorithm(AIAlgorithm):
         feature_ext, classifier = self._train_classifiers(examples)
         return self._serialize_classifiers(feature_ext, classifier)
 
+    def prepare_training(self, examples_by_criterion):
+        """
+        Process the example essays with EASE once for every criterion.
+
+        Every criterion is trained on the same essays (only the scores differ),
+        so we create a single EASE essay set to avoid repeating the expensive
+        NLTK operations, such as spelling correction and tagging parts of speech.
+
+        Args:
+            examples_by_criterion (dict): Maps criteria names to lists
+                of `AIAlgorithm.ExampleEssay`s.
+
+        Returns:
+            `ease.essay_set.EssaySet` or None if the criteria
+            were not trained on the same essays.
+
+        Raises:
+            TrainingError
+
+        """
+        texts = None
+        for examples in examples_by_criterion.itervalues():
+            criterion_texts = [example.text for example in examples]
+            if texts is None:
+                texts = criterion_texts
+            elif texts != criterion_texts:
+                return None
+
+        # With a single criterion, there is nothing to share
+        if not texts or len(examples_by_criterion) < 2:
+            return None
+
+        try:
+            from ease.essay_set import EssaySet    # pylint:disable=F0401
+        except ImportError:
+            msg = u"Could not import EASE to perform training."
+            raise TrainingError(msg)
+
+        try:
+            # The scores are replaced by each criterion's scores during training
+            essay_set = EssaySet()
+            for text in texts:
+                essay_set.add_essay(text, 0)
+            return essay_set
+        except:
+            msg = (
+                u"An unexpected error occurred while using "
+                u"EASE to process the training essays: {traceback}"
+            ).format(traceback=traceback.format_exc())
+            raise TrainingError(msg)
+
+    def train_prepared_classifier(self, examples, prepared):
+        """
+        Train a text classifier using the essay set created by `prepare_training()`.
+
+        Args:
+            examples (list of AIAlgorithm.ExampleEssay): Example essays and scores.
+            prepared (ease.essay_set.EssaySet): The processed example essays, or None.
+
+        Returns:
+            dict: The serializable classifier.
+
+        Raises:
+            TrainingError
+
+        """
+        if prepared is None:
+            return self.train_classifier(examples)
+        feature_ext, classifier = self._train_prepared_classifiers(examples, prepared)
+        return self._serialize_classifiers(feature_ext, classifier)
+
     def score(self, text, classifier, cache):
         """
         Score essays using EASE.
@@ -231,28 +537,32 @@ class EaseAIAlgorithm(AIAlgorithm):
             msg = u"Could not import EASE to grade essays."
             raise ScoreError(msg)
 
-        feature_extractor, score_classifier = self._deserialize_classifiers(classifier)
+        feature_extractor, score_classifier = self._load_classifiers(classifier)
 
         # The following is a modified version of `ease.grade.grade()`,
         # skipping things we don't use (cross-validation, feedback)
-        # and caching essay sets across criteria.  This allows us to
+        # and caching essay sets and features across criteria.  This allows us to
         # avoid some expensive NLTK operations, particularly tagging
         # parts of speech.
         try:
-            # Get the essay set from the cache or create it.
-            # Since all essays to be graded are assigned a dummy
-            # score of "0", we can safely re-use the essay set
-            # for each criterion in the rubric.
-            # EASE can't handle non-ASCII unicode, so we need
-            # to strip out non-ASCII chars.
-            essay_set = cache.get('grading_essay_set')
-            if essay_set is None:
-                essay_set = EssaySet(essaytype="test")
-                essay_set.add_essay(text.encode('ascii', 'ignore'), 0)
-                cache['grading_essay_set'] = essay_set
+            def _essay_set():
+                """
+                Get the essay set from the cache or create it.
+                Since all essays to be graded are assigned a dummy
+                score of "0", we can safely re-use the essay set
+                for each criterion in the rubric.
+                EASE can't handle non-ASCII unicode, so we need
+                to strip out non-ASCII chars.
+                """
+                essay_set = cache.get('grading_essay_set')
+                if essay_set is None:
+                    essay_set = EssaySet(essaytype="test")
+                    essay_set.add_essay(text.encode('ascii', 'ignore'), 0)
+                    cache['grading_essay_set'] = essay_set
+                return essay_set
 
             # Extract features from the text
-            features = feature_extractor.gen_feats(essay_set)
+            features = self._features([text], classifier, feature_extractor, cache, _essay_set)
 
             # Predict a score
             return int(score_classifier.predict(features)[0])
@@ -263,6 +573,116 @@ class EaseAIAlgorithm(AIAlgorithm):
             ).format(traceback=traceback.format_exc())
             raise ScoreError(msg)
 
+    def score_batch(self, texts, classifier, cache):
+        """
+        Score a batch of essays using EASE, extracting the features
+        of every essay in the batch in a single pass.
+
+        Args:
+            texts (list of unicode): The essay texts to score.
+            classifier (dict): The serialized classifiers created during training.
+            cache (dict): An in-memory cache that persists until all criteria
+                in the rubric have been scored for every essay in the batch.
+
+        Returns:
+            list of int
+
+        Raises:
+            InvalidClassifier
+            ScoreError
+
+        """
+        try:
+            from ease.essay_set import EssaySet    # pylint:disable=F0401
+        except ImportError:
+            msg = u"Could not import EASE to grade essays."
+            raise ScoreError(msg)
+
+        feature_extractor, score_classifier = self._load_classifiers(classifier)
+
+        try:
+            def _essay_set():
+                """
+                As in `score()`, the essay set is re-used for each criterion in the rubric.
+                """
+                essay_set = cache.get('grading_batch_essay_set')
+                if essay_set is None:
+                    essay_set = EssaySet(essaytype="test")
+                    for text in texts:
+                        essay_set.add_essay(text.encode('ascii', 'ignore'), 0)
+                    cache['grading_batch_essay_set'] = essay_set
+                return essay_set
+
+            # Extract features from all the texts and predict their scores together
+            features = self._features(texts, classifier, feature_extractor, cache, _essay_set)
+            return [int(score) for score in score_classifier.predict(features)]
+        except:
+            msg = (
+                u"An unexpected error occurred while using "
+                u"EASE to score essays: {traceback}"
+            ).format(traceback=traceback.format_exc())
+            raise ScoreError(msg)
+
+    def _features(self, texts, classifier_data, feature_extractor, cache, essay_set_func):
+        """
+        Extract the features of essays, re-using features that were
+        already extracted by the same feature extractor.
+
+        Criteria trained on the same essays often have identical feature
+        extractors, so the features are cached in the task's `cache`
+        dict by a fingerprint of the serialized feature extractor.
+        If ORA2_AI_FEATURE_CACHE_TIMEOUT is set, the features of each
+        essay are also stored in the Django cache for that many seconds,
+        so retried tasks and regrades can skip extracting them again.
+
+        Args:
+            texts (list of unicode): The essay texts.
+            classifier_data (dict): The serialized classifiers.
+            feature_extractor (ease.feature_extractor.FeatureExtractor): The deserialized feature extractor.
+            cache (dict): The task's in-memory cache.
+            essay_set_func (callable): Returns the EASE essay set for all the texts.
+
+        Returns:
+            numpy.ndarray: One row of features for each text.
+
+        """
+        fingerprint = self._digest(classifier_data, 'feature_extractor')
+        features = cache.get(('features', fingerprint))
+        if features is not None:
+            return features
+
+        timeout = getattr(settings, 'ORA2_AI_FEATURE_CACHE_TIMEOUT', None)
+        if not timeout:
+            features = feature_extractor.gen_feats(essay_set_func())
+            cache[('features', fingerprint)] = features
+            return features
+
+        keys = [
+            u"openassessment.assessment.ai.features.{text}.{extractor}".format(
+                text=sha1(text.encode('utf-8')).hexdigest(), extractor=fingerprint
+            )
+            for text in texts
+        ]
+        cached_rows = django_cache.get_many(keys)
+        missing = [index for index, key in enumerate(keys) if key not in cached_rows]
+
+        if missing:
+            if len(missing) == len(texts):
+                essay_set = essay_set_func()
+            else:
+                from ease.essay_set import EssaySet    # pylint:disable=F0401
+                essay_set = EssaySet(essaytype="test")
+                for index in missing:
+                    essay_set.add_essay(texts[index].encode('ascii', 'ignore'), 0)
+            new_rows = feature_extractor.gen_feats(essay_set)
+            new_rows = {keys[index]: new_rows[row:row + 1] for row, index in enumerate(missing)}
+            django_cache.set_many(new_rows, timeout)
+            cached_rows.update(new_rows)
+
+        features = numpy.vstack([cached_rows[key] for key in keys])
+        cache[('features', fingerprint)] = features
+        return features
+
     def _train_classifiers(self, examples):
         """
         Use EASE to train classifiers.
@@ -309,6 +729,58 @@ class EaseAIAlgorithm(AIAlgorithm):
 
         return results.get('feature_ext'), results.get('classifier')
 
+    def _train_prepared_classifiers(self, examples, essay_set):
+        """
+        Use EASE to train classifiers from an essay set that has already
+        been processed.  This is a modified version of `ease.create.create()`
+        that assigns the scores for a criterion to a copy of the essay set.
+
+        Args:
+            examples (list of AIAlgorithm.ExampleEssay): Example essays and scores.
+            essay_set (ease.essay_set.EssaySet): The processed example essays,
+                in the same order as `examples`.
+
+        Returns:
+            tuple of `feature_extractor` (an `ease.feature_extractor.FeatureExtractor` object)
+            and `classifier` (a `sklearn.ensemble.GradientBoostingClassifier` object).
+
+        Raises:
+            TrainingError: Could not load EASE or could not complete training.
+
+        """
+        try:
+            from ease import model_creator      # pylint: disable=F0401
+            from ease.create import select_algorithm    # pylint: disable=F0401
+        except ImportError:
+            msg = u"Could not import EASE to perform training."
+            raise TrainingError(msg)
+
+        input_scores = [example.score for example in examples]
+
+        try:
+            essay_set = copy.deepcopy(essay_set)
+            essay_set._score = list(input_scores)   # pylint: disable=W0212
+
+            # As in `ease.create.create()`, generate additional
+            # essays from the essays with the lowest score.
+            min_score = min(input_scores)
+            for index, score in enumerate(input_scores):
+                if score == min_score:
+                    essay_set.generate_additional_essays(essay_set._clean_text[index], score)  # pylint: disable=W0212
+            essay_set.update_prompt("")
+
+            feature_ext, classifier, __ = model_creator.extract_features_and_generate_model(
+                essay_set, algorithm=select_algorithm(input_scores)
+            )
+        except:
+            msg = (
+                u"An unexpected error occurred while using "
+                u"EASE to train classifiers: {traceback}"
+            ).format(traceback=traceback.format_exc())
+            raise TrainingError(msg)
+
+        return feature_ext, classifier
+
     def _serialize_classifiers(self, feature_ext, classifier):
         """
         Serialize the classifier objects.
@@ -336,6 +808,63 @@ class EaseAIAlgorithm(AIAlgorithm):
             ).format(ex=ex)
             raise TrainingError(msg)
 
+    def _load_classifiers(self, classifier_data):
+        """
+        Retrieve the deserialized classifier objects from the
+        process-local classifier cache, deserializing them on a miss.
+
+        The cache is keyed by the digests of the serialized classifiers, so
+        a retrained classifier can never be confused with an older one.
+
+        Args:
+            classifier_data (dict): The serialized classifiers.
+
+        Returns:
+            tuple of `(feature_extractor, score_classifier)`
+
+        Raises:
+            InvalidClassifier
+
+        """
+        max_size = getattr(settings, 'ORA2_AI_CLASSIFIER_OBJECT_CACHE_SIZE', DEFAULT_CLASSIFIER_OBJECT_CACHE_SIZE)
+        try:
+            fields = ['feature_extractor', 'score_classifier']
+            key = u".".join(self._digest(classifier_data, field) for field in fields)
+            size = sum(len(classifier_data[field]) for field in fields)
+        except (TypeError, KeyError, AttributeError):
+            # Let deserialization report what is wrong with the classifier
+            return self._deserialize_classifiers(classifier_data)
+
+        classifiers = CLASSIFIER_OBJECT_CACHE.get(key)
+        if classifiers is None:
+            classifiers = self._deserialize_classifiers(classifier_data)
+            CLASSIFIER_OBJECT_CACHE.put(key, classifiers, size, max_size)
+        return classifiers
+
+    def _digest(self, classifier_data, field):
+        """
+        Return the digest of a field of the serialized classifiers.
+
+        Classifiers loaded from storage carry the digests of their fields,
+        computed once when they were read; other classifiers are hashed here.
+
+        Args:
+            classifier_data (dict): The serialized classifiers.
+            field (unicode): The name of the field.
+
+        Returns:
+            str
+
+        Raises:
+            TypeError
+            KeyError
+
+        """
+        digests = getattr(classifier_data, 'digests', {})
+        if field in digests:
+            return digests[field]
+        return classifier_format.field_digest(classifier_data[field])
+
     def _deserialize_classifiers(self, classifier_data):
         """
         Deserialize the classifier objects.
@@ -354,8 +883,7 @@ class EaseAIAlgorithm(AIAlgorithm):
             raise InvalidClassifier("Classifier must be a dictionary.")
 
         try:
-            classifier_str = classifier_data.get('feature_extractor').encode('utf-8')
-            feature_extractor = pickle.loads(base64.b64decode(classifier_str))
+            feature_extractor = pickle.loads(self._pickled(classifier_data, 'feature_extractor'))
         except Exception as ex:
             msg = (
                 u"An error occurred while deserializing the "
@@ -364,8 +892,7 @@ class EaseAIAlgorithm(AIAlgorithm):
             raise InvalidClassifier(msg)
 
         try:
-            score_classifier_str = classifier_data.get('score_classifier').encode('utf-8')
-            score_classifier = pickle.loads(base64.b64decode(score_classifier_str))
+            score_classifier = pickle.loads(self._pickled(classifier_data, 'score_classifier'))
         except Exception as ex:
             msg = (
                 u"An error occurred while deserializing the "
@@ -374,3 +901,318 @@ class EaseAIAlgorithm(AIAlgorithm):
             raise InvalidClassifier(msg)
 
         return feature_extractor, score_classifier
+
+    def _pickled(self, classifier_data, field):
+        """
+        Return the pickled object stored in a field of the serialized classifiers.
+
+        Classifiers read from storage hold the pickled bytes themselves;
+        otherwise the field is a base64-encoded string.
+
+        Args:
+            classifier_data (dict): The serialized classifiers.
+            field (unicode): The name of the field.
+
+        Returns:
+            str
+
+        Raises:
+            TypeError
+            AttributeError
+
+        """
+        value = classifier_data.get(field)
+        if field in getattr(classifier_data, 'raw_fields', ()):
+            return value
+        return base64.b64decode(value.encode('utf-8'))
+
+
+class HashedNgramAIAlgorithm(AIAlgorithm):
+    """
+    Linear text classifier over hashed word n-grams, implemented with NumPy.
+
+    Each essay is represented by the counts of its words and pairs of
+    adjacent words, hashed into a fixed number of features so that no
+    vocabulary needs to be stored.  A one-vs-rest ridge classifier is then
+    trained for each score in closed form, which is deterministic and takes
+    milliseconds for the number of examples used to train a rubric.
+
+    Unlike EASE, this has no dependencies other than NumPy, and the
+    classifier is stored as plain JSON (the indices and weights of the
+    features seen in the examples), so it does not depend on the versions
+    of any libraries installed when it was trained.
+    """
+
+    # Incremented whenever the classifier format or the features change,
+    # so that old classifiers are rejected instead of scoring incorrectly.
+    VERSION = 1
+
+    NUM_FEATURES = 2 ** 20
+    NGRAM_SIZES = [1, 2]
+    REGULARIZATION = 1.0
+
+    TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+    # Used to combine the hashes of the words in an n-gram
+    HASH_MULTIPLIER = 1000003
+
+    # A classifier deserialized into NumPy arrays.
+    # `weights` has a row for each score and a column for each feature.
+    Model = namedtuple('Model', ['scores', 'num_features', 'ngram_sizes', 'features', 'weights', 'intercepts'])
+
+    def train_classifier(self, examples):
+        """
+        Train a classifier from example essays.
+
+        The classifier is serialized as a dictionary with keys:
+            * 'version': The version of the classifier format.
+            * 'num_features' and 'ngram_sizes': How the essays were turned into features.
+            * 'scores': The sorted scores that the classifier can assign.
+            * 'features': The sorted indices of the features that appear in the examples.
+            * 'weights': For each score, the weight of each feature.
+            * 'intercepts': For each score, the weight of an essay with no features.
+
+        Args:
+            examples (list of AIAlgorithm.ExampleEssay): Example essays and scores.
+
+        Returns:
+            dict: The serializable classifier.
+
+        Raises:
+            TrainingError: The classifier could not be trained successfully.
+
+        """
+        if len(examples) == 0:
+            raise TrainingError(u"At least one example essay is required to train a classifier.")
+
+        scores = sorted(set(example.score for example in examples))
+        classifier = {
+            'version': self.VERSION,
+            'num_features': self.NUM_FEATURES,
+            'ngram_sizes': self.NGRAM_SIZES,
+            'scores': scores,
+            'features': [],
+            'weights': [[] for __ in scores],
+            'intercepts': [0.0 for __ in scores],
+        }
+
+        # Every essay gets the only score that any example received
+        if len(scores) == 1:
+            return classifier
+
+        # Build a dense matrix of the features that appear in the examples
+        docs, features, values = self._featurize(
+            [example.text for example in examples], self.NUM_FEATURES, self.NGRAM_SIZES
+        )
+        model_features, columns = numpy.unique(features, return_inverse=True)
+        examples_matrix = numpy.zeros((len(examples), len(model_features)))
+        examples_matrix[docs, columns] = values
+
+        # Each score is separated from the others with targets of +1 and -1
+        targets = -numpy.ones((len(examples), len(scores)))
+        score_indices = numpy.searchsorted(scores, [example.score for example in examples])
+        targets[numpy.arange(len(examples)), score_indices] = 1.0
+
+        # Solve the ridge regression in its dual form, since there are far
+        # fewer examples than features.  Adding one to the kernel fits the intercepts.
+        kernel = numpy.dot(examples_matrix, examples_matrix.T) + 1.0
+        kernel += self.REGULARIZATION * numpy.identity(len(examples))
+        try:
+            dual = numpy.linalg.solve(kernel, targets)
+        except numpy.linalg.LinAlgError as ex:
+            msg = u"An error occurred while training the n-gram classifier: {ex}".format(ex=ex)
+            raise TrainingError(msg)
+
+        classifier['features'] = model_features.tolist()
+        classifier['weights'] = numpy.dot(examples_matrix.T, dual).T.tolist()
+        classifier['intercepts'] = dual.sum(axis=0).tolist()
+        return classifier
+
+    def score(self, text, classifier, cache):
+        """
+        Score an essay using a classifier.
+
+        Args:
+            text (unicode): The essay text to score.
+            classifier (dict): The serialized classifier created during training.
+            cache (dict): An in-memory cache that persists until all criteria
+                in the rubric have been scored.
+
+        Returns:
+            int
+
+        Raises:
+            InvalidClassifier
+
+        """
+        return self.score_batch([text], classifier, cache)[0]
+
+    def score_batch(self, texts, classifier, cache):
+        """
+        Score a batch of essays using a classifier, with a few
+        vectorized operations for the whole batch.
+
+        The features of the essays are cached, so they are extracted
+        once for all the criteria in the rubric.
+
+        Args:
+            texts (list of unicode): The essay texts to score.
+            classifier (dict): The serialized classifier created during training.
+            cache (dict): An in-memory cache that persists until all criteria
+                in the rubric have been scored for every essay in the batch.
+
+        Returns:
+            list of int
+
+        Raises:
+            InvalidClassifier
+
+        """
+        model = self._load_model(classifier)
+        if len(model.scores) == 1:
+            return [model.scores[0]] * len(texts)
+
+        cache_key = ('ngram_features', model.num_features, tuple(model.ngram_sizes))
+        if cache_key not in cache:
+            cache[cache_key] = self._featurize(texts, model.num_features, model.ngram_sizes)
+        docs, features, values = cache[cache_key]
+
+        # Ignore the features that did not appear in any of the examples
+        decisions = numpy.tile(model.intercepts, (len(texts), 1))
+        if len(model.features) > 0 and len(features) > 0:
+            positions = numpy.minimum(numpy.searchsorted(model.features, features), len(model.features) - 1)
+            known = model.features[positions] == features
+            docs, positions, values = docs[known], positions[known], values[known]
+            if len(docs) > 0:
+                contributions = model.weights[:, positions] * values
+                for index in range(len(model.scores)):
+                    decisions[:, index] += numpy.bincount(
+                        docs, weights=contributions[index], minlength=len(texts)
+                    )
+
+        return [model.scores[index] for index in decisions.argmax(axis=1)]
+
+    def _load_model(self, classifier):
+        """
+        Deserialize a classifier into NumPy arrays.
+
+        Args:
+            classifier (dict): The serialized classifier.
+
+        Returns:
+            HashedNgramAIAlgorithm.Model
+
+        Raises:
+            InvalidClassifier
+
+        """
+        if not isinstance(classifier, dict):
+            raise InvalidClassifier("Classifier must be a dictionary.")
+
+        if classifier.get('version') != self.VERSION:
+            msg = (
+                u"Classifier version {version} is not supported by the n-gram algorithm"
+            ).format(version=classifier.get('version'))
+            raise InvalidClassifier(msg)
+
+        try:
+            model = self.Model(
+                scores=[int(score) for score in classifier['scores']],
+                num_features=int(classifier['num_features']),
+                ngram_sizes=[int(size) for size in classifier['ngram_sizes']],
+                features=numpy.array(classifier['features'], dtype=numpy.int64),
+                weights=numpy.array(classifier['weights'], dtype=numpy.float64),
+                intercepts=numpy.array(classifier['intercepts'], dtype=numpy.float64),
+            )
+        except (KeyError, TypeError, ValueError) as ex:
+            msg = u"An error occurred while loading the n-gram classifier: {ex}".format(ex=ex)
+            raise InvalidClassifier(msg)
+
+        num_scores = len(model.scores)
+        if num_scores == 0:
+            raise InvalidClassifier("Classifier must provide score labels")
+        if model.intercepts.shape != (num_scores,) or model.weights.shape != (num_scores, len(model.features)):
+            raise InvalidClassifier("Classifier weights do not match its scores and features")
+        return model
+
+    def _featurize(self, texts, num_features, ngram_sizes):
+        """
+        Turn essays into sparse, normalized feature vectors.
+
+        Each feature counts the occurrences of the n-grams hashed to it.
+        The counts are dampened logarithmically, so that repeating a phrase
+        has less effect, and each essay's vector is scaled to unit length.
+
+        Args:
+            texts (list of unicode): The essay texts.
+            num_features (int): The number of features to hash n-grams into.
+            ngram_sizes (list of int): The numbers of words in each n-gram.
+
+        Returns:
+            tuple of NumPy arrays `(docs, features, values)`, with an entry
+            for each feature that occurs in each essay: the index of the
+            essay, the index of the feature, and the feature's value.
+
+        """
+        word_hashes, word_docs = self._hash_words(texts)
+        docs, hashed = [], []
+        for size in ngram_sizes:
+            # N-grams are hashed by combining the hashes of their words,
+            # skipping those that would span two essays.
+            num_ngrams = len(word_hashes) - size + 1
+            if num_ngrams <= 0:
+                continue
+            ngram_hashes = word_hashes[:num_ngrams].copy()
+            for offset in range(1, size):
+                ngram_hashes *= self.HASH_MULTIPLIER
+                ngram_hashes += word_hashes[offset:offset + num_ngrams]
+                ngram_hashes &= 0xffffffff
+            within_essay = word_docs[:num_ngrams] == word_docs[size - 1:]
+            docs.append(word_docs[:num_ngrams][within_essay])
+            hashed.append(ngram_hashes[within_essay] % num_features)
+
+        docs = numpy.concatenate(docs) if docs else numpy.zeros(0, dtype=numpy.int64)
+        if len(docs) == 0:
+            return docs, docs, numpy.zeros(0)
+
+        # Count each distinct (essay, feature) pair
+        keys = docs * num_features + numpy.concatenate(hashed)
+        keys, inverse = numpy.unique(keys, return_inverse=True)
+        counts = numpy.bincount(inverse)
+
+        docs = keys // num_features
+        features = keys % num_features
+        values = numpy.log1p(counts)
+        norms = numpy.sqrt(numpy.bincount(docs, weights=values ** 2, minlength=len(texts)))
+        return docs, features, values / norms[docs]
+
+    def _hash_words(self, texts):
+        """
+        Split essays into lowercase words and hash each word.
+
+        Words are hashed with CRC32, which (unlike Python's `hash()`)
+        gives the same result on every platform and Python version.
+
+        Args:
+            texts (list of unicode): The essay texts.
+
+        Returns:
+            tuple of NumPy arrays `(word_hashes, word_docs)`, with an entry
+            for each word in each essay, in order: the hash of the word
+            and the index of the essay.
+
+        """
+        hashes_by_word = dict()
+        word_hashes = []
+        lengths = []
+        for text in texts:
+            words = self.TOKEN_PATTERN.findall(text.lower())
+            for word in words:
+                word_hash = hashes_by_word.get(word)
+                if word_hash is None:
+                    word_hash = hashes_by_word[word] = zlib.crc32(word.encode('utf-8')) & 0xffffffff
+                word_hashes.append(word_hash)
+            lengths.append(len(words))
+
+        word_docs = numpy.repeat(numpy.arange(len(texts), dtype=numpy.int64), lengths)
+        return numpy.array(word_hashes, dtype=numpy.int64), word_docs
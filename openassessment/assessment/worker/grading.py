@@ -3,6 +3,8 @@ Asynchronous tasks for grading essays using text classifiers.
 """
 
 import datetime
+from collections import defaultdict
+import numpy
 from celery import task
 from django.db import DatabaseError
 from django.conf import settings
@@ -13,10 +15,17 @@ from openassessment.assessment.errors import (
     AIError, AIGradingInternalError, AIReschedulingInternalError, ANTICIPATED_CELERY_ERRORS
 )
 from .algorithm import AIAlgorithm, AIAlgorithmError
-from openassessment.assessment.models.ai import AIGradingWorkflow
+from openassessment.assessment.models.base import Rubric
+from openassessment.assessment.models.ai import AIGradingWorkflow, AIClassifierSet
 
 MAX_RETRIES = 2
 
+# The default number of essays graded by each task when rescheduling grading.
+GRADING_BATCH_SIZE = 50
+
+# The default number of incomplete workflows retrieved by each query when rescheduling grading.
+RESCHEDULE_CHUNK_SIZE = 1000
+
 logger = get_task_logger(__name__)
 
 # If the Django settings define a low-priority queue, use that.
@@ -79,21 +88,7 @@ def grade_essay(workflow_uuid):
         raise grade_essay.retry()
 
     # Validate that the we have valid scores for each criterion
-    for criterion_name in classifier_set.keys():
-        msg = None
-        if criterion_name not in valid_scores:
-            msg = (
-                u"Could not find {criterion} in the list of valid scores "
-                u"for grading workflow with UUID {uuid}"
-            ).format(criterion=criterion_name, uuid=workflow_uuid)
-        elif len(valid_scores[criterion_name]) == 0:
-            msg = (
-                u"Valid scores for {criterion} is empty for "
-                u"grading workflow with UUID {uuid}"
-            ).format(criterion=criterion_name, uuid=workflow_uuid)
-        if msg:
-            logger.exception(msg)
-            raise AIGradingInternalError(msg)
+    _validate_valid_scores(classifier_set, valid_scores, workflow_uuid)
 
     # Retrieve the AI algorithm
     try:
@@ -139,6 +134,94 @@ def grade_essay(workflow_uuid):
         raise grade_essay.retry()
 
 
+@task(max_retries=MAX_RETRIES)  # pylint: disable=E1102
+@dog_stats_api.timed('openassessment.assessment.ai.grade_essays_batch.time')
+def grade_essays_batch(workflow_uuids):
+    """
+    Asynchronous task to grade a batch of essays that share a
+    classifier set, so the classifiers are retrieved and
+    deserialized once for the whole batch instead of once per essay.
+
+    If the task could not be completed successfully, it will be
+    retried a few times.  Workflows completed by a previous attempt
+    (or by another task) are skipped.
+
+    Args:
+        workflow_uuids (list of str): The UUIDs of the grading workflows to complete.
+
+    Returns:
+        None
+
+    Raises:
+        AIError: An error occurred while making an AI worker API call.
+        AIAlgorithmError: An error occurred while retrieving or using an AI algorithm.
+
+    """
+    # Retrieve the task parameters
+    try:
+        params = ai_worker_api.get_grading_batch_params(workflow_uuids)
+        if params is None:
+            return
+        essays = params['essays']
+        classifier_set = params['classifier_set']
+        algorithm_id = params['algorithm_id']
+        valid_scores = params['valid_scores']
+    except (AIError, KeyError):
+        msg = (
+            u"An error occurred while retrieving the AI grading task "
+            u"parameters for the workflows with UUIDs {}"
+        ).format(workflow_uuids)
+        logger.exception(msg)
+        raise grade_essays_batch.retry()
+
+    # Validate that the we have valid scores for each criterion
+    _validate_valid_scores(classifier_set, valid_scores, workflow_uuids)
+
+    # Retrieve the AI algorithm
+    try:
+        algorithm = AIAlgorithm.algorithm_for_id(algorithm_id)
+    except AIAlgorithmError:
+        msg = (
+            u"An error occurred while retrieving "
+            u"the algorithm ID (grading workflow UUIDs {})"
+        ).format(workflow_uuids)
+        logger.exception(msg)
+        raise grade_essays_batch.retry()
+
+    # Score every essay in the batch for each criterion.
+    # Provide an in-memory cache so the algorithm can re-use
+    # results for multiple rubric criteria.
+    uuids = essays.keys()
+    texts = [essays[workflow_uuid] for workflow_uuid in uuids]
+    try:
+        cache = dict()
+        scores_by_workflow = {workflow_uuid: dict() for workflow_uuid in uuids}
+        for criterion_name, classifier in classifier_set.iteritems():
+            scores = _closest_valid_scores(
+                algorithm.score_batch(texts, classifier, cache), valid_scores[criterion_name]
+            )
+            for workflow_uuid, score in zip(uuids, scores):
+                scores_by_workflow[workflow_uuid][criterion_name] = score
+    except AIAlgorithmError:
+        msg = (
+            u"An error occurred while scoring essays using "
+            u"an AI algorithm (worker workflow UUIDs {})"
+        ).format(workflow_uuids)
+        logger.exception(msg)
+        raise grade_essays_batch.retry()
+
+    # Create the assessments and mark the workflows complete
+    try:
+        ai_worker_api.create_assessments(scores_by_workflow)
+    except AIError:
+        msg = (
+            u"An error occurred while creating assessments "
+            u"for the AI grading workflows with UUIDs {uuids}."
+        ).format(uuids=workflow_uuids)
+        logger.exception(msg)
+        raise grade_essays_batch.retry()
+
+
 @task(queue=RESCHEDULE_TASK_QUEUE, max_retries=MAX_RETRIES)  # pylint: disable=E1102
 @dog_stats_api.timed('openassessment.assessment.ai.reschedule_grading_tasks.time')
 def reschedule_grading_tasks(course_id, item_id):
@@ -158,90 +241,108 @@ def reschedule_grading_tasks(course_id, item_id):
     _log_start_reschedule_grading(course_id=course_id, item_id=item_id)
     start_time = datetime.datetime.now()
 
-    # Finds all incomplete grading workflows
-    try:
-        grading_workflows = AIGradingWorkflow.get_incomplete_workflows(course_id, item_id)
-    except (DatabaseError, AIGradingWorkflow.DoesNotExist) as ex:
-        msg = (
-            u"An unexpected error occurred while retrieving all incomplete "
-            u"grading tasks for course_id: {cid} and item_id: {iid}: {ex}"
-        ).format(cid=course_id, iid=item_id, ex=ex)
-        logger.exception(msg)
-        raise AIReschedulingInternalError(msg)
-
     # Notes whether or not one or more operations failed. If they did, the process of rescheduling will be retried.
     failures = 0
 
-    # A dictionary mapping tuples of (rubric, algorithm_id) to completed classifier sets. Used to avoid repeated
+    # Counts the workflows processed so far, for reporting progress.
+    processed = 0
+
+    # A dictionary mapping tuples of (rubric ID, algorithm_id) to completed classifier sets. Used to avoid repeated
     # queries which will return the same value. This loop implements a memoization of the the query.
     maintained_classifiers = {}
 
-    # Try to grade all incomplete grading workflows
-    for workflow in grading_workflows:
-
-        # We will always go through the process of finding the most recent set of classifiers for an
-        # incomplete grading workflow. The rationale for this is that if we are ever rescheduling
-        # grading, we likely had classifiers which were not working. This way, we always take the last
-        # completed set.
-
-        # Note that this solution will lead to failure if "Train Classifiers" and "Refinish Grading Tasks"
-        # are called in rapid succession. This is part of the reason this button is in the admin view.
-
-        # Tries to find a set of classifiers that are already defined in our maintained_classifiers based on a
-        # description of the workflow in the form of a tuple (rubric, course_id, item_id, algorithm_id)
-        workflow_description = (workflow.rubric, course_id, item_id, workflow.algorithm_id)
-        found_classifiers = maintained_classifiers.get(workflow_description)
-
-        # If no set of classifiers is found, we perform the query to try to find them. We take the most recent
-        # and add it to our dictionary of maintained classifiers for future reference.
-        if found_classifiers is None:
-            try:
-                found = workflow.assign_most_recent_classifier_set()
-                if found:
-                    found_classifiers = workflow.classifier_set
-                    maintained_classifiers[workflow_description] = found_classifiers
-                else:
-                    msg = u"No applicable classifiers yet exist for essay with uuid='{}'".format(workflow.uuid)
-                    logger.log(msg)
-            except DatabaseError as ex:
-                msg = (
-                    u"A Database error occurred while trying to assign classifiers to an essay with uuid='{id}'"
-                ).format(id=workflow.uuid)
-                logger.exception(msg)
-
-        # If we found classifiers in our memoized lookup dictionary, we assign them and save.
-        else:
-            workflow.classifier_set = found_classifiers
-            try:
-                workflow.save()
-                logger.info(
-                    u"Classifiers were successfully assigned to grading workflow with uuid={}".format(workflow.uuid)
-                )
-            except DatabaseError as ex:
-                msg = (
-                    u"A Database error occurred while trying to save classifiers to an essay with uuid='{id}'"
-                ).format(id=workflow.uuid)
-                logger.exception(msg)
-
-        if found_classifiers is not None:
+    chunk_size = getattr(settings, 'ORA2_AI_RESCHEDULE_CHUNK_SIZE', RESCHEDULE_CHUNK_SIZE)
+    batch_size = getattr(settings, 'ORA2_AI_GRADING_BATCH_SIZE', GRADING_BATCH_SIZE)
 
-            # Now we should (unless we had an exception above) have a classifier set.
-            # Try to schedule the grading
+    # Finds the incomplete grading workflows, a chunk at a time, retrieving only the fields we need
+    # (in particular, not the essay text, which the grading tasks retrieve for themselves).
+    chunks = AIGradingWorkflow.incomplete_workflow_chunks(
+        course_id, item_id, chunk_size=chunk_size, fields=['uuid', 'rubric', 'algorithm_id']
+    )
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        except (DatabaseError, AIGradingWorkflow.DoesNotExist) as ex:
+            msg = (
+                u"An unexpected error occurred while retrieving all incomplete "
+                u"grading tasks for course_id: {cid} and item_id: {iid}: {ex}"
+            ).format(cid=course_id, iid=item_id, ex=ex)
+            logger.exception(msg)
+            raise AIReschedulingInternalError(msg)
+
+        # Group the workflows in the chunk that will use the same classifiers
+        workflows_by_description = defaultdict(list)
+        for workflow in chunk:
+            workflows_by_description[(workflow['rubric'], workflow['algorithm_id'])].append(workflow)
+
+        for workflow_description, workflows in workflows_by_description.iteritems():
+            rubric_id, algorithm_id = workflow_description
+
+            # We will always go through the process of finding the most recent set of classifiers for an
+            # incomplete grading workflow. The rationale for this is that if we are ever rescheduling
+            # grading, we likely had classifiers which were not working. This way, we always take the last
+            # completed set.
+
+            # Note that this solution will lead to failure if "Train Classifiers" and "Refinish Grading Tasks"
+            # are called in rapid succession. This is part of the reason this button is in the admin view.
+            found_classifiers = maintained_classifiers.get(workflow_description)
+            if found_classifiers is None:
+                try:
+                    found_classifiers = AIClassifierSet.most_recent_classifier_set(
+                        Rubric.objects.get(pk=rubric_id), algorithm_id, course_id, item_id
+                    )
+                except (DatabaseError, Rubric.DoesNotExist):
+                    msg = (
+                        u"A Database error occurred while trying to find classifiers "
+                        u"for rubric with id={rid} and algorithm_id={aid}"
+                    ).format(rid=rubric_id, aid=algorithm_id)
+                    logger.exception(msg)
+                    failures += len(workflows)
+                    continue
+
+                if found_classifiers is None:
+                    logger.info(
+                        u"No applicable classifiers yet exist for {num} essays with rubric id={rid}".format(
+                            num=len(workflows), rid=rubric_id
+                        )
+                    )
+                    failures += len(workflows)
+                    continue
+                maintained_classifiers[workflow_description] = found_classifiers
+
+            # Assign the classifiers to every workflow in the group at once
             try:
-                grade_essay.apply_async(args=[workflow.uuid])
-                logger.info(
-                    u"Rescheduling of grading was successful for grading workflow with uuid='{}'".format(workflow.uuid)
+                AIGradingWorkflow.assign_classifier_set(
+                    [workflow['pk'] for workflow in workflows], found_classifiers
                 )
-            except ANTICIPATED_CELERY_ERRORS as ex:
+            except DatabaseError:
                 msg = (
-                    u"An error occurred while try to grade essay with uuid='{id}': {ex}"
-                ).format(id=workflow.uuid, ex=ex)
+                    u"A Database error occurred while trying to save classifiers to {num} essays"
+                ).format(num=len(workflows))
                 logger.exception(msg)
-                failures += 1
-
-        # If we couldn't assign classifiers, we failed.
-        else:
-            failures += 1
+                failures += len(workflows)
+                continue
+
+            # Try to schedule the grading, in batches of workflows that share a classifier set
+            workflow_uuids = [workflow['uuid'] for workflow in workflows]
+            for start in range(0, len(workflow_uuids), batch_size):
+                batch = workflow_uuids[start:start + batch_size]
+                try:
+                    grade_essays_batch.apply_async(args=[batch])
+                except ANTICIPATED_CELERY_ERRORS as ex:
+                    msg = (
+                        u"An error occurred while try to grade essays with uuids={ids}: {ex}"
+                    ).format(ids=batch, ex=ex)
+                    logger.exception(msg)
+                    failures += len(batch)
+
+        processed += len(chunk)
+        _log_reschedule_grading_progress(
+            course_id=course_id, item_id=item_id, processed=processed,
+            seconds=(datetime.datetime.now() - start_time).total_seconds()
+        )
 
     # Logs the data from our rescheduling attempt
     time_delta = datetime.datetime.now() - start_time
@@ -261,6 +362,36 @@ def reschedule_grading_tasks(course_id, item_id):
             raise reschedule_grading_tasks.retry()
 
 
+def _validate_valid_scores(classifier_set, valid_scores, workflow_uuid):
+    """
+    Check that there are valid scores for each criterion in a classifier set.
+
+    Args:
+        classifier_set (dict): Maps criterion names to serialized classifiers.
+        valid_scores (dict): Maps criterion names to lists of valid scores.
+        workflow_uuid (str or list): The UUID(s) of the grading workflow(s), for logging.
+
+    Raises:
+        AIGradingInternalError
+
+    """
+    for criterion_name in classifier_set.keys():
+        msg = None
+        if criterion_name not in valid_scores:
+            msg = (
+                u"Could not find {criterion} in the list of valid scores "
+                u"for grading workflow with UUID {uuid}"
+            ).format(criterion=criterion_name, uuid=workflow_uuid)
+        elif len(valid_scores[criterion_name]) == 0:
+            msg = (
+                u"Valid scores for {criterion} is empty for "
+                u"grading workflow with UUID {uuid}"
+            ).format(criterion=criterion_name, uuid=workflow_uuid)
+        if msg:
+            logger.exception(msg)
+            raise AIGradingInternalError(msg)
+
+
 def _closest_valid_score(score, valid_scores):
     """
     Return the closest valid score for a given score.
@@ -275,19 +406,38 @@ def _closest_valid_score(score, valid_scores):
         int
 
     """
-    # If the score is already valid, return it
-    if score in valid_scores:
-        return score
+    return _closest_valid_scores([score], valid_scores)[0]
 
-    # Otherwise, find the closest score in the list.
-    closest = valid_scores[0]
-    delta = abs(score - closest)
-    for valid in valid_scores[1:]:
-        new_delta = abs(score - valid)
-        if new_delta < delta:
-            closest = valid
-        delta = new_delta
-    return closest
+
+def _closest_valid_scores(scores, valid_scores):
+    """
+    Return the closest valid score for each of a batch of scores,
+    using a single binary search over the valid scores for the whole batch.
+    If a score is equally close to two valid scores, the lower one is chosen.
+
+    Args:
+        scores (list of int or float): The scores assigned by the algorithm.
+        valid_scores (list of int): Valid scores for this criterion,
+            assumed to be sorted in ascending order.
+
+    Returns:
+        list of int
+
+    """
+    valid_scores = numpy.asarray(valid_scores)
+    if len(valid_scores) == 1:
+        return [int(valid_scores[0])] * len(scores)
+
+    scores = numpy.asarray(scores, dtype=float)
+
+    # The index of the first valid score greater than or equal to each score,
+    # limited so that there is always a valid score on either side.
+    upper = numpy.clip(numpy.searchsorted(valid_scores, scores), 1, len(valid_scores) - 1)
+    lower = upper - 1
+    closest = numpy.where(
+        scores - valid_scores[lower] <= valid_scores[upper] - scores, lower, upper
+    )
+    return [int(score) for score in valid_scores[closest]]
 
 
 def _log_start_reschedule_grading(course_id=None, item_id=None):
@@ -308,6 +458,30 @@ def _log_start_reschedule_grading(course_id=None, item_id=None):
     logger.info(msg.format(cid=course_id, iid=item_id))
 
 
+def _log_reschedule_grading_progress(course_id=None, item_id=None, processed=0, seconds=0):
+    """
+    Reports the progress of rescheduling grading tasks after each chunk of workflows.
+
+    Args:
+        course_id (unicode): the course_id to tag the task with
+        item_id (unicode): the item_id to tag the task with
+        processed (int): the number of workflows processed so far
+        seconds (float): the number of seconds since rescheduling began
+    """
+    tags = [
+        u"course_id:{}".format(course_id),
+        u"item_id:{}".format(item_id),
+    ]
+    dog_stats_api.gauge('openassessment.assessment.ai_task.AIRescheduleGrading.processed', processed, tags=tags)
+
+    rate = processed / seconds if seconds > 0 else 0
+    msg = (
+        u"Rescheduled grading for {num} workflows for course_id={cid} and item_id={iid} "
+        u"in {s:.1f} seconds ({rate:.1f} workflows per second)"
+    ).format(num=processed, cid=course_id, iid=item_id, s=seconds, rate=rate)
+    logger.info(msg)
+
+
 def _log_complete_reschedule_grading(course_id=None, item_id=None, seconds=-1, success=False):
     """
     Sends the total time the rescheduling of grading tasks took to datadog
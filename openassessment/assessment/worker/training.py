@@ -118,11 +118,10 @@ def train_classifiers(workflow_uuid):
     # The AIAlgorithm subclass is responsible for ensuring that
     # the trained classifiers are JSON-serializable.
     try:
-        classifier_set = {
-            criterion_name: algorithm.train_classifier(examples_dict)
-            for criterion_name, examples_dict
-            in _examples_by_criterion(examples).iteritems()
-        }
+        classifier_set = algorithm.train_classifiers(
+            _examples_by_criterion(examples),
+            processes=getattr(settings, 'ORA2_AI_TRAINING_PROCESSES', 1)
+        )
     except InvalidExample:
         msg = (
             u"Training example format was not valid "
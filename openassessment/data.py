@@ -1,17 +1,210 @@
 """
 Aggregate data for openassessment.
 """
+from abc import ABCMeta, abstractmethod
+from collections import defaultdict, OrderedDict
 import csv
+import gzip
 import json
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from submissions import api as sub_api
+from submissions.models import Submission, Score
 from openassessment.workflow.models import AssessmentWorkflow
-from openassessment.assessment.models import AssessmentPart, AssessmentFeedback
+from openassessment.assessment.models import (
+    Assessment, AssessmentPart, AssessmentFeedback, AssessmentFeedbackOption
+)
+
+
+def _utf8(value):
+    """
+    Encode a value as a UTF-8 bytestring, converting non-string values to strings.
+    """
+    return value.encode('utf-8') if isinstance(value, unicode) else str(value)
+
+
+def _json_value(value, column_type):
+    """
+    Convert a value to the JSON representation of its column's type.
+    """
+    if value is None:
+        return None
+    elif column_type == 'int':
+        return int(value)
+    elif column_type == 'datetime' and hasattr(value, 'isoformat'):
+        return value.isoformat()
+    else:
+        return value.decode('utf-8') if isinstance(value, str) else unicode(value)
+
+
+class OutputFormat(object):
+    """
+    A format that `CsvWriter` can write a model's data in.
+
+    Rows are written in batches, so each format can encode a whole batch at
+    once.  Every format can be concatenated: the output of an export that
+    was split into shards, or that was continued from a checkpoint, is the
+    concatenation of the output written for each part.
+    """
+    __metaclass__ = ABCMeta
+
+    # The extension of files in this format
+    EXTENSION = None
+
+    def __init__(self, stream, headers, types):
+        """
+        Args:
+            stream (file-like): The stream to write to or read from.
+            headers (list of str): The names of the columns.
+            types (list of str): The type of each column: 'int', 'datetime' or 'string'.
+        """
+        self.stream = stream
+        self.headers = headers
+        self.types = types
+
+    def write_header(self):
+        """
+        Write anything that should only appear once at the start of the output.
+        """
+        pass
+
+    @abstractmethod
+    def write_rows(self, rows):
+        """
+        Encode and write a batch of rows.
+
+        Args:
+            rows (list of lists): The values of each row, in the order of the columns.
+
+        Returns:
+            None
+
+        """
+        pass
+
+    @abstractmethod
+    def read_rows(self):
+        """
+        Read the rows written in this format from the stream, skipping any headers.
+
+        Yields:
+            list: the values of each row, in the order of the columns.
+
+        """
+        pass
+
+
+class CsvFormat(OutputFormat):
+    """
+    UTF-8 CSV, with a row of headers.
+    """
+    EXTENSION = "csv"
+
+    def __init__(self, stream, headers, types):
+        super(CsvFormat, self).__init__(stream, headers, types)
+        self._writer = csv.writer(stream)
+
+    def write_header(self):
+        self._writer.writerow(self.headers)
+
+    def write_rows(self, rows):
+        self._writer.writerows([[_utf8(value) for value in row] for row in rows])
+
+    def read_rows(self):
+        # When the output of several exports is concatenated,
+        # only the first one starts with the headers.
+        for row in csv.reader(self.stream):
+            if row != self.headers:
+                yield [value.decode('utf-8') for value in row]
+
+
+class JsonLinesFormat(OutputFormat):
+    """
+    Gzip-compressed JSON Lines: a JSON object for each row, mapping column
+    names to values.  Integers are JSON numbers and datetimes are ISO 8601
+    strings.
+
+    Each batch is compressed as a separate gzip member, which standard gzip
+    tools read as a single file.
+    """
+    EXTENSION = "jsonl.gz"
+
+    def write_rows(self, rows):
+        if len(rows) == 0:
+            return
+
+        lines = [
+            json.dumps(OrderedDict(
+                (header, _json_value(value, column_type))
+                for header, column_type, value in zip(self.headers, self.types, row)
+            ))
+            for row in rows
+        ]
+        _write_gzip_member(self.stream, "\n".join(lines) + "\n")
+
+    def read_rows(self):
+        for line in gzip.GzipFile(fileobj=self.stream, mode='rb'):
+            row = json.loads(line)
+            yield [row.get(header) for header in self.headers]
+
+
+class ColumnarFormat(OutputFormat):
+    """
+    Gzip-compressed, typed, column-oriented row groups.
+
+    Each batch of rows is a row group: a gzip member holding a JSON object
+    with the number of rows and, for each column, its name, type and the
+    values of every row.  Storing each column's values together makes
+    the data compress better and lets readers load only the columns they need.
+    """
+    EXTENSION = "columnar.json.gz"
+
+    def write_rows(self, rows):
+        if len(rows) == 0:
+            return
+
+        row_group = {
+            'num_rows': len(rows),
+            'columns': [
+                {
+                    'name': header,
+                    'type': column_type,
+                    'values': [_json_value(value, column_type) for value in values],
+                }
+                for header, column_type, values in zip(self.headers, self.types, zip(*rows))
+            ],
+        }
+        _write_gzip_member(self.stream, json.dumps(row_group) + "\n")
+
+    def read_rows(self):
+        for line in gzip.GzipFile(fileobj=self.stream, mode='rb'):
+            row_group = json.loads(line)
+            values = {column['name']: column['values'] for column in row_group['columns']}
+            for row in zip(*[values[header] for header in self.headers]):
+                yield list(row)
+
+
+def _write_gzip_member(stream, data):
+    """
+    Compress data as a complete gzip member and write it to a stream.
+    """
+    with gzip.GzipFile(filename="", fileobj=stream, mode='wb', mtime=0) as gzip_file:
+        gzip_file.write(data)
+
+
+OUTPUT_FORMATS = {
+    'csv': CsvFormat,
+    'jsonl': JsonLinesFormat,
+    'columnar': ColumnarFormat,
+}
 
 
 class CsvWriter(object):
     """
     Dump openassessment data to CSV files.
+
+    Despite the name, the data can be written in any of the `OUTPUT_FORMATS`.
     """
 
     MODELS = [
@@ -48,12 +241,42 @@ class CsvWriter(object):
         ]
     }
 
+    # The type of each column in `HEADERS`, for typed output formats
+    TYPES = {
+        'assessment': [
+            'int', 'string', 'datetime',
+            'string', 'string',
+            'int', 'string',
+        ],
+        'assessment_part': [
+            'int', 'int',
+            'string', 'string',
+            'string', 'string', 'string'
+        ],
+        'assessment_feedback': [
+            'string', 'string', 'string'
+        ],
+        'assessment_feedback_option': [
+            'int', 'string'
+        ],
+        'submission': [
+            'string', 'string', 'string',
+            'datetime', 'datetime', 'string'
+        ],
+        'score': [
+            'string',
+            'int', 'int',
+            'datetime',
+        ]
+    }
+
     # Number of submissions to retrieve at a time
     # from the database.  We need to do this in order
     # to avoid loading thousands of records into memory at once.
     QUERY_INTERVAL = 100
 
-    def __init__(self, output_streams, progress_callback=None):
+    def __init__(self, output_streams, progress_callback=None, bulk=True, checkpoint_callback=None,
+                 output_format='csv'):
         """
         Configure where the writer will write data.
 
@@ -70,6 +293,15 @@ class CsvWriter(object):
             progress_callback (callable): Callable that accepts
                 no arguments.  Called once per submission loaded
                 from the database.
+            bulk (bool): If True (the default), load the data for each
+                chunk of `QUERY_INTERVAL` submissions with a fixed number
+                of queries.  If False, query the data for each submission
+                separately.
+            checkpoint_callback (callable): Callable that accepts a checkpoint
+                (see `write_to_csv`).  Called after each chunk of submissions
+                has been written and the output streams flushed.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`
+                to write the data in.
 
         Example usage:
             >>> output_streams = {
@@ -80,51 +312,188 @@ class CsvWriter(object):
             >>> writer.write_to_csv()
 
         """
+        format_cls = OUTPUT_FORMATS[output_format]
         self.writers = {
-            key: csv.writer(file_handle)
+            key: format_cls(file_handle, self.HEADERS[key], self.TYPES[key])
             for key, file_handle in output_streams.iteritems()
             if key in self.MODELS
         }
+        self.output_streams = output_streams
+
+        # Rows are buffered, then encoded and written in batches
+        self._rows = defaultdict(list)
         self._progress_callback = progress_callback
+        self._bulk = bulk
+        self._checkpoint_callback = checkpoint_callback
 
-    def write_to_csv(self, course_id):
+    def write_to_csv(self, course_id, checkpoint=None, end=None):
         """
-        Write assessment and submission data for a course to CSV files.
-
-        NOTE: The current implementation optimizes for memory usage,
-        but not for the number of database queries.  All the queries
-        use indexed fields (the submission uuid), so they should be
-        relatively quick.
+        Write assessment and submission data for a course to CSV files
+        (or files in the writer's output format).
+
+        In bulk mode, the submissions are processed in chunks of
+        `QUERY_INTERVAL`, loading each kind of data for the whole chunk
+        with one query, so both the number of queries and the memory used
+        are bounded by the chunk size.  Otherwise, the data is queried
+        separately for each submission.
+
+        After each chunk, the checkpoint callback (if any) receives a
+        JSON-serializable checkpoint.  If an export stops before it completes,
+        passing the last checkpoint continues it from the next submission,
+        appending to output streams that contain exactly the rows
+        written before the checkpoint.
+
+        To split an export into shards, pass the positions returned by
+        `shard_positions()` as the checkpoint and end of each shard.  Only
+        the first shard writes the headers, so the outputs of the shards
+        can be concatenated, except that each shard lists the feedback
+        options that its own submissions use.
 
         Args:
             course_id (unicode): The course ID from which to pull data.
 
+        Keyword Arguments:
+            checkpoint (dict): A checkpoint from a previous export of the course
+                to continue, or None to start from the beginning.
+            end (dict): The position of the last submission to write,
+                or None to continue to the end of the course.
+
         Returns:
             None
 
         """
-        self._write_csv_headers()
+        feedback_option_set = set()
+        if checkpoint is None:
+            self._write_csv_headers()
+        elif checkpoint.get('feedback_option_ids'):
+            feedback_option_set.update(self._use_read_replica(
+                AssessmentFeedbackOption.objects.filter(id__in=checkpoint['feedback_option_ids'])
+            ))
 
         rubric_points_cache = dict()
-        feedback_option_set = set()
-        for submission_uuid in self._submission_uuids(course_id):
-            self._write_submission_to_csv(submission_uuid)
-
-            # Django 1.4 doesn't follow reverse relations when using select_related,
-            # so we select AssessmentPart and follow the foreign key to the Assessment.
-            parts = self._use_read_replica(
-                AssessmentPart.objects.select_related('assessment', 'option', 'option__criterion')
-                    .filter(assessment__submission_uuid=submission_uuid)
-                    .order_by('assessment__pk')
-            )
-            self._write_assessment_to_csv(parts, rubric_points_cache)
+        for submission_uuids, position in self._submission_uuid_chunks(course_id, checkpoint, end):
+            if self._bulk:
+                self._write_chunk_to_csv(submission_uuids, rubric_points_cache, feedback_option_set)
+            else:
+                for submission_uuid in submission_uuids:
+                    self._write_submission_data_to_csv(submission_uuid, rubric_points_cache, feedback_option_set)
+
+            self._write_buffered_rows()
+            if self._checkpoint_callback is not None:
+                for output_stream in self.output_streams.itervalues():
+                    output_stream.flush()
+                created, workflow_id = position
+                self._checkpoint_callback({
+                    'created': created.isoformat(),
+                    'id': workflow_id,
+                    'feedback_option_ids': sorted(option.id for option in feedback_option_set),
+                })
+
+        # The set of available options should be relatively small,
+        # since they're not (currently) user-defined.
+        self._write_feedback_options_to_csv(feedback_option_set)
+        self._write_buffered_rows()
+
+    def _write_submission_data_to_csv(self, submission_uuid, rubric_points_cache, feedback_option_set):
+        """
+        Query and write the data for a single submission.
+
+        Args:
+            submission_uuid (unicode): The UUID of the submission to write.
+            rubric_points_cache (dict): in-memory cache of points possible by rubric ID.
+            feedback_option_set (set): The feedback options used so far, which is updated.
+
+        Returns:
+            None
+
+        """
+        self._write_submission_to_csv(submission_uuid)
+
+        # Django 1.4 doesn't follow reverse relations when using select_related,
+        # so we select AssessmentPart and follow the foreign key to the Assessment.
+        parts = self._use_read_replica(
+            AssessmentPart.objects.select_related('assessment', 'option', 'option__criterion')
+                .filter(assessment__submission_uuid=submission_uuid)
+                .order_by('assessment__pk')
+        )
+        self._write_assessment_to_csv(parts, rubric_points_cache)
+
+        feedback_query = self._use_read_replica(
+            AssessmentFeedback.objects
+                .filter(submission_uuid=submission_uuid)
+                .prefetch_related('options')
+        )
+        for assessment_feedback in feedback_query:
+            self._write_assessment_feedback_to_csv(assessment_feedback)
+            feedback_option_set.update(set(
+                option for option in assessment_feedback.options.all()
+            ))
+
+        if self._progress_callback is not None:
+            self._progress_callback()
+
+    def _write_chunk_to_csv(self, submission_uuids, rubric_points_cache, feedback_option_set):
+        """
+        Write the data for a chunk of submissions, loading each kind
+        of data for the whole chunk at once.
 
-            feedback_query = self._use_read_replica(
-                AssessmentFeedback.objects
-                    .filter(submission_uuid=submission_uuid)
-                    .prefetch_related('options')
+        The rows are written in the same order as when each
+        submission is queried separately.
+
+        Args:
+            submission_uuids (list of unicode): The UUIDs of the submissions to write.
+            rubric_points_cache (dict): in-memory cache of points possible by rubric ID.
+            feedback_option_set (set): The feedback options used so far, which is updated.
+
+        Returns:
+            None
+
+        """
+        submissions = {
+            submission.uuid: submission
+            for submission in self._use_read_replica(
+                Submission.objects.select_related('student_item').filter(uuid__in=submission_uuids)
             )
-            for assessment_feedback in feedback_query:
+        }
+
+        # Keep the latest score for each submission
+        scores = dict()
+        score_query = self._use_read_replica(
+            Score.objects.filter(submission__uuid__in=submission_uuids).order_by('-id')
+        ).values('submission__uuid', 'points_earned', 'points_possible', 'created_at')
+        for score in score_query:
+            scores.setdefault(score['submission__uuid'], score)
+
+        parts_by_submission = defaultdict(list)
+        parts_query = self._use_read_replica(
+            AssessmentPart.objects.select_related('assessment', 'criterion', 'option', 'option__criterion')
+                .filter(assessment__submission_uuid__in=submission_uuids)
+                .order_by('assessment__pk')
+        )
+        for part in parts_query:
+            parts_by_submission[part.assessment.submission_uuid].append(part)
+
+        feedback_by_submission = defaultdict(list)
+        feedback_query = self._use_read_replica(
+            AssessmentFeedback.objects
+                .filter(submission_uuid__in=submission_uuids)
+                .prefetch_related('options')
+        )
+        for assessment_feedback in feedback_query:
+            feedback_by_submission[assessment_feedback.submission_uuid].append(assessment_feedback)
+
+        for submission_uuid in submission_uuids:
+            submission = submissions.get(submission_uuid)
+            if submission is not None:
+                self._write_submission_row(submission)
+
+            score = scores.get(submission_uuid)
+            if score is not None:
+                self._write_score_row(submission_uuid, score)
+
+            self._write_assessment_to_csv(parts_by_submission[submission_uuid], rubric_points_cache)
+
+            for assessment_feedback in feedback_by_submission[submission_uuid]:
                 self._write_assessment_feedback_to_csv(assessment_feedback)
                 feedback_option_set.update(set(
                     option for option in assessment_feedback.options.all()
@@ -133,53 +502,231 @@ class CsvWriter(object):
             if self._progress_callback is not None:
                 self._progress_callback()
 
-        # The set of available options should be relatively small,
-        # since they're not (currently) user-defined.
+    def write_changes_to_csv(self, course_id, since, until):
+        """
+        Write the data for a course that was created or changed in a range of time.
+
+        Submissions are never changed, and neither are assessments or their
+        parts, so the export contains the submissions whose workflows were
+        created, the assessments (with their parts) that were scored,
+        and the feedback on assessments that was modified in the range.
+        Every score created in the range is written, in the order they
+        were created, so the last score written for a submission is its
+        latest score.
+
+        Each model is read in chunks of `QUERY_INTERVAL`, each of which is
+        an indexed range scan on the model's timestamp.  Exporting each
+        consecutive range of time (using the `until` of one export as the
+        `since` of the next) writes every change exactly once.
+
+        Args:
+            course_id (unicode): The course ID from which to pull data.
+            since (datetime): Only write data from after this time,
+                or None to start from the beginning.
+            until (datetime): Only write data from up to and including this time.
+
+        Returns:
+            None
+
+        """
+        self._write_csv_headers()
+
+        course_submission_uuids = self._use_read_replica(
+            AssessmentWorkflow.objects.filter(course_id=course_id)
+        ).values('submission_uuid')
+
+        # Submissions
+        workflows = AssessmentWorkflow.objects.filter(course_id=course_id)
+        for chunk in self._changed_chunks(workflows, 'created', since, until):
+            submission_uuids = [workflow.submission_uuid for workflow in chunk]
+            submissions = {
+                submission.uuid: submission
+                for submission in self._use_read_replica(
+                    Submission.objects.select_related('student_item').filter(uuid__in=submission_uuids)
+                )
+            }
+            for submission_uuid in submission_uuids:
+                if submission_uuid in submissions:
+                    self._write_submission_row(submissions[submission_uuid])
+                if self._progress_callback is not None:
+                    self._progress_callback()
+            self._write_buffered_rows()
+
+        # Scores
+        scores = Score.objects.select_related('submission').filter(submission__uuid__in=course_submission_uuids)
+        for chunk in self._changed_chunks(scores, 'created_at', since, until):
+            for score in chunk:
+                self._write_score_row(score.submission.uuid, {
+                    'points_earned': score.points_earned,
+                    'points_possible': score.points_possible,
+                    'created_at': score.created_at,
+                })
+            self._write_buffered_rows()
+
+        # Assessments and assessment parts
+        rubric_points_cache = dict()
+        assessments = Assessment.objects.filter(submission_uuid__in=course_submission_uuids)
+        for chunk in self._changed_chunks(assessments, 'scored_at', since, until):
+            parts_query = self._use_read_replica(
+                AssessmentPart.objects.select_related('assessment', 'criterion', 'option', 'option__criterion')
+                    .filter(assessment__in=[assessment.id for assessment in chunk])
+                    .order_by('assessment__pk')
+            )
+            self._write_assessment_to_csv(list(parts_query), rubric_points_cache)
+            self._write_buffered_rows()
+
+        # Feedback on assessments
+        feedback_option_set = set()
+        feedback = (
+            AssessmentFeedback.objects
+                .filter(submission_uuid__in=course_submission_uuids)
+                .prefetch_related('options')
+        )
+        for chunk in self._changed_chunks(feedback, 'modified_at', since, until):
+            for assessment_feedback in chunk:
+                self._write_assessment_feedback_to_csv(assessment_feedback)
+                feedback_option_set.update(set(
+                    option for option in assessment_feedback.options.all()
+                ))
+            self._write_buffered_rows()
+
         self._write_feedback_options_to_csv(feedback_option_set)
+        self._write_buffered_rows()
 
-    def _submission_uuids(self, course_id):
+    def _changed_chunks(self, queryset, timestamp_field, since, until):
         """
-        Iterate over submission uuids.
-        Makes database calls every N submissions to avoid loading
-        all submission uuids into memory at once.
+        Iterate over chunks of the models in a queryset with
+        a timestamp in a range, in the order of (timestamp, id).
+
+        Like `_submission_uuid_chunks()`, each chunk starts after the
+        (timestamp, id) of the last model in the previous chunk.
+
+        Args:
+            queryset (QuerySet): The models to retrieve.
+            timestamp_field (unicode): The name of the models' timestamp field.
+            since (datetime): Only retrieve models with a later timestamp, unless None.
+            until (datetime): Only retrieve models with this timestamp or earlier.
+
+        Yields:
+            list of models, with at most `QUERY_INTERVAL` items.
+
+        """
+        query = queryset.filter(**{'{}__lte'.format(timestamp_field): until})
+        if since is not None:
+            query = query.filter(**{'{}__gt'.format(timestamp_field): since})
+
+        position = None
+        while True:
+            chunk_query = query
+            if position is not None:
+                timestamp, model_id = position
+                chunk_query = query.filter(
+                    Q(**{'{}__gt'.format(timestamp_field): timestamp}) |
+                    Q(**{timestamp_field: timestamp, 'id__gt': model_id})
+                )
+            chunk = list(
+                self._use_read_replica(chunk_query.order_by(timestamp_field, 'id'))[:self.QUERY_INTERVAL]
+            )
+            if not chunk:
+                break
+
+            position = (getattr(chunk[-1], timestamp_field), chunk[-1].id)
+            yield chunk
+
+            # A partial chunk means we've reached the end
+            if len(chunk) < self.QUERY_INTERVAL:
+                break
+
+    def shard_positions(self, course_id, num_shards):
+        """
+        Split a course's submissions into shards of about the same size.
+
+        Args:
+            course_id (unicode): The ID of the course to export.
+            num_shards (int): The number of shards.
+
+        Returns:
+            list of `(start, end)` tuples, one for each shard, to pass as the
+            `checkpoint` and `end` arguments of `write_to_csv()`.  The first
+            shard starts, and the last shard ends, at None.  There may be
+            fewer shards than requested if the course has few submissions.
+
+        """
+        workflows = self._use_read_replica(
+            AssessmentWorkflow.objects.filter(course_id=course_id).order_by('created', 'id')
+        )
+        total = workflows.count()
+        num_shards = max(1, min(num_shards, total))
+
+        # Each boundary is the last workflow of a shard
+        boundaries = [
+            workflows.values('id', 'created')[total * index // num_shards - 1]
+            for index in range(1, num_shards)
+        ]
+        positions = [None] + [
+            {'created': boundary['created'].isoformat(), 'id': boundary['id']}
+            for boundary in boundaries
+        ] + [None]
+        return zip(positions[:-1], positions[1:])
+
+    def _submission_uuid_chunks(self, course_id, checkpoint=None, end=None):
+        """
+        Iterate over chunks of submission uuids, in the order their
+        workflows were created.
+
+        Each chunk starts after the (created, id) of the last workflow in
+        the previous chunk, rather than at an offset, so every chunk is an
+        indexed range scan and workflows created during the export are
+        neither skipped nor repeated.
 
         Args:
             course_id (unicode): The ID of the course to retrieve submissions from.
 
+        Keyword Arguments:
+            checkpoint (dict): If provided, start after the workflow
+                at the position recorded in the checkpoint.
+            end (dict): If provided, stop after the workflow at this position.
+
         Yields:
-            submission_uuid (unicode)
+            tuple of `(submission_uuids, position)`, where `submission_uuids`
+            has at most `QUERY_INTERVAL` items and `position` is the
+            (created, id) of the workflow of the last submission.
 
         """
-        num_results = 0
-        start = 0
-        total_results = self._use_read_replica(
-            AssessmentWorkflow.objects.filter(course_id=course_id)
-        ).count()
-
-        while num_results < total_results:
-            # Load a subset of the submission UUIDs
-            # We're assuming that peer workflows are immutable,
-            # so if we counted N at the start of the loop,
-            # there should be >= N for us to process.
-            end = start + self.QUERY_INTERVAL
-            query = self._use_read_replica(
-                AssessmentWorkflow.objects
-                    .filter(course_id=course_id)
-                    .order_by('created')
-            ).values('submission_uuid')[start:end]
-
-            for workflow_dict in query:
-                num_results += 1
-                yield workflow_dict['submission_uuid']
-
-            start += self.QUERY_INTERVAL
+        position = None
+        if checkpoint is not None:
+            position = (parse_datetime(checkpoint['created']), checkpoint['id'])
+
+        end_query = Q()
+        if end is not None:
+            end_created = parse_datetime(end['created'])
+            end_query = Q(created__lt=end_created) | Q(created=end_created, id__lte=end['id'])
+
+        while True:
+            query = AssessmentWorkflow.objects.filter(end_query, course_id=course_id)
+            if position is not None:
+                created, workflow_id = position
+                query = query.filter(Q(created__gt=created) | Q(created=created, id__gt=workflow_id))
+            chunk = list(
+                self._use_read_replica(query.order_by('created', 'id'))
+                .values('id', 'created', 'submission_uuid')[:self.QUERY_INTERVAL]
+            )
+            if not chunk:
+                break
+
+            position = (chunk[-1]['created'], chunk[-1]['id'])
+            yield [workflow_dict['submission_uuid'] for workflow_dict in chunk], position
+
+            # A partial chunk means we've reached the end
+            if len(chunk) < self.QUERY_INTERVAL:
+                break
 
     def _write_csv_headers(self):
         """
         Write the headers (first row) for each output stream.
         """
-        for name, writer in self.writers.iteritems():
-            writer.writerow(self.HEADERS[name])
+        for writer in self.writers.itervalues():
+            writer.write_header()
 
     def _write_submission_to_csv(self, submission_uuid):
         """
@@ -193,7 +740,7 @@ class CsvWriter(object):
 
         """
         submission = sub_api.get_submission_and_student(submission_uuid, read_replica=True)
-        self._write_unicode('submission', [
+        self._write_row('submission', [
             submission['uuid'],
             submission['student_item']['student_id'],
             submission['student_item']['item_id'],
@@ -204,13 +751,54 @@ class CsvWriter(object):
 
         score = sub_api.get_latest_score_for_submission(submission_uuid, read_replica=True)
         if score is not None:
-            self._write_unicode('score', [
+            self._write_row('score', [
                 score['submission_uuid'],
                 score['points_earned'],
                 score['points_possible'],
                 score['created_at']
             ])
 
+    def _write_submission_row(self, submission):
+        """
+        Write a submission model to CSV.
+
+        Args:
+            submission (Submission): The submission, with its student item.
+
+        Returns:
+            None
+
+        """
+        self._write_row('submission', [
+            submission.uuid,
+            submission.student_item.student_id,
+            submission.student_item.item_id,
+            submission.submitted_at,
+            submission.created_at,
+            json.dumps(json.loads(submission.raw_answer))
+        ])
+
+    def _write_score_row(self, submission_uuid, score):
+        """
+        Write a score to CSV, unless it is hidden.
+
+        Args:
+            submission_uuid (unicode): The UUID of the scored submission.
+            score (dict): The score's 'points_earned', 'points_possible' and 'created_at'.
+
+        Returns:
+            None
+
+        """
+        # By convention, scores of 0/0 are hidden by the submissions API
+        if score['points_possible'] != 0:
+            self._write_row('score', [
+                submission_uuid,
+                score['points_earned'],
+                score['points_possible'],
+                score['created_at']
+            ])
+
     def _write_assessment_to_csv(self, assessment_parts, rubric_points_cache):
         """
         Write assessments and assessment parts to CSV.
@@ -227,7 +815,7 @@ class CsvWriter(object):
         assessment_id_set = set()
 
         for part in assessment_parts:
-            self._write_unicode('assessment_part', [
+            self._write_row('assessment_part', [
                 part.assessment.id,
                 part.points_earned,
                 part.criterion.name,
@@ -251,7 +839,7 @@ class CsvWriter(object):
                     points_possible = assessment.points_possible
                     rubric_points_cache[assessment.rubric_id] = points_possible
 
-                self._write_unicode('assessment', [
+                self._write_row('assessment', [
                     assessment.id,
                     assessment.submission_uuid,
                     assessment.scored_at,
@@ -277,7 +865,7 @@ class CsvWriter(object):
             unicode(option.id) for option in assessment_feedback.options.all()
         ])
 
-        self._write_unicode('assessment_feedback', [
+        self._write_row('assessment_feedback', [
             assessment_feedback.submission_uuid,
             assessment_feedback.feedback_text,
             options_string
@@ -295,28 +883,33 @@ class CsvWriter(object):
 
         """
         for option in feedback_options:
-            self._write_unicode(
+            self._write_row(
                 'assessment_feedback_option',
                 [option.id, option.text]
             )
 
-    def _write_unicode(self, output_name, row):
+    def _write_row(self, output_name, row):
         """
-        Encode a row as a UTF-8 bytestring, then write it to a CSV file.
-        Non-string values are first converted to unicode.
+        Buffer a row to write to an output stream.
 
         Args:
             output_name (str): The name of the output stream to write to.
-            row (list): List of fields, which must be serializable as UTF-8.
+            row (list): List of fields, in the order of the output's `HEADERS`.
 
         Returns:
             None
 
         """
-        writer = self.writers.get(output_name)
-        if writer is not None:
-            encoded_row = [unicode(field).encode('utf-8') for field in row]
-            writer.writerow(encoded_row)
+        if output_name in self.writers:
+            self._rows[output_name].append(row)
+
+    def _write_buffered_rows(self):
+        """
+        Encode and write the buffered rows for each output stream.
+        """
+        for output_name, rows in self._rows.iteritems():
+            self.writers[output_name].write_rows(rows)
+        self._rows.clear()
 
     def _use_read_replica(self, queryset):
         """
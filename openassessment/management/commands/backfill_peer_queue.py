@@ -0,0 +1,51 @@
+"""
+Backfill the peer assessment queue from existing peer workflows.
+"""
+import sys
+from django.core.management.base import BaseCommand
+from openassessment.assessment.models import PeerWorkflow, PeerWorkflowQueueEntry
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the peer assessment queue entries from PeerWorkflows and PeerWorkflowItems.
+
+    Entries are rebuilt in chunks of workflows, so this is safe to run
+    against large courses, and can be re-run at any time to correct
+    entries that have drifted from the underlying workflow items.
+    Existing entries keep their positions in the queue, and missing
+    entries are added to the end of their item's queue.
+    """
+
+    help = 'Rebuild the peer assessment queue from existing peer workflows.'
+    args = '[<COURSE_ID> [<ITEM_ID>]]'
+
+    # Number of peer workflows to rebuild at a time
+    CHUNK_SIZE = 500
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            course_id (unicode): If provided, only rebuild the queue for this course.
+            item_id (unicode): If provided, only rebuild the queue for this item.
+        """
+        workflows = PeerWorkflow.objects.all()
+        if len(args) > 0:
+            workflows = workflows.filter(course_id=args[0].decode('utf-8'))
+        if len(args) > 1:
+            workflows = workflows.filter(item_id=args[1].decode('utf-8'))
+
+        num_entries = 0
+        last_id = 0
+        while True:
+            chunk = list(workflows.filter(id__gt=last_id).order_by('id')[:self.CHUNK_SIZE])
+            if not chunk:
+                break
+            num_entries += PeerWorkflowQueueEntry.rebuild(chunk)
+            last_id = chunk[-1].id
+            sys.stdout.write('.')
+            sys.stdout.flush()
+
+        print u"\nRebuilt {} peer assessment queue entries".format(num_entries)
@@ -0,0 +1,106 @@
+"""
+Measure how long the AI algorithms take to score an essay,
+with and without the cache of deserialized classifiers.
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from openassessment.assessment.worker.algorithm import (
+    AIAlgorithm, AIAlgorithmError, CLASSIFIER_OBJECT_CACHE
+)
+
+
+class Command(BaseCommand):
+    """
+    Time scoring synthetic essays with each AI algorithm.
+
+    For each algorithm, this trains a classifier from synthetic examples,
+    then scores the essays twice: once discarding the deserialized
+    classifiers before each essay (as workers did before the classifier
+    cache), and once re-using them.  Algorithms that are not configured
+    or cannot be loaded (for example, if EASE is not installed) are skipped.
+    """
+
+    help = 'Time scoring essays with the AI algorithms, with and without the classifier cache.'
+    args = '[<NUM_ESSAYS>]'
+
+    DEFAULT_NUM_ESSAYS = 100
+    ALGORITHM_IDS = ['fake', 'ngram', 'ease']
+
+    WORDS = [
+        u"the", u"essay", u"argues", u"that", u"classifiers", u"should",
+        u"be", u"cached", u"because", u"loading", u"them", u"is", u"slow",
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._results = list()
+
+    @property
+    def results(self):
+        """
+        Return the benchmark results, which is useful for testing.
+
+        Returns:
+            list of dictionaries with keys 'algorithm_id',
+            'uncached_seconds_per_essay' and 'cached_seconds_per_essay'
+
+        """
+        return self._results
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            num_essays (int): The number of essays to score with each algorithm.
+        """
+        try:
+            num_essays = int(args[0]) if len(args) > 0 else self.DEFAULT_NUM_ESSAYS
+        except ValueError:
+            raise CommandError(u'Usage: benchmark_ai_scoring {}'.format(self.args))
+
+        examples = [
+            AIAlgorithm.ExampleEssay(self._essay(index), index % 3)
+            for index in range(20)
+        ]
+        essays = [self._essay(index) for index in range(num_essays)]
+
+        for algorithm_id in self.ALGORITHM_IDS:
+            try:
+                algorithm = AIAlgorithm.algorithm_for_id(algorithm_id)
+                classifier = algorithm.train_classifier(examples)
+            except AIAlgorithmError as ex:
+                print u"Skipping algorithm {}: {}".format(algorithm_id, ex)
+                continue
+
+            result = {
+                'algorithm_id': algorithm_id,
+                'uncached_seconds_per_essay': self._time_scoring(algorithm, classifier, essays, True),
+                'cached_seconds_per_essay': self._time_scoring(algorithm, classifier, essays, False),
+            }
+            self._results.append(result)
+            print u"{algorithm_id}: {uncached:.3f} ms per essay without the cache, {cached:.3f} ms with it".format(
+                algorithm_id=algorithm_id,
+                uncached=result['uncached_seconds_per_essay'] * 1000,
+                cached=result['cached_seconds_per_essay'] * 1000,
+            )
+
+    def _essay(self, index):
+        """
+        Return the text of a synthetic essay.
+        """
+        return u" ".join(self.WORDS[(index + offset) % len(self.WORDS)] for offset in range(50 + index % 7))
+
+    def _time_scoring(self, algorithm, classifier, essays, clear_cache):
+        """
+        Return the average number of seconds taken to score an essay.
+        """
+        CLASSIFIER_OBJECT_CACHE.clear()
+        start = datetime.datetime.now()
+        for essay in essays:
+            if clear_cache:
+                CLASSIFIER_OBJECT_CACHE.clear()
+            algorithm.score(essay, classifier, dict())
+        return (datetime.datetime.now() - start).total_seconds() / len(essays)
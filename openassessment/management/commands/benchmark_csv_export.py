@@ -0,0 +1,83 @@
+"""
+Compare the number of queries and the time taken to export
+a course's data to CSV, querying per submission or in bulk.
+"""
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from openassessment.data import CsvWriter
+
+
+class Command(BaseCommand):
+    """
+    Export a course's data twice, discarding the output: once querying
+    the data for each submission separately, and once loading the data
+    for each chunk of submissions in bulk.
+    """
+
+    help = 'Compare the queries and time taken to export a course to CSV per submission and in bulk.'
+    args = '<COURSE_ID>'
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._results = dict()
+
+    @property
+    def results(self):
+        """
+        Return the benchmark results, which is useful for testing.
+
+        Returns:
+            dict with keys 'per_submission_seconds', 'per_submission_queries',
+            'bulk_seconds' and 'bulk_queries'.
+
+        """
+        return self._results
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            course_id (unicode): The ID of the course to export.
+        """
+        if len(args) != 1:
+            raise CommandError(u'Usage: benchmark_csv_export {}'.format(self.args))
+        course_id = args[0].decode('utf-8')
+
+        for mode, bulk in [('per_submission', False), ('bulk', True)]:
+            seconds, num_queries = self._export(course_id, bulk)
+            self._results['{}_seconds'.format(mode)] = seconds
+            self._results['{}_queries'.format(mode)] = num_queries
+            print u"{mode}: {seconds:.3f} seconds, {queries} queries".format(
+                mode=mode, seconds=seconds, queries=num_queries
+            )
+
+    def _export(self, course_id, bulk):
+        """
+        Export the course's data to CSV, discarding the output.
+
+        Returns:
+            tuple of (float, int): the number of seconds and queries taken.
+        """
+        # Count the queries made to the read replica, if the writer uses it
+        connection = connections['read_replica' if 'read_replica' in connections.databases else 'default']
+
+        output_streams = {
+            name: open(os.devnull, 'wb')
+            for name in CsvWriter.MODELS
+        }
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = datetime.datetime.now()
+                CsvWriter(output_streams, bulk=bulk).write_to_csv(course_id)
+                seconds = (datetime.datetime.now() - start).total_seconds()
+        finally:
+            for output_stream in output_streams.values():
+                output_stream.close()
+
+        return seconds, len(queries)
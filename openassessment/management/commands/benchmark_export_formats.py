@@ -0,0 +1,83 @@
+"""
+Compare the size and throughput of exporting
+a course's data in each output format.
+"""
+import datetime
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from openassessment.data import CsvWriter, OUTPUT_FORMATS
+
+
+class Command(BaseCommand):
+    """
+    Export a course's data once in each output format, to temporary files,
+    and report the total size of the files and the time taken.
+    """
+
+    help = 'Compare the size and time taken to export a course in each output format.'
+    args = '<COURSE_ID>'
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._results = dict()
+
+    @property
+    def results(self):
+        """
+        Return the benchmark results, which is useful for testing.
+
+        Returns:
+            dict mapping the keys of `OUTPUT_FORMATS` to dicts with
+            keys 'bytes' and 'seconds'.
+
+        """
+        return self._results
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            course_id (unicode): The ID of the course to export.
+        """
+        if len(args) != 1:
+            raise CommandError(u'Usage: benchmark_export_formats {}'.format(self.args))
+        course_id = args[0].decode('utf-8')
+
+        for output_format in sorted(OUTPUT_FORMATS.keys()):
+            num_bytes, seconds = self._export(course_id, output_format)
+            self._results[output_format] = {'bytes': num_bytes, 'seconds': seconds}
+            print u"{output_format}: {num_bytes} bytes, {seconds:.3f} seconds".format(
+                output_format=output_format, num_bytes=num_bytes, seconds=seconds
+            )
+
+    def _export(self, course_id, output_format):
+        """
+        Export the course's data in a format to temporary files.
+
+        Returns:
+            tuple of (int, float): the total size of the files
+            and the number of seconds taken.
+        """
+        output_streams = {
+            name: tempfile.TemporaryFile()
+            for name in CsvWriter.MODELS
+        }
+        try:
+            start = datetime.datetime.now()
+            CsvWriter(output_streams, output_format=output_format).write_to_csv(course_id)
+            for output_stream in output_streams.values():
+                output_stream.flush()
+            seconds = (datetime.datetime.now() - start).total_seconds()
+            num_bytes = sum(
+                os.fstat(output_stream.fileno()).st_size
+                for output_stream in output_streams.values()
+            )
+        finally:
+            for output_stream in output_streams.values():
+                output_stream.close()
+
+        return num_bytes, seconds
@@ -0,0 +1,137 @@
+"""
+Measure how the time taken by find_active_assessments grows
+with the size of a scorer's grading history.
+"""
+import datetime
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from openassessment.assessment.models import (
+    Assessment, PeerWorkflow, PeerWorkflowItem, PeerWorkflowLease, Rubric
+)
+
+
+class Command(BaseCommand):
+    """
+    Time find_active_assessments for scorers with synthetic grading histories.
+
+    For each history size, this creates a scorer who has already assessed
+    that many peer submissions and has one assessment open, then times
+    repeated calls to find_active_assessments.  All data is created inside
+    a transaction that is rolled back, so this can be run against any database.
+    """
+
+    help = 'Time find_active_assessments for scorers with growing grading histories.'
+    args = '[<HISTORY_SIZE> ...]'
+
+    DEFAULT_HISTORY_SIZES = [10, 100, 1000, 5000]
+    NUM_CALLS = 50
+
+    COURSE_ID = u"benchmark_course"
+    ITEM_ID = u"benchmark_item"
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._results = list()
+
+    @property
+    def results(self):
+        """
+        Return the benchmark results, which is useful for testing.
+
+        Returns:
+            list of dictionaries with keys 'history_size', 'seconds_per_call' and 'queries_per_call'
+
+        """
+        return self._results
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            history_sizes (int): The numbers of completed assessments in each scorer's history.
+        """
+        try:
+            history_sizes = [int(arg) for arg in args] or self.DEFAULT_HISTORY_SIZES
+        except ValueError:
+            raise CommandError(u'Usage: benchmark_find_active_assessments {}'.format(self.args))
+
+        with transaction.atomic():
+            rubric = Rubric.objects.create(content_hash=uuid4().hex, structure_hash=uuid4().hex)
+            for history_size in history_sizes:
+                scorer = self._create_history(rubric, history_size)
+                self._time_calls(scorer, history_size)
+
+            # Discard the synthetic workflows and assessments
+            transaction.set_rollback(True)
+
+    def _create_workflow(self):
+        """
+        Create a peer workflow for a synthetic student.
+        """
+        return PeerWorkflow.objects.create(
+            student_id=uuid4().hex,
+            course_id=self.COURSE_ID,
+            item_id=self.ITEM_ID,
+            submission_uuid=unicode(uuid4())
+        )
+
+    def _create_history(self, rubric, history_size):
+        """
+        Create a scorer who has assessed `history_size` submissions
+        and has one more submission open for assessment.
+
+        Returns:
+            PeerWorkflow
+        """
+        scorer = self._create_workflow()
+        author = self._create_workflow()
+        started_at = now() - datetime.timedelta(hours=1)
+
+        Assessment.objects.bulk_create([
+            Assessment(submission_uuid=unicode(uuid4()), rubric=rubric, scorer_id=scorer.student_id, score_type="PE")
+            for __ in range(history_size)
+        ])
+        assessments = Assessment.objects.filter(rubric=rubric, scorer_id=scorer.student_id)
+        PeerWorkflowItem.objects.bulk_create([
+            PeerWorkflowItem(
+                scorer=scorer, author=author, submission_uuid=assessment.submission_uuid,
+                started_at=started_at, assessment=assessment
+            )
+            for assessment in assessments
+        ])
+        item = PeerWorkflowItem.objects.create(scorer=scorer, author=author, submission_uuid=author.submission_uuid)
+        PeerWorkflowLease.objects.create(
+            item=item, scorer=scorer, author=author, expires_at=item.started_at + PeerWorkflow.TIME_LIMIT
+        )
+        return scorer
+
+    def _time_calls(self, scorer, history_size):
+        """
+        Time repeated calls to find_active_assessments for a scorer.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            start = datetime.datetime.now()
+            for __ in range(self.NUM_CALLS):
+                item = scorer.find_active_assessments()
+            elapsed = datetime.datetime.now() - start
+
+        if item is None:
+            raise CommandError(u"No active assessment found for the synthetic scorer")
+
+        result = {
+            'history_size': history_size,
+            'seconds_per_call': elapsed.total_seconds() / self.NUM_CALLS,
+            'queries_per_call': len(queries) / float(self.NUM_CALLS),
+        }
+        self._results.append(result)
+        print u"History of {history_size} assessments: {ms:.3f} ms and {queries:.1f} queries per call".format(
+            history_size=history_size,
+            ms=result['seconds_per_call'] * 1000,
+            queries=result['queries_per_call'],
+        )
@@ -0,0 +1,139 @@
+"""
+Measure the overhead of dispatching to the assessment step APIs
+when updating a workflow.
+"""
+import datetime
+import importlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from openassessment.workflow import api as workflow_api
+from openassessment.workflow.models import AssessmentWorkflow, DEFAULT_ASSESSMENT_API_DICT, get_step_api
+from submissions import api as sub_api
+from submissions.models import Submission
+
+
+class Command(BaseCommand):
+    """
+    Time `update_from_assessments` and the step API dispatch it relies on.
+
+    The dispatch timings compare resolving each step's API functions by
+    importing the module and looking up fallbacks on every call (as the
+    workflow used to) with the step API registry.  The workflow is created
+    inside a transaction that is rolled back, so this can be run against any database.
+    """
+
+    help = 'Time update_from_assessments and the dispatch to the assessment step APIs.'
+    args = '[<NUM_CALLS>]'
+
+    DEFAULT_NUM_CALLS = 1000
+    STEPS = ['peer', 'self']
+    REQUIREMENTS = {"peer": {"must_grade": 5, "must_be_graded_by": 3}}
+    FUNCTION_NAMES = ['submitter_is_finished', 'assessment_is_finished', 'get_score', 'on_start']
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._results = dict()
+
+    @property
+    def results(self):
+        """
+        Return the benchmark results, which is useful for testing.
+
+        Returns:
+            dict with keys 'import_dispatch_seconds', 'registry_dispatch_seconds',
+            'update_seconds' and 'update_queries', each per call.
+
+        """
+        return self._results
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            num_calls (int): The number of times to call each function being timed.
+        """
+        try:
+            num_calls = int(args[0]) if len(args) > 0 else self.DEFAULT_NUM_CALLS
+        except ValueError:
+            raise CommandError(u'Usage: benchmark_update_from_assessments {}'.format(self.args))
+
+        self._results['import_dispatch_seconds'] = self._time(num_calls, self._import_dispatch)
+        self._results['registry_dispatch_seconds'] = self._time(num_calls, self._registry_dispatch)
+        print u"Resolving step APIs by import: {:.2f} us per update".format(
+            self._results['import_dispatch_seconds'] * 1e6
+        )
+        print u"Resolving step APIs from the registry: {:.2f} us per update".format(
+            self._results['registry_dispatch_seconds'] * 1e6
+        )
+
+        with transaction.atomic():
+            submission, workflow = self._create_workflow()
+            with CaptureQueriesContext(connection) as queries:
+                self._results['update_seconds'] = self._time(
+                    num_calls, lambda: workflow.update_from_assessments(self.REQUIREMENTS)
+                )
+            self._results['update_queries'] = len(queries) / float(num_calls)
+
+            # Discard the synthetic submission and workflow
+            transaction.set_rollback(True)
+
+        # The submissions API caches the student item by primary key,
+        # which the database may reuse once the rows are rolled back.
+        cache.delete_many([
+            Submission.get_cache_key(submission['uuid']),
+            u"submissions.student_item.{}".format(submission['student_item']),
+        ])
+
+        print u"update_from_assessments: {:.3f} ms and {:.1f} queries per call".format(
+            self._results['update_seconds'] * 1000, self._results['update_queries']
+        )
+
+    def _time(self, num_calls, func):
+        """
+        Return the average number of seconds taken by a call to `func`.
+        """
+        start = datetime.datetime.now()
+        for __ in range(num_calls):
+            func()
+        return (datetime.datetime.now() - start).total_seconds() / num_calls
+
+    def _import_dispatch(self):
+        """
+        Resolve the functions of each step the way the workflow did before
+        the step API registry: importing the module and looking up each function.
+        """
+        for name in self.STEPS:
+            for func_name in self.FUNCTION_NAMES:
+                api_path = getattr(settings, 'ORA2_ASSESSMENTS', DEFAULT_ASSESSMENT_API_DICT).get(name)
+                getattr(importlib.import_module(api_path), func_name, None)
+
+    def _registry_dispatch(self):
+        """
+        Resolve the functions of each step from the step API registry.
+        """
+        for name in self.STEPS:
+            for func_name in self.FUNCTION_NAMES:
+                getattr(get_step_api(name), func_name)
+
+    def _create_workflow(self):
+        """
+        Create a submission and workflow for a synthetic student.
+
+        Returns:
+            tuple of (dict, AssessmentWorkflow): the serialized submission and its workflow.
+        """
+        submission = sub_api.create_submission({
+            'student_id': uuid4().hex,
+            'course_id': u"benchmark_course",
+            'item_id': u"benchmark_item",
+            'item_type': 'openassessment',
+        }, u"Benchmark answer")
+        workflow_api.create_workflow(submission['uuid'], self.STEPS)
+        return submission, AssessmentWorkflow.objects.get(submission_uuid=submission['uuid'])
@@ -0,0 +1,47 @@
+"""
+Recompute the cached workflow status counts for a problem.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from openassessment.workflow.models import AssessmentWorkflow, AssessmentWorkflowStatusCount
+
+
+class Command(BaseCommand):
+    """
+    Recompute the cached counts of workflows in each status from the workflows themselves.
+
+    Run this for every problem when enabling the `ORA2_WORKFLOW_STATUS_COUNTERS`
+    Django setting, or to correct counts after workflows have been edited directly.
+    If no problem is given, the counts are rebuilt for every problem in the course,
+    or for every problem in every course.
+    """
+
+    help = 'Recompute the cached workflow status counts.'
+    args = '[<COURSE_ID> [<ITEM_ID>]]'
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            course_id (unicode): If provided, only rebuild the counts for this course.
+            item_id (unicode): If provided, only rebuild the counts for this item.
+
+        Raises:
+            CommandError
+
+        """
+        if len(args) > 2:
+            raise CommandError(u"Usage: rebuild_workflow_status_counts {}".format(self.args))
+
+        items = AssessmentWorkflow.objects.order_by()
+        if len(args) > 0:
+            items = items.filter(course_id=args[0].decode('utf-8'))
+        if len(args) > 1:
+            items = items.filter(item_id=args[1].decode('utf-8'))
+
+        num_items = 0
+        for course_id, item_id in items.values_list('course_id', 'item_id').distinct():
+            AssessmentWorkflowStatusCount.rebuild(course_id, item_id)
+            num_items += 1
+
+        print u"Rebuilt the workflow status counts for {} problems".format(num_items)
@@ -0,0 +1,43 @@
+"""
+Release peer assessment leases that have expired.
+"""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from openassessment.assessment.models import PeerWorkflowLease
+
+
+class Command(BaseCommand):
+    """
+    Delete expired PeerWorkflowLeases in batches and recount the
+    peer assessment queue entries of the affected submissions.
+
+    This is meant to be run periodically (for example, from cron), so that
+    submissions whose reviewers have abandoned them return to the queue
+    without waiting to be recounted when the queue is next read.
+    """
+
+    help = 'Release expired peer assessment leases in bulk.'
+    args = '[<BATCH_SIZE>]'
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            batch_size (int): The number of leases to release at a time.
+        """
+        try:
+            batch_size = int(args[0]) if len(args) > 0 else PeerWorkflowLease.RELEASE_BATCH_SIZE
+        except ValueError:
+            raise CommandError(u'Usage: release_expired_peer_leases {}'.format(self.args))
+
+        num_released = 0
+        while True:
+            released = PeerWorkflowLease.release_expired(batch_size=batch_size)
+            if not released:
+                break
+            num_released += released
+            sys.stdout.write('.')
+            sys.stdout.flush()
+
+        print u"\nReleased {} expired peer assessment leases".format(num_released)
@@ -0,0 +1,51 @@
+"""
+Refresh the status of every assessment workflow for a problem.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from openassessment.workflow import api as workflow_api
+
+
+class Command(BaseCommand):
+    """
+    Update the status of every assessment workflow for a problem in a course.
+
+    The requirements are the same dictionary the problem passes to the
+    workflow API, encoded as JSON, for example:
+
+        '{"peer": {"must_grade": 5, "must_be_graded_by": 3}}'
+
+    This is useful after the requirements of a problem change or a deadline
+    passes, since otherwise workflows are only updated when students view the problem.
+    """
+
+    help = 'Update the status of every assessment workflow for a problem.'
+    args = '<COURSE_ID> <ITEM_ID> <REQUIREMENTS_JSON>'
+
+    def handle(self, *args, **options):
+        """
+        Execute the command.
+
+        Args:
+            course_id (unicode): The ID of the course.
+            item_id (unicode): The ID of the problem in the course.
+            requirements (unicode): The JSON-encoded assessment requirements.
+
+        Raises:
+            CommandError
+
+        """
+        if len(args) < 3:
+            raise CommandError(u"Usage: update_workflows_for_item {}".format(self.args))
+
+        course_id = args[0].decode('utf-8')
+        item_id = args[1].decode('utf-8')
+        try:
+            requirements = json.loads(args[2])
+        except ValueError:
+            raise CommandError(u"Requirements must be a JSON dictionary")
+        if not isinstance(requirements, dict):
+            raise CommandError(u"Requirements must be a JSON dictionary")
+
+        num_changed = workflow_api.update_workflows_for_item(course_id, item_id, requirements)
+        print u"Updated the status of {} workflows".format(num_changed)
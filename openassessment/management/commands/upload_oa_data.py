@@ -4,15 +4,25 @@ Generate CSV files for submission and assessment data, then upload to S3.
 import sys
 import os
 import os.path
+from collections import OrderedDict
 import datetime
+import json
+import multiprocessing
+from optparse import make_option
 import shutil
+from StringIO import StringIO
 import tempfile
 import tarfile
+import time
+from uuid import uuid4
 import boto
 from boto.s3.key import Key
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from openassessment.data import CsvWriter
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from openassessment.data import CsvWriter, OUTPUT_FORMATS
 
 
 class Command(BaseCommand):
@@ -21,12 +31,43 @@ class Command(BaseCommand):
     """
 
     help = 'Create and upload CSV files for submission and assessment data.'
-    args = '<COURSE_ID> <S3_BUCKET_NAME>'
+    args = '<COURSE_ID> <S3_BUCKET_NAME> [<WORK_DIR>]'
 
-    OUTPUT_CSV_PATHS = {
-        output_name: "{}.csv".format(output_name)
-        for output_name in CsvWriter.MODELS
-    }
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--workers', type='int', default=1,
+            help='Number of processes that export shards of the submissions in parallel.'
+        ),
+        make_option(
+            '--format', choices=sorted(OUTPUT_FORMATS.keys()), default='csv',
+            help='The format of the exported files.'
+        ),
+        make_option(
+            '--incremental', action='store_true', default=False,
+            help='Only export the data that changed since the last incremental export of the course.'
+        ),
+        make_option(
+            '--since',
+            help='Only export the data that changed after this ISO 8601 time (implies --incremental).'
+        ),
+    )
+
+    CHECKPOINT_PATH = "checkpoint.json"
+    SHARDS_PATH = "shards.json"
+    MANIFEST_PATH = "manifest.json"
+
+    # Incremental exports stop this long before the current time,
+    # so that rows timestamped just before the export but committed
+    # just after it are included in the next export instead of being missed.
+    WATERMARK_DELAY = datetime.timedelta(minutes=5)
+
+    # Parallel exports split the course into this many shards per worker,
+    # so each shard can be archived and deleted while later ones are written.
+    SHARDS_PER_WORKER = 4
+
+    # The size of each part of the multipart upload of the archive.
+    # S3 requires every part but the last to be at least 5MB.
+    UPLOAD_PART_SIZE = 16 * 1024 * 1024
 
     URL_EXPIRATION_HOURS = 24
     PROGRESS_INTERVAL = 10
@@ -54,81 +95,497 @@ class Command(BaseCommand):
         Args:
             course_id (unicode): The ID of the course to use.
             s3_bucket_name (unicode): The name of the S3 bucket to upload to.
+            work_dir (unicode): Optional directory in which to keep the CSV files.
+                If the export of a course to this directory stopped before
+                it completed, running the command again continues it.
+
+        Keyword Arguments:
+            workers (int): The number of processes to export the course with.
+                Each process writes shards of the submissions, which are
+                added to the archive as they are completed.
+            format (unicode): The key of the format in `OUTPUT_FORMATS`
+                to export the data in.
+            incremental (bool): If True, only export the data that changed
+                since the watermark recorded in the course's manifest
+                by the last incremental export, then record the new watermark.
+            since (unicode): If provided, do an incremental export of the data
+                that changed after this ISO 8601 time, instead of the watermark.
 
         Raises:
             CommandError
 
         """
-        if len(args) < 2:
+        workers = options.get('workers') or 1
+        output_format = options.get('format') or 'csv'
+        since = options.get('since')
+        incremental = options.get('incremental') or since is not None
+        if len(args) < 2 or workers < 1 or output_format not in OUTPUT_FORMATS:
             raise CommandError(u'Usage: upload_oa_data {}'.format(self.args))
+        if incremental and workers > 1:
+            raise CommandError(u'Incremental exports use a single process')
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                raise CommandError(u'--since must be an ISO 8601 time')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, timezone.utc)
 
         course_id, s3_bucket = args[0].decode('utf-8'), args[1].decode('utf-8')
-        csv_dir = tempfile.mkdtemp()
+        work_dir = args[2].decode('utf-8') if len(args) > 2 else None
+        csv_dir = work_dir if work_dir is not None else tempfile.mkdtemp()
 
         try:
             print u"Generating CSV files for course '{}'".format(course_id)
-            self._dump_to_csv(course_id, csv_dir)
-            print u"Creating archive of CSV files in {}".format(csv_dir)
-            archive_path = self._create_archive(csv_dir)
-            print u"Uploading {} to {}/{}".format(archive_path, s3_bucket, course_id)
-            url = self._upload(course_id, archive_path, s3_bucket)
+            manifest = None
+            if incremental:
+                manifest = self._dump_changes_to_csv(course_id, csv_dir, s3_bucket, since, output_format)
+                archive_members = [
+                    (rel_path, os.path.join(csv_dir, rel_path))
+                    for rel_path in self.output_paths(output_format).values() + [self.MANIFEST_PATH]
+                ]
+            elif workers > 1:
+                archive_members = self._dump_shards_to_csv(course_id, csv_dir, workers, output_format)
+            else:
+                self._dump_to_csv(course_id, csv_dir, output_format=output_format)
+                archive_members = [
+                    (rel_path, os.path.join(csv_dir, rel_path))
+                    for rel_path in self.output_paths(output_format).values()
+                ]
+            print u"Uploading archive of CSV files to {}/{}".format(s3_bucket, course_id)
+            tarball_name = self._archive_name(output_format, manifest)
+            url = self._upload_archive(course_id, tarball_name, archive_members, s3_bucket)
+            if incremental:
+                # Only move the watermark once the changes have been uploaded
+                manifest['key'] = self._history[-1]['key']
+                self._save_manifest(s3_bucket, course_id, output_format, manifest)
             print "== Upload successful =="
             print u"Download URL (expires in {} hours):\n{}".format(self.URL_EXPIRATION_HOURS, url)
         finally:
-            # Assume that the archive was created in the directory,
-            # so to clean up we just need to delete the directory.
-            shutil.rmtree(csv_dir)
+            # A work directory is kept, so a failed export can be continued.
+            if work_dir is None:
+                shutil.rmtree(csv_dir)
+
+    @staticmethod
+    def output_paths(output_format):
+        """
+        Return the name of the file to write each model's data to.
+
+        Args:
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Returns:
+            dict mapping the names in `CsvWriter.MODELS` to relative paths.
 
-    def _dump_to_csv(self, course_id, csv_dir):
         """
-        Create CSV files for submission/assessment data in a directory.
+        extension = OUTPUT_FORMATS[output_format].EXTENSION
+        return {
+            output_name: "{}.{}".format(output_name, extension)
+            for output_name in CsvWriter.MODELS
+        }
+
+    def _dump_shards_to_csv(self, course_id, csv_dir, workers, output_format):
+        """
+        Create CSV files for shards of the submissions in subdirectories,
+        using a pool of worker processes, and yield each shard's files
+        to be archived as soon as the shard is complete.
+
+        The course is split into `SHARDS_PER_WORKER` shards for each worker,
+        and each shard's files are deleted once the archive has read them,
+        so the disk only holds the shards that are being written or
+        waiting to be archived, rather than a copy of the whole course.
+
+        The shards are recorded in the directory, so that if the export
+        stops before it completes, it continues with the same shards.
+        Shards that were already archived and deleted are exported again.
 
         Args:
             course_id (unicode): The ID of the course to dump data from.
             csv_dir (unicode): The absolute path to the directory in which to create CSV files.
+            workers (int): The number of worker processes.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Yields:
+            `(rel_path, path)` tuples: the name in the archive and the path of each file.
+            Each shard's files are in its own directory, and only the first
+            shard's files start with the headers, so concatenating the shards'
+            files in order gives the files for the whole course.  The feedback
+            options used by all the shards are combined into one file.
+
+        """
+        shards = self._load_json(os.path.join(csv_dir, self.SHARDS_PATH), course_id, output_format)
+        if shards is None:
+            shards = {
+                'course_id': course_id,
+                'format': output_format,
+                'positions': CsvWriter(dict()).shard_positions(course_id, workers * self.SHARDS_PER_WORKER),
+            }
+            self._save_json(os.path.join(csv_dir, self.SHARDS_PATH), shards)
+
+        jobs = []
+        for index, (start, end) in enumerate(shards['positions']):
+            shard_dir = os.path.join(csv_dir, "shard-{}".format(index))
+            if not os.path.isdir(shard_dir):
+                os.makedirs(shard_dir)
+            jobs.append((course_id, shard_dir, start, end, output_format))
+
+        # Worker processes must open their own database connections instead of
+        # sharing the ones they inherit.  We can't close a connection that is in
+        # a transaction, but then the workers couldn't see its changes anyway.
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close()
+
+        output_paths = self.output_paths(output_format)
+        feedback_options = OrderedDict()
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        try:
+            # Shards complete in order, while the workers go on to the next shards
+            for index, __ in enumerate(pool.imap(_dump_shard_to_csv, jobs)):
+                shard_dir = jobs[index][1]
+                for name, rel_path in output_paths.iteritems():
+                    path = os.path.join(shard_dir, rel_path)
+                    if name == 'assessment_feedback_option':
+                        self._read_feedback_options(path, output_format, feedback_options)
+                    else:
+                        yield os.path.join(os.path.basename(shard_dir), rel_path), path
+
+                # The archive has read all of the shard's files
+                shutil.rmtree(shard_dir)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        # Each shard lists the feedback options its submissions use,
+        # so combine the lists without repeating options.
+        feedback_option_path = os.path.join(csv_dir, output_paths['assessment_feedback_option'])
+        self._write_feedback_options(feedback_options.values(), feedback_option_path, output_format)
+        yield output_paths['assessment_feedback_option'], feedback_option_path
+
+    def _read_feedback_options(self, path, output_format, feedback_options):
+        """
+        Read the feedback options listed by a shard.
+
+        Args:
+            path (unicode): The shard's feedback option file.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+            feedback_options (OrderedDict): Maps option IDs to rows.  Options
+                that are not already in the dict are added to it.
 
         Returns:
             None
+
+        """
+        format_cls = OUTPUT_FORMATS[output_format]
+        headers = CsvWriter.HEADERS['assessment_feedback_option']
+        types = CsvWriter.TYPES['assessment_feedback_option']
+        with open(path, 'rb') as shard_file:
+            for row in format_cls(shard_file, headers, types).read_rows():
+                feedback_options.setdefault(row[0], row)
+
+    def _write_feedback_options(self, rows, output_path, output_format):
         """
+        Write the combined feedback options of the shards.
+
+        Args:
+            rows (list of lists): The rows of the feedback options.
+            output_path (unicode): The file to write the options to.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Returns:
+            None
+
+        """
+        format_cls = OUTPUT_FORMATS[output_format]
+        headers = CsvWriter.HEADERS['assessment_feedback_option']
+        types = CsvWriter.TYPES['assessment_feedback_option']
+        with open(output_path, 'wb') as output_file:
+            writer = format_cls(output_file, headers, types)
+            writer.write_header()
+            writer.write_rows(rows)
+
+    def _dump_to_csv(self, course_id, csv_dir, start=None, end=None, output_format='csv'):
+        """
+        Create CSV files (or files in another output format)
+        for submission/assessment data in a directory.
+
+        While the files are written, the directory holds a checkpoint
+        of the export.  If the directory has a checkpoint for the course,
+        the files are truncated to their size at the checkpoint and
+        the export continues from there.
+
+        Args:
+            course_id (unicode): The ID of the course to dump data from.
+            csv_dir (unicode): The absolute path to the directory in which to create CSV files.
+
+        Keyword Arguments:
+            start (dict): If provided, only dump the submissions after this position.
+            end (dict): If provided, only dump the submissions up to this position.
+                See `CsvWriter.shard_positions()`.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Returns:
+            None
+        """
+        output_paths = self.output_paths(output_format)
+        checkpoint = self._load_json(os.path.join(csv_dir, self.CHECKPOINT_PATH), course_id, output_format)
+        if checkpoint is None:
+            output_streams = {
+                name: open(os.path.join(csv_dir, rel_path), 'wb')
+                for name, rel_path in output_paths.iteritems()
+            }
+        else:
+            print u"Continuing the export after the submission created at {}".format(checkpoint['writer']['created'])
+            output_streams = dict()
+            for name, rel_path in output_paths.iteritems():
+                output_streams[name] = open(os.path.join(csv_dir, rel_path), 'r+b')
+                output_streams[name].truncate(checkpoint['offsets'][name])
+                output_streams[name].seek(0, os.SEEK_END)
+
+        def _checkpoint_callback(writer_checkpoint):
+            """
+            Save the writer's checkpoint with the size of each file.
+            """
+            self._save_json(os.path.join(csv_dir, self.CHECKPOINT_PATH), {
+                'course_id': course_id,
+                'format': output_format,
+                'writer': writer_checkpoint,
+                'offsets': {name: stream.tell() for name, stream in output_streams.iteritems()},
+            })
+
+        try:
+            csv_writer = CsvWriter(
+                output_streams, self._progress_callback,
+                checkpoint_callback=_checkpoint_callback, output_format=output_format
+            )
+            csv_writer.write_to_csv(
+                course_id, checkpoint=checkpoint['writer'] if checkpoint is not None else start, end=end
+            )
+        finally:
+            for stream in output_streams.itervalues():
+                stream.close()
+
+        # The export is complete, so there is nothing to continue
+        checkpoint_path = os.path.join(csv_dir, self.CHECKPOINT_PATH)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def _dump_changes_to_csv(self, course_id, csv_dir, s3_bucket, since, output_format):
+        """
+        Create files for the submission/assessment data that changed
+        since the last incremental export, or since a given time.
+
+        The manifest describing the export is written to the directory
+        as well, to be included in the archive.
+
+        Args:
+            course_id (unicode): The ID of the course to dump data from.
+            csv_dir (unicode): The absolute path to the directory in which to create the files.
+            s3_bucket (unicode): The name of the S3 bucket holding the course's manifest.
+            since (datetime): Export the data that changed after this time,
+                or None to use the watermark in the course's manifest.
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Returns:
+            dict: the manifest, with keys 'course_id', 'format', 'since' and 'until'.
+
+        """
+        if since is None:
+            manifest = self._load_manifest(s3_bucket, course_id, output_format)
+            if manifest is not None:
+                since = parse_datetime(manifest['until'])
+
+        until = timezone.now() - self.WATERMARK_DELAY
+        if since is not None:
+            until = max(since, until)
+            print u"Exporting the data that changed from {} to {}".format(since.isoformat(), until.isoformat())
+
         output_streams = {
-            name: open(os.path.join(csv_dir, rel_path), 'w')
-            for name, rel_path in self.OUTPUT_CSV_PATHS.iteritems()
+            name: open(os.path.join(csv_dir, rel_path), 'wb')
+            for name, rel_path in self.output_paths(output_format).iteritems()
         }
-        csv_writer = CsvWriter(output_streams, self._progress_callback)
-        csv_writer.write_to_csv(course_id)
+        try:
+            csv_writer = CsvWriter(output_streams, self._progress_callback, output_format=output_format)
+            csv_writer.write_changes_to_csv(course_id, since, until)
+        finally:
+            for stream in output_streams.itervalues():
+                stream.close()
+
+        manifest = {
+            'course_id': course_id,
+            'format': output_format,
+            'since': since.isoformat() if since is not None else None,
+            'until': until.isoformat(),
+        }
+        with open(os.path.join(csv_dir, self.MANIFEST_PATH), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        return manifest
 
-    def _create_archive(self, dir_path):
+    def _manifest_key_name(self, course_id, output_format):
         """
-        Create an archive of a directory.
+        Return the name of the S3 key of a course's incremental export manifest.
+        Each format has its own manifest, so exports in different formats
+        each contain every change.
+        """
+        return os.path.join(course_id, u"incremental-{}.json".format(output_format))
+
+    def _load_manifest(self, s3_bucket, course_id, output_format):
+        """
+        Load the manifest of the last incremental export of a course.
 
         Args:
-            dir_path (unicode): The absolute path to the directory containing the CSV files.
+            s3_bucket (unicode): The name of the S3 bucket.
+            course_id (unicode): The ID of the course.
+            output_format (unicode): The format of the export.
 
         Returns:
-            unicode: Absolute path to the archive.
+            dict, or None if the course has not been exported incrementally.
 
         """
-        tarball_name = u"{}.tar.gz".format(
-            datetime.datetime.utcnow().strftime("%Y-%m-%dT%H_%M")
-        )
-        tarball_path = os.path.join(dir_path, tarball_name)
-        with tarfile.open(tarball_path, "w:gz") as tar:
-            for rel_path in self.OUTPUT_CSV_PATHS.values():
-                tar.add(os.path.join(dir_path, rel_path), arcname=rel_path)
-        return tarball_path
+        key = self._get_bucket(s3_bucket).get_key(self._manifest_key_name(course_id, output_format))
+        return json.loads(key.get_contents_as_string()) if key is not None else None
 
-    def _upload(self, course_id, file_path, s3_bucket):
+    def _save_manifest(self, s3_bucket, course_id, output_format, manifest):
         """
-        Upload a file.
+        Record the manifest of an incremental export of a course,
+        so the next incremental export continues from its watermark.
 
         Args:
+            s3_bucket (unicode): The name of the S3 bucket.
             course_id (unicode): The ID of the course.
-            file_path (unicode): Absolute path to the file to upload.
-            s3_bucket (unicode): Name of the S3 bucket where the file will be uploaded.
+            output_format (unicode): The format of the export.
+            manifest (dict): The manifest.
+
+        Returns:
+            None
+
+        """
+        key = Key(bucket=self._get_bucket(s3_bucket), name=self._manifest_key_name(course_id, output_format))
+        key.set_contents_from_string(json.dumps(manifest))
+
+    def _load_json(self, path, course_id, output_format):
+        """
+        Load a checkpoint or other state of an incomplete export of a course.
+
+        Args:
+            path (unicode): The path of the JSON file.
+            course_id (unicode): The ID of the course being exported.
+            output_format (unicode): The format the course is being exported in.
+
+        Returns:
+            dict, or None if the file does not exist or is for another
+            course or format.
+
+        """
+        try:
+            with open(path) as json_file:
+                data = json.load(json_file)
+        except IOError:
+            return None
+        if data.get('course_id') != course_id or data.get('format', 'csv') != output_format:
+            return None
+        return data
+
+    def _save_json(self, path, data):
+        """
+        Atomically replace a checkpoint or other state of an export.
+
+        Args:
+            path (unicode): The path of the JSON file.
+            data (dict): The data to save.
+
+        Returns:
+            None
+
+        """
+        temp_path = u"{}.tmp".format(path)
+        with open(temp_path, 'w') as json_file:
+            json.dump(data, json_file)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.rename(temp_path, path)
+
+    def _archive_name(self, output_format, manifest=None):
+        """
+        Return a name for the archive of an export that no other export uses,
+        so that exports started at the same time do not replace each other's
+        archives (and a manifest never points at another export's archive).
+
+        Args:
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+
+        Keyword Arguments:
+            manifest (dict): The manifest of an incremental export, if any.
+
+        Returns:
+            unicode: The name of the archive, made of the time, the format,
+            the range of changes for an incremental export, and a random suffix.
+
+        """
+        time_format = "%Y-%m-%dT%H_%M_%S"
+        parts = [datetime.datetime.utcnow().strftime(time_format), output_format]
+        if manifest is not None:
+            since = manifest['since']
+            parts.append(u"changes")
+            parts.append(parse_datetime(since).strftime(time_format) if since is not None else u"start")
+            parts.append(parse_datetime(manifest['until']).strftime(time_format))
+        parts.append(uuid4().hex)
+        return u"{}.tar.gz".format(u"-".join(parts))
+
+    def _upload_archive(self, course_id, tarball_name, archive_members, s3_bucket):
+        """
+        Create a compressed archive of the exported files and upload it.
+
+        The archive is streamed to S3 in parts as it is compressed,
+        so it is never written to disk.  Each file is added as soon as
+        `archive_members` yields it, so the files can still be being
+        exported while the archive is uploaded.
+
+        Args:
+            course_id (unicode): The ID of the course.
+            tarball_name (unicode): The name of the archive in the course's directory.
+            archive_members (iterable): `(rel_path, path)` tuples: the name in
+                the archive and the path of each file.
+            s3_bucket (unicode): Name of the S3 bucket where the archive will be uploaded.
 
         Returns:
             str: URL to access the uploaded archive.
 
+        """
+        bucket = self._get_bucket(s3_bucket)
+        key_name = os.path.join(course_id, tarball_name)
+
+        upload = MultipartUploadFile(bucket, key_name, self.UPLOAD_PART_SIZE)
+        try:
+            with tarfile.open(mode="w|gz", fileobj=upload) as tar:
+                for rel_path, path in archive_members:
+                    tarinfo = tarfile.TarInfo(rel_path)
+                    tarinfo.size = os.path.getsize(path)
+                    tarinfo.mtime = time.time()
+                    with open(path, 'rb') as member_file:
+                        tar.addfile(tarinfo, member_file)
+            upload.complete()
+        except:
+            upload.cancel()
+            raise
+
+        key = Key(bucket=bucket, name=key_name)
+        url = key.generate_url(self.URL_EXPIRATION_HOURS * 3600)
+
+        # Store the key and url in the history
+        self._history.append({'key': key_name, 'url': url})
+
+        return url
+
+    def _get_bucket(self, s3_bucket):
+        """
+        Connect to S3 and return a bucket.
+
+        Args:
+            s3_bucket (unicode): The name of the S3 bucket.
+
+        Returns:
+            boto.s3.bucket.Bucket
+
         """
         # Try to get the AWS credentials from settings if they are available
         # If not, these will default to `None`, and boto will try to use
@@ -139,17 +596,7 @@ class Command(BaseCommand):
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key
         )
-
-        bucket = conn.get_bucket(s3_bucket)
-        key_name = os.path.join(course_id, os.path.split(file_path)[1])
-        key = Key(bucket=bucket, name=key_name)
-        key.set_contents_from_filename(file_path)
-        url = key.generate_url(self.URL_EXPIRATION_HOURS * 3600)
-
-        # Store the key and url in the history
-        self._history.append({'key': key_name, 'url': url})
-
-        return url
+        return conn.get_bucket(s3_bucket)
 
     def _progress_callback(self):
         """
@@ -159,3 +606,73 @@ class Command(BaseCommand):
         if self._submission_counter > 0 and self._submission_counter % self.PROGRESS_INTERVAL == 0:
             sys.stdout.write('.')
             sys.stdout.flush()
+
+
+def _dump_shard_to_csv(job):
+    """
+    Create the CSV files for a shard of a course's submissions.
+    This is a module-level function so it can be run in a process pool.
+
+    Args:
+        job (tuple): `(course_id, csv_dir, start, end, output_format)`
+
+    Returns:
+        None
+
+    """
+    course_id, csv_dir, start, end, output_format = job
+    Command()._dump_to_csv(   # pylint:disable=W0212
+        course_id, csv_dir, start=start, end=end, output_format=output_format
+    )
+
+
+class MultipartUploadFile(object):
+    """
+    Write-only file-like object that uploads to S3 in parts as it is written,
+    so that large files can be uploaded without being stored first.
+    """
+
+    def __init__(self, bucket, key_name, part_size):
+        """
+        Args:
+            bucket (boto.s3.bucket.Bucket): The bucket to upload to.
+            key_name (unicode): The name of the key to upload.
+            part_size (int): The minimum number of bytes in each part except the last.
+        """
+        self._upload = bucket.initiate_multipart_upload(key_name)
+        self._part_size = part_size
+        self._buffer = []
+        self._buffer_size = 0
+        self._num_parts = 0
+
+    def write(self, data):
+        """
+        Buffer data, uploading a part once enough data is buffered.
+        """
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size >= self._part_size:
+            self._upload_part()
+
+    def complete(self):
+        """
+        Upload the remaining data as the last part and complete the upload.
+        """
+        if self._buffer_size > 0 or self._num_parts == 0:
+            self._upload_part()
+        self._upload.complete_upload()
+
+    def cancel(self):
+        """
+        Cancel the upload, so that S3 discards the parts uploaded so far.
+        """
+        self._upload.cancel_upload()
+
+    def _upload_part(self):
+        """
+        Upload the buffered data as the next part.
+        """
+        self._num_parts += 1
+        self._upload.upload_part_from_file(StringIO("".join(self._buffer)), self._num_parts)
+        self._buffer = []
+        self._buffer_size = 0
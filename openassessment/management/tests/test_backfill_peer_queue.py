@@ -0,0 +1,82 @@
+"""
+Tests for the management command that backfills the peer assessment queue.
+"""
+from openassessment.test_utils import CacheResetTest
+from openassessment.assessment.api import peer as peer_api
+from openassessment.assessment.models import PeerWorkflowQueueEntry
+from openassessment.management.commands import backfill_peer_queue
+from openassessment.workflow import api as workflow_api
+from submissions import api as sub_api
+
+
+class BackfillPeerQueueTest(CacheResetTest):
+    """
+    Test the management command that rebuilds peer assessment queue entries.
+    """
+
+    COURSE_ID = u"test_course"
+    ITEM_ID = u"test_item"
+
+    def test_backfill(self):
+        submission_uuids = []
+        for index in range(5):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': self.ITEM_ID,
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, 'test answer')
+            workflow_api.create_workflow(submission['uuid'], ['peer'])
+            submission_uuids.append(submission['uuid'])
+
+        # Open an assessment, so the counts are not all zero
+        peer_api.get_submission_to_assess(submission_uuids[1], 3)
+        expected = {
+            entry.submission_uuid: (entry.num_completed, entry.num_open)
+            for entry in PeerWorkflowQueueEntry.objects.all()
+        }
+
+        # Simulate entries that are missing, as for workflows created before the queue existed
+        PeerWorkflowQueueEntry.objects.all().delete()
+
+        cmd = backfill_peer_queue.Command()
+        cmd.CHUNK_SIZE = 2
+        cmd.handle(self.COURSE_ID.encode('utf-8'))
+
+        rebuilt = {
+            entry.submission_uuid: (entry.num_completed, entry.num_open)
+            for entry in PeerWorkflowQueueEntry.objects.all()
+        }
+        self.assertEqual(len(rebuilt), 5)
+        self.assertEqual(rebuilt, expected)
+        self.assertEqual(rebuilt[submission_uuids[0]], (0, 1))
+
+        # Missing entries are numbered in order of the workflows
+        positions = [
+            PeerWorkflowQueueEntry.objects.get(submission_uuid=submission_uuid).position
+            for submission_uuid in submission_uuids
+        ]
+        self.assertEqual(positions, range(5))
+
+        # Running the backfill again keeps the positions
+        cmd.handle(self.COURSE_ID.encode('utf-8'))
+        positions = [
+            PeerWorkflowQueueEntry.objects.get(submission_uuid=submission_uuid).position
+            for submission_uuid in submission_uuids
+        ]
+        self.assertEqual(positions, range(5))
+
+    def test_backfill_other_course(self):
+        student_item = {
+            'student_id': "test_user",
+            'course_id': self.COURSE_ID,
+            'item_id': self.ITEM_ID,
+            'item_type': 'openassessment',
+        }
+        submission = sub_api.create_submission(student_item, 'test answer')
+        workflow_api.create_workflow(submission['uuid'], ['peer'])
+        PeerWorkflowQueueEntry.objects.all().delete()
+
+        backfill_peer_queue.Command().handle("other_course")
+        self.assertFalse(PeerWorkflowQueueEntry.objects.exists())
@@ -0,0 +1,27 @@
+"""
+Tests for the management command that benchmarks AI scoring.
+"""
+from django.core.management.base import CommandError
+from django.test import TestCase
+from openassessment.management.commands import benchmark_ai_scoring
+
+
+class BenchmarkAIScoringTest(TestCase):
+    """
+    Test the AI scoring benchmark command.
+    """
+
+    def test_benchmark(self):
+        cmd = benchmark_ai_scoring.Command()
+        cmd.handle("3")
+
+        # EASE is not installed in the test environment, so it is skipped
+        self.assertEqual([result['algorithm_id'] for result in cmd.results], ['fake', 'ngram'])
+        self.assertItemsEqual(
+            cmd.results[0].keys(),
+            ['algorithm_id', 'uncached_seconds_per_essay', 'cached_seconds_per_essay']
+        )
+
+    def test_invalid_num_essays(self):
+        with self.assertRaises(CommandError):
+            benchmark_ai_scoring.Command().handle("lots")
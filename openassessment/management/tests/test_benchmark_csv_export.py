@@ -0,0 +1,38 @@
+"""
+Tests for the management command that benchmarks the CSV export.
+"""
+from uuid import uuid4
+from django.core.management.base import CommandError
+from django.test import TestCase
+from submissions import api as sub_api
+from openassessment.management.commands import benchmark_csv_export
+from openassessment.workflow import api as workflow_api
+
+
+class BenchmarkCsvExportTest(TestCase):
+    """
+    Test the CSV export benchmark command.
+    """
+
+    def test_benchmark(self):
+        for __ in range(5):
+            submission = sub_api.create_submission({
+                'student_id': uuid4().hex,
+                'course_id': u"test_course",
+                'item_id': u"test_item",
+                'item_type': 'openassessment',
+            }, u"test answer")
+            workflow_api.create_workflow(submission['uuid'], ['self'])
+
+        cmd = benchmark_csv_export.Command()
+        cmd.handle("test_course")
+
+        self.assertEqual(
+            set(cmd.results.keys()),
+            {'per_submission_seconds', 'per_submission_queries', 'bulk_seconds', 'bulk_queries'}
+        )
+        self.assertLess(cmd.results['bulk_queries'], cmd.results['per_submission_queries'])
+
+    def test_missing_course_id(self):
+        with self.assertRaises(CommandError):
+            benchmark_csv_export.Command().handle()
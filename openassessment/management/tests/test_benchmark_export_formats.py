@@ -0,0 +1,38 @@
+"""
+Tests for the management command that benchmarks the export formats.
+"""
+from uuid import uuid4
+from django.core.management.base import CommandError
+from django.test import TestCase
+from submissions import api as sub_api
+from openassessment.data import OUTPUT_FORMATS
+from openassessment.management.commands import benchmark_export_formats
+from openassessment.workflow import api as workflow_api
+
+
+class BenchmarkExportFormatsTest(TestCase):
+    """
+    Test the export format benchmark command.
+    """
+
+    def test_benchmark(self):
+        for __ in range(5):
+            submission = sub_api.create_submission({
+                'student_id': uuid4().hex,
+                'course_id': u"test_course",
+                'item_id': u"test_item",
+                'item_type': 'openassessment',
+            }, u"test answer")
+            workflow_api.create_workflow(submission['uuid'], ['self'])
+
+        cmd = benchmark_export_formats.Command()
+        cmd.handle("test_course")
+
+        self.assertEqual(set(cmd.results.keys()), set(OUTPUT_FORMATS.keys()))
+        for result in cmd.results.values():
+            self.assertEqual(set(result.keys()), {'bytes', 'seconds'})
+            self.assertGreater(result['bytes'], 0)
+
+    def test_missing_course_id(self):
+        with self.assertRaises(CommandError):
+            benchmark_export_formats.Command().handle()
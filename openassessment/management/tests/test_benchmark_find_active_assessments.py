@@ -0,0 +1,30 @@
+"""
+Tests for the management command that benchmarks find_active_assessments.
+"""
+from django.core.management.base import CommandError
+from django.test import TestCase
+from openassessment.assessment.models import Assessment, PeerWorkflow
+from openassessment.management.commands import benchmark_find_active_assessments
+
+
+class BenchmarkFindActiveAssessmentsTest(TestCase):
+    """
+    Test the find_active_assessments benchmark command.
+    """
+
+    def test_benchmark(self):
+        cmd = benchmark_find_active_assessments.Command()
+        cmd.NUM_CALLS = 2
+        cmd.handle("5", "50")
+
+        # The number of queries should not depend on the size of the history
+        self.assertEqual([result['history_size'] for result in cmd.results], [5, 50])
+        self.assertEqual([result['queries_per_call'] for result in cmd.results], [1.0, 1.0])
+
+        # The synthetic data is rolled back
+        self.assertFalse(PeerWorkflow.objects.exists())
+        self.assertFalse(Assessment.objects.exists())
+
+    def test_invalid_history_size(self):
+        with self.assertRaises(CommandError):
+            benchmark_find_active_assessments.Command().handle("lots")
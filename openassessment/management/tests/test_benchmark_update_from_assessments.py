@@ -0,0 +1,30 @@
+"""
+Tests for the management command that benchmarks update_from_assessments.
+"""
+from django.core.management.base import CommandError
+from django.test import TestCase
+from openassessment.management.commands import benchmark_update_from_assessments
+from openassessment.workflow.models import AssessmentWorkflow
+
+
+class BenchmarkUpdateFromAssessmentsTest(TestCase):
+    """
+    Test the update_from_assessments benchmark command.
+    """
+
+    def test_benchmark(self):
+        cmd = benchmark_update_from_assessments.Command()
+        cmd.handle("3")
+
+        self.assertEqual(
+            set(cmd.results.keys()),
+            {'import_dispatch_seconds', 'registry_dispatch_seconds', 'update_seconds', 'update_queries'}
+        )
+        self.assertGreater(cmd.results['update_queries'], 0)
+
+        # The synthetic data is rolled back
+        self.assertFalse(AssessmentWorkflow.objects.exists())
+
+    def test_invalid_num_calls(self):
+        with self.assertRaises(CommandError):
+            benchmark_update_from_assessments.Command().handle("lots")
@@ -0,0 +1,43 @@
+"""
+Tests for the management command that rebuilds the cached workflow status counts.
+"""
+from django.core.management.base import CommandError
+from nose.tools import raises
+from openassessment.test_utils import CacheResetTest
+from openassessment.management.commands import rebuild_workflow_status_counts
+from openassessment.workflow import api as workflow_api
+from openassessment.workflow.models import AssessmentWorkflowStatusCount
+from submissions import api as sub_api
+
+
+class RebuildWorkflowStatusCountsTest(CacheResetTest):
+    """
+    Test the management command that rebuilds the cached workflow status counts.
+    """
+
+    def test_rebuild(self):
+        for course_id, item_id, student_id in [
+            ("course", "item", "alice"),
+            ("course", "item", "bob"),
+            ("course", "other item", "alice"),
+            ("other course", "item", "alice"),
+        ]:
+            submission = sub_api.create_submission({
+                'student_id': student_id,
+                'course_id': course_id,
+                'item_id': item_id,
+                'item_type': 'openassessment',
+            }, 'test answer')
+            workflow_api.create_workflow(submission['uuid'], ['self'])
+
+        # A stale counter is corrected
+        AssessmentWorkflowStatusCount.objects.create(course_id="course", item_id="item", status="done", count=5)
+
+        rebuild_workflow_status_counts.Command().handle("course")
+        self.assertEqual(AssessmentWorkflowStatusCount.counts_for_item("course", "item"), {"self": 2})
+        self.assertEqual(AssessmentWorkflowStatusCount.counts_for_item("course", "other item"), {"self": 1})
+        self.assertEqual(AssessmentWorkflowStatusCount.counts_for_item("other course", "item"), {})
+
+    @raises(CommandError)
+    def test_too_many_args(self):
+        rebuild_workflow_status_counts.Command().handle("course", "item", "extra")
@@ -0,0 +1,50 @@
+"""
+Tests for the management command that releases expired peer assessment leases.
+"""
+import datetime
+from django.utils import timezone
+from openassessment.test_utils import CacheResetTest
+from openassessment.assessment.models import PeerWorkflow, PeerWorkflowLease, PeerWorkflowQueueEntry
+from openassessment.management.commands import release_expired_peer_leases
+from openassessment.workflow import api as workflow_api
+from submissions import api as sub_api
+
+
+class ReleaseExpiredPeerLeasesTest(CacheResetTest):
+    """
+    Test the management command that releases expired peer assessment leases.
+    """
+
+    COURSE_ID = u"test_course"
+    ITEM_ID = u"test_item"
+
+    def test_release(self):
+        workflows = []
+        for index in range(4):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': self.ITEM_ID,
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, 'test answer')
+            workflow_api.create_workflow(submission['uuid'], ['peer'])
+            workflows.append(PeerWorkflow.get_by_submission_uuid(submission['uuid']))
+
+        # The first three students open the last student's submission, and two of the leases expire
+        for scorer in workflows[:3]:
+            PeerWorkflow.create_item(scorer, workflows[3].submission_uuid)
+        PeerWorkflowLease.objects.filter(scorer__in=workflows[:2]).update(
+            expires_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+
+        cmd = release_expired_peer_leases.Command()
+        cmd.handle("1")
+
+        self.assertEqual(PeerWorkflowLease.objects.count(), 1)
+        entry = PeerWorkflowQueueEntry.objects.get(author=workflows[3])
+        self.assertEqual(entry.num_open, 1)
+
+    def test_nothing_to_release(self):
+        release_expired_peer_leases.Command().handle()
+        self.assertFalse(PeerWorkflowLease.objects.exists())
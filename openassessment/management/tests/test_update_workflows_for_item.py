@@ -0,0 +1,44 @@
+"""
+Tests for the management command that updates the workflows for a problem.
+"""
+from django.core.management.base import CommandError
+from nose.tools import raises
+from openassessment.test_utils import CacheResetTest
+from openassessment.management.commands import update_workflows_for_item
+from openassessment.workflow import api as workflow_api
+from openassessment.workflow.models import AssessmentWorkflow
+from submissions import api as sub_api
+
+
+class UpdateWorkflowsForItemTest(CacheResetTest):
+    """
+    Test the management command that updates the workflows for a problem.
+    """
+
+    COURSE_ID = u"test_course"
+    ITEM_ID = u"test_item"
+
+    def test_update(self):
+        student_item = {
+            'student_id': "test_user",
+            'course_id': self.COURSE_ID,
+            'item_id': self.ITEM_ID,
+            'item_type': 'openassessment',
+        }
+        submission = sub_api.create_submission(student_item, 'test answer')
+        workflow_api.create_workflow(submission['uuid'], ['training', 'self'])
+
+        # No training examples are required, so the student moves on to self assessment
+        cmd = update_workflows_for_item.Command()
+        cmd.handle(self.COURSE_ID, self.ITEM_ID, '{"training": {"num_required": 0}}')
+
+        workflow = AssessmentWorkflow.objects.get(submission_uuid=submission['uuid'])
+        self.assertEqual(workflow.status, "self")
+
+    @raises(CommandError)
+    def test_missing_args(self):
+        update_workflows_for_item.Command().handle(self.COURSE_ID, self.ITEM_ID)
+
+    @raises(CommandError)
+    def test_invalid_requirements(self):
+        update_workflows_for_item.Command().handle(self.COURSE_ID, self.ITEM_ID, '["peer"]')
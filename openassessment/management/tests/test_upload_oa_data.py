@@ -3,15 +3,55 @@
 Tests for management command that uploads submission/assessment data.
 """
 from StringIO import StringIO
+import csv
+import datetime
+import gzip
+import json
+import os.path
+import shutil
 import tarfile
+import tempfile
+from uuid import uuid4
 import boto
+import mock
 import moto
+from django.core.management.base import CommandError
+from django.db import DatabaseError
 from openassessment.test_utils import CacheResetTest
+from openassessment.data import CsvWriter
 from openassessment.management.commands import upload_oa_data
 from openassessment.workflow import api as workflow_api
 from submissions import api as sub_api
 
 
+class SerialPool(object):
+    """
+    Stand-in for a process pool that runs jobs in the test process,
+    which can see the test database.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def imap(self, func, jobs):
+        """
+        Run each job in turn, as its result is needed.
+        """
+        return (func(job) for job in jobs)
+
+    def terminate(self):
+        """
+        Nothing to stop.
+        """
+        pass
+
+    def join(self):
+        """
+        Nothing to wait for.
+        """
+        pass
+
+
 class UploadDataTest(CacheResetTest):
     """
     Test the upload management command.  Archiving and upload are in-scope,
@@ -70,3 +110,261 @@ class UploadDataTest(CacheResetTest):
         # Expect that we generated a URL for the bucket
         url = cmd.history[0]['url']
         self.assertIn("https://{}".format(self.BUCKET_NAME), url)
+
+    @moto.mock_s3
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 3)
+    def test_continue_export(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+
+        for index in range(7):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': 'test_item',
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, "test submission {}".format(index))
+            workflow_api.create_workflow(submission['uuid'], ['peer', 'self'])
+
+        # Simulate an export that fails after writing the first chunk of submissions
+        write_chunk = CsvWriter._write_chunk_to_csv   # pylint:disable=W0212
+        calls = []
+
+        def _fail_second_chunk(writer, *args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise DatabaseError("Lost connection to the database")
+            return write_chunk(writer, *args)
+
+        with mock.patch.object(CsvWriter, '_write_chunk_to_csv', autospec=True, side_effect=_fail_second_chunk):
+            with self.assertRaises(DatabaseError):
+                upload_oa_data.Command().handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, work_dir)
+        self.assertTrue(os.path.exists(os.path.join(work_dir, upload_oa_data.Command.CHECKPOINT_PATH)))
+
+        # Running the command again continues the export
+        cmd = upload_oa_data.Command()
+        cmd.handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, work_dir)
+        self.assertEqual(len(cmd.history), 1)
+        self.assertFalse(os.path.exists(os.path.join(work_dir, upload_oa_data.Command.CHECKPOINT_PATH)))
+
+        # Each submission was written exactly once
+        with open(os.path.join(work_dir, "submission.csv")) as submission_csv:
+            rows = list(csv.reader(submission_csv))[1:]
+        self.assertEqual(
+            sorted(row[1] for row in rows),
+            ["test_user_{}".format(index) for index in range(7)]
+        )
+
+    @moto.mock_s3
+    @mock.patch.object(upload_oa_data.multiprocessing, 'Pool', SerialPool)
+    def test_upload_with_workers(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+        for index in range(7):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': 'test_item',
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, "test submission {}".format(index))
+            workflow_api.create_workflow(submission['uuid'], ['peer', 'self'])
+
+        # Concatenating the shards gives the same files as a single process
+        contents = self._upload_contents(conn, workers=3)
+        self.assertIn("shard-1/submission.csv", contents)
+        self.assertEqual(self._upload_contents(conn), self._combine_shards(contents))
+
+    @moto.mock_s3
+    @mock.patch.object(upload_oa_data.multiprocessing, 'Pool', SerialPool)
+    def test_shards_deleted_once_archived(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        for index in range(5):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': 'test_item',
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, "test submission {}".format(index))
+            workflow_api.create_workflow(submission['uuid'], ['peer', 'self'])
+
+        # Record the shards on disk when each shard starts
+        dump_shard = upload_oa_data._dump_shard_to_csv   # pylint:disable=W0212
+        shards_on_disk = []
+
+        def _record_shards(job):
+            shards_on_disk.append(sorted(name for name in os.listdir(work_dir) if name.startswith("shard-")))
+            return dump_shard(job)
+
+        with mock.patch.object(upload_oa_data, '_dump_shard_to_csv', side_effect=_record_shards):
+            cmd = upload_oa_data.Command()
+            cmd.handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, work_dir, workers=2)
+
+        # Each shard was archived and deleted before the next one was written
+        self.assertEqual(len(shards_on_disk), 5)
+        for index, shards in enumerate(shards_on_disk):
+            self.assertEqual(shards, ["shard-{}".format(other) for other in range(index, 5)])
+        self.assertFalse([name for name in os.listdir(work_dir) if name.startswith("shard-")])
+
+    @moto.mock_s3
+    @mock.patch.object(upload_oa_data.multiprocessing, 'Pool', SerialPool)
+    def test_upload_jsonl_with_workers(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+        for index in range(7):
+            student_item = {
+                'student_id': "test_user_{}".format(index),
+                'course_id': self.COURSE_ID,
+                'item_id': 'test_item',
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, "test submission {}".format(index))
+            workflow_api.create_workflow(submission['uuid'], ['peer', 'self'])
+
+        # The shards are compressed in different batches,
+        # but the archive contains the same rows.
+        def _rows(contents):
+            return {
+                name: gzip.GzipFile(fileobj=StringIO(data), mode='rb').read()
+                for name, data in contents.iteritems()
+            }
+
+        contents = self._upload_contents(conn, format='jsonl')
+        self.assertEqual(
+            sorted(contents.keys()),
+            sorted(name.replace(".csv", ".jsonl.gz") for name in self.CSV_NAMES)
+        )
+        shard_contents = self._combine_shards(self._upload_contents(conn, format='jsonl', workers=3))
+        self.assertEqual(_rows(contents), _rows(shard_contents))
+
+    @moto.mock_s3
+    @mock.patch.object(upload_oa_data.Command, 'WATERMARK_DELAY', datetime.timedelta(0))
+    def test_incremental_upload(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+
+        def _create_submissions(num_submissions):
+            for __ in range(num_submissions):
+                student_item = {
+                    'student_id': uuid4().hex,
+                    'course_id': self.COURSE_ID,
+                    'item_id': 'test_item',
+                    'item_type': 'openassessment',
+                }
+                submission = sub_api.create_submission(student_item, "test submission")
+                workflow_api.create_workflow(submission['uuid'], ['peer', 'self'])
+
+        # The first incremental export contains everything
+        _create_submissions(2)
+        contents = self._upload_contents(conn, incremental=True)
+        first_manifest = json.loads(contents["manifest.json"])
+        self.assertIs(first_manifest['since'], None)
+        self.assertEqual(len(list(csv.reader(StringIO(contents["submission.csv"])))), 3)
+
+        # The next one only contains the changes since the first
+        _create_submissions(1)
+        contents = self._upload_contents(conn, incremental=True)
+        second_manifest = json.loads(contents["manifest.json"])
+        self.assertEqual(second_manifest['since'], first_manifest['until'])
+        self.assertEqual(len(list(csv.reader(StringIO(contents["submission.csv"])))), 2)
+
+        # The watermark is recorded in the bucket
+        key = conn.get_all_buckets()[0].get_key(u"{}/incremental-csv.json".format(self.COURSE_ID))
+        self.assertEqual(json.loads(key.get_contents_as_string())['until'], second_manifest['until'])
+
+        # Exporting the changes since an earlier time overrides the watermark
+        contents = self._upload_contents(conn, since="2000-01-01T00:00:00")
+        self.assertEqual(len(list(csv.reader(StringIO(contents["submission.csv"])))), 4)
+
+    @moto.mock_s3
+    @mock.patch.object(upload_oa_data.Command, 'WATERMARK_DELAY', datetime.timedelta(0))
+    def test_archive_names_unique(self):
+        conn = boto.connect_s3()
+        conn.create_bucket(self.BUCKET_NAME)
+        bucket = conn.get_all_buckets()[0]
+
+        # Exports started one after another do not replace each other's archives
+        commands = [upload_oa_data.Command() for __ in range(3)]
+        commands[0].handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME)
+        commands[1].handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME)
+        commands[2].handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, incremental=True)
+        key_names = [cmd.history[0]['key'] for cmd in commands]
+        self.assertEqual(len(set(key_names)), 3)
+        for key_name in key_names:
+            self.assertIsNot(bucket.get_key(key_name), None)
+        self.assertIn(u"-csv-changes-start-", key_names[2])
+
+        # The manifest points at the incremental export's archive
+        manifest_key = bucket.get_key(u"{}/incremental-csv.json".format(self.COURSE_ID))
+        self.assertEqual(json.loads(manifest_key.get_contents_as_string())['key'], key_names[2])
+
+    def test_invalid_incremental_options(self):
+        with self.assertRaises(CommandError):
+            upload_oa_data.Command().handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, since="yesterday")
+        with self.assertRaises(CommandError):
+            upload_oa_data.Command().handle(
+                self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, incremental=True, workers=2
+            )
+
+    def test_invalid_format(self):
+        with self.assertRaises(CommandError):
+            upload_oa_data.Command().handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, format='xml')
+
+    def test_invalid_workers(self):
+        with self.assertRaises(CommandError):
+            upload_oa_data.Command().handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, workers=0)
+
+    def test_multipart_upload(self):
+        bucket = mock.Mock()
+        upload = upload_oa_data.MultipartUploadFile(bucket, "key", 4)
+        mock_upload = bucket.initiate_multipart_upload.return_value
+
+        # Parts are uploaded as soon as enough data is written
+        upload.write("abc")
+        self.assertFalse(mock_upload.upload_part_from_file.called)
+        upload.write("defg")
+        upload.write("h")
+        upload.complete()
+
+        parts = [
+            (part_file.getvalue(), part_num)
+            for (part_file, part_num), __ in mock_upload.upload_part_from_file.call_args_list
+        ]
+        self.assertEqual(parts, [("abcdefg", 1), ("h", 2)])
+        mock_upload.complete_upload.assert_called_once_with()
+
+    def _combine_shards(self, contents):
+        """
+        Concatenate the files of each shard in an archive, in the order of the shards.
+        """
+        def _shard_index(name):
+            """
+            Return the index of the shard from a name like "shard-2/submission.csv".
+            """
+            return int(os.path.dirname(name).split("-")[1])
+
+        combined = {name: data for name, data in contents.iteritems() if not os.path.dirname(name)}
+        for name in sorted([name for name in contents if os.path.dirname(name)], key=_shard_index):
+            rel_path = os.path.basename(name)
+            combined[rel_path] = combined.get(rel_path, "") + contents[name]
+        return combined
+
+    def _upload_contents(self, conn, **options):
+        """
+        Run the command and return the contents of each file in the uploaded archive.
+        """
+        cmd = upload_oa_data.Command()
+        cmd.handle(self.COURSE_ID.encode('utf-8'), self.BUCKET_NAME, **options)
+        key = conn.get_all_buckets()[0].get_key(cmd.history[0]['key'])
+        with tarfile.open(mode="r:gz", fileobj=StringIO(key.get_contents_as_string())) as tar:
+            return {
+                member.name: tar.extractfile(member).read()
+                for member in tar.getmembers()
+            }
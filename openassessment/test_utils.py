@@ -4,7 +4,7 @@ Test utilities
 from django.core.cache import cache
 from django.test import TestCase, TransactionTestCase
 from openassessment.assessment.models.ai import (
-    CLASSIFIERS_CACHE_IN_MEM, CLASSIFIERS_CACHE_IN_FILE
+    CLASSIFIERS_CACHE_IN_MEM, CLASSIFIERS_CACHE_ON_DISK
 )
 
 
@@ -12,7 +12,7 @@ def _clear_all_caches():
     """Clear the default cache and any custom caches."""
     cache.clear()
     CLASSIFIERS_CACHE_IN_MEM.clear()
-    CLASSIFIERS_CACHE_IN_FILE.clear()
+    CLASSIFIERS_CACHE_ON_DISK.clear()
 
 
 class CacheResetTest(TestCase):
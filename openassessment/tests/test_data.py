@@ -6,12 +6,22 @@ Tests for openassessment data aggregation.
 import os.path
 from StringIO import StringIO
 import csv
+import json
+from uuid import uuid4
+import mock
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
 import ddt
 from submissions import api as sub_api
+from submissions.models import Submission
 from openassessment.test_utils import TransactionCacheResetTest
+from openassessment.assessment.api import peer as peer_api
 from openassessment.workflow import api as workflow_api
-from openassessment.data import CsvWriter
+from openassessment.workflow.models import AssessmentWorkflow
+from openassessment.data import CsvWriter, CsvFormat, OUTPUT_FORMATS
 
 
 @ddt.ddt
@@ -90,6 +100,185 @@ class CsvWriterTest(TransactionCacheResetTest):
         # Check that we have the right number of rows
         self.assertEqual(len(rows), num_submissions)
 
+    @ddt.data(
+        ('db_fixtures/scored.json', 'edX/Enchantment_101/April_1'),
+        ('db_fixtures/feedback_on_assessment.json', 'edX/Enchantment_101/April_1'),
+        ('db_fixtures/feedback_only_criterion.json', 'edX/Enchantment_101/April_1'),
+        ('db_fixtures/unicode.json', u"𝓽𝓮𝓼𝓽_𝓬𝓸𝓾𝓻𝓼𝓮"),
+    )
+    @ddt.unpack
+    def test_bulk_matches_per_submission(self, fixture_relpath, course_id):
+        self._load_fixture(fixture_relpath)
+
+        per_submission_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(per_submission_streams, bulk=False).write_to_csv(course_id)
+        bulk_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(bulk_streams).write_to_csv(course_id)
+
+        for output_name in CsvWriter.MODELS:
+            self.assertEqual(
+                bulk_streams[output_name].getvalue(),
+                per_submission_streams[output_name].getvalue(),
+                msg="Output name: {}".format(output_name)
+            )
+
+    def test_bulk_num_queries(self):
+        # The number of queries depends on the number of chunks,
+        # not the number of submissions.
+        def _num_queries():
+            progress_callback = mock.Mock()
+            with CaptureQueriesContext(connection) as queries:
+                CsvWriter(self._output_streams(CsvWriter.MODELS), progress_callback).write_to_csv('test_course')
+            self.assertEqual(progress_callback.call_count, Submission.objects.count())
+            return len(queries)
+
+        self._create_submissions(2)
+        num_queries = _num_queries()
+        self._create_submissions(5)
+        self.assertEqual(_num_queries(), num_queries)
+
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 3)
+    def test_continue_from_checkpoint(self):
+        self._create_submissions(7)
+
+        # Export everything, recording the output at each checkpoint
+        checkpoints = []
+        output_streams = self._output_streams(CsvWriter.MODELS)
+
+        def _checkpoint_callback(checkpoint):
+            contents = {name: stream.getvalue() for name, stream in output_streams.iteritems()}
+            checkpoints.append((checkpoint, contents))
+
+        CsvWriter(output_streams, checkpoint_callback=_checkpoint_callback).write_to_csv('test_course')
+        self.assertEqual(len(checkpoints), 3)
+        self.assertEqual(len(self._rows(output_streams['submission'])), 7)
+
+        # Continue an export that stopped after the first checkpoint
+        checkpoint, contents = checkpoints[0]
+        continued_streams = self._output_streams(CsvWriter.MODELS)
+        for name, stream in continued_streams.iteritems():
+            stream.write(contents[name])
+        CsvWriter(continued_streams).write_to_csv('test_course', checkpoint=json.loads(json.dumps(checkpoint)))
+
+        for name in CsvWriter.MODELS:
+            self.assertEqual(
+                continued_streams[name].getvalue(),
+                output_streams[name].getvalue(),
+                msg="Output name: {}".format(name)
+            )
+
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 3)
+    def test_workflows_created_at_the_same_time(self):
+        # Workflows are paged by (created, id), so none are skipped
+        # or repeated when many share a timestamp.
+        self._create_submissions(7)
+        AssessmentWorkflow.objects.update(created=now())
+        output_streams = self._output_streams(['submission'])
+        CsvWriter(output_streams).write_to_csv('test_course')
+        submission_uuids = [row[0] for row in self._rows(output_streams['submission'])]
+        self.assertItemsEqual(submission_uuids, Submission.objects.values_list('uuid', flat=True))
+
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 3)
+    def test_workflows_created_during_export(self):
+        self._create_submissions(4)
+        output_streams = self._output_streams(['submission'])
+        CsvWriter(
+            output_streams, checkpoint_callback=lambda checkpoint: self._create_submissions(1)
+        ).write_to_csv('test_course')
+
+        # The workflow created after the first chunk is included,
+        # but not the one created after the export reached the end.
+        self.assertEqual(len(self._rows(output_streams['submission'])), 5)
+
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 2)
+    def test_write_changes(self):
+        self._create_submissions(3)
+        first_watermark = now()
+        self._create_submissions(2)
+        second_watermark = now()
+
+        # Each range of time contains the submissions and scores created in it
+        for since, until, num_rows in [(None, first_watermark, 3), (first_watermark, second_watermark, 2)]:
+            output_streams = self._output_streams(CsvWriter.MODELS)
+            CsvWriter(output_streams).write_changes_to_csv('test_course', since, until)
+            self.assertEqual(len(self._rows(output_streams['submission'])), num_rows)
+            self.assertEqual(len(self._rows(output_streams['score'])), num_rows)
+
+        # A new score for an old submission is a change
+        submission_uuid = Submission.objects.order_by('id')[0].uuid
+        sub_api.set_score(submission_uuid, 2, 2)
+        output_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(output_streams).write_changes_to_csv('test_course', second_watermark, now())
+        self.assertEqual(self._rows(output_streams['submission']), [])
+        self.assertEqual(
+            [row[:3] for row in self._rows(output_streams['score'])],
+            [[submission_uuid, '2', '2']]
+        )
+
+    def test_write_changes_assessments_and_feedback(self):
+        self._load_fixture('db_fixtures/feedback_on_assessment.json')
+        course_id = 'edX/Enchantment_101/April_1'
+        watermark = now()
+
+        # Everything up to now matches a full export
+        full_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(full_streams).write_to_csv(course_id)
+        changed_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(changed_streams).write_changes_to_csv(course_id, None, watermark)
+        for name in ['assessment', 'assessment_part', 'assessment_feedback', 'assessment_feedback_option', 'submission']:
+            self.assertItemsEqual(
+                self._rows(changed_streams[name]), self._rows(full_streams[name]),
+                msg="Output name: {}".format(name)
+            )
+
+        # Changing the feedback on assessments exports it again
+        peer_api.set_assessment_feedback({
+            'submission_uuid': "387d840a-d0ae-11e3-bb0e-14109fd8dc43",
+            'feedback_text': u"Changed feedback",
+            'options': [],
+        })
+        changed_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(changed_streams).write_changes_to_csv(course_id, watermark, now())
+        self.assertEqual(
+            [row[:2] for row in self._rows(changed_streams['assessment_feedback'])],
+            [["387d840a-d0ae-11e3-bb0e-14109fd8dc43", "Changed feedback"]]
+        )
+        for name in ['assessment', 'assessment_part', 'submission', 'score']:
+            self.assertEqual(self._rows(changed_streams[name]), [], msg="Output name: {}".format(name))
+
+    def test_shards(self):
+        self._create_submissions(7)
+        output_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(output_streams).write_to_csv('test_course')
+
+        # Export each shard separately
+        shards = CsvWriter(dict()).shard_positions('test_course', 3)
+        self.assertEqual(len(shards), 3)
+        shard_streams = []
+        for start, end in shards:
+            streams = self._output_streams(CsvWriter.MODELS)
+            CsvWriter(streams).write_to_csv('test_course', checkpoint=start, end=end)
+            shard_streams.append(streams)
+
+        # Concatenating the shards gives the same output as exporting the course at once
+        for name in CsvWriter.MODELS:
+            if name != 'assessment_feedback_option':
+                self.assertEqual(
+                    "".join(streams[name].getvalue() for streams in shard_streams),
+                    output_streams[name].getvalue(),
+                    msg="Output name: {}".format(name)
+                )
+        # Only the first shard starts with the header
+        self.assertEqual(
+            [len(streams['submission'].getvalue().splitlines()) for streams in shard_streams],
+            [3, 2, 3]
+        )
+
+    def test_shards_few_submissions(self):
+        self.assertEqual(CsvWriter(dict()).shard_positions('test_course', 3), [(None, None)])
+        self._create_submissions(2)
+        self.assertEqual(len(CsvWriter(dict()).shard_positions('test_course', 3)), 2)
+
     def test_other_course_id(self):
         # Try a course ID with no submissions
         self._load_fixture('db_fixtures/scored.json')
@@ -104,6 +293,29 @@ class CsvWriterTest(TransactionCacheResetTest):
             rows = content.split('\n')
             self.assertEqual(len(rows), 2)
 
+    @ddt.data(
+        ('jsonl', 'db_fixtures/feedback_on_assessment.json', 'edX/Enchantment_101/April_1'),
+        ('jsonl', 'db_fixtures/unicode.json', u"𝓽𝓮𝓼𝓽_𝓬𝓸𝓾𝓻𝓼𝓮"),
+        ('columnar', 'db_fixtures/feedback_on_assessment.json', 'edX/Enchantment_101/April_1'),
+        ('columnar', 'db_fixtures/unicode.json', u"𝓽𝓮𝓼𝓽_𝓬𝓸𝓾𝓻𝓼𝓮"),
+    )
+    @ddt.unpack
+    def test_output_format_matches_csv(self, output_format, fixture_relpath, course_id):
+        self._load_fixture(fixture_relpath)
+        self._assert_output_format_matches_csv(output_format, course_id)
+
+    @ddt.data('jsonl', 'columnar')
+    @mock.patch.object(CsvWriter, 'QUERY_INTERVAL', 3)
+    def test_output_format_batches(self, output_format):
+        # Each chunk of submissions is written as a separate batch,
+        # and the batches are read back as a single stream.
+        self._create_submissions(7)
+        self._assert_output_format_matches_csv(output_format, 'test_course')
+
+    def test_unknown_output_format(self):
+        with self.assertRaises(KeyError):
+            CsvWriter(self._output_streams(CsvWriter.MODELS), output_format='xml')
+
     def test_unicode(self):
         # Flush out unicode errors
         self._load_fixture('db_fixtures/unicode.json')
@@ -116,6 +328,88 @@ class CsvWriterTest(TransactionCacheResetTest):
             rows = content.split('\n')
             self.assertGreater(len(rows), 2)
 
+    def _create_submissions(self, num_submissions):
+        """
+        Create scored submissions with workflows in the test course.
+
+        Args:
+            num_submissions (int): The number of submissions to create.
+
+        Returns:
+            None
+
+        """
+        for __ in range(num_submissions):
+            student_item = {
+                'student_id': uuid4().hex,
+                'course_id': 'test_course',
+                'item_id': 'test_item',
+                'item_type': 'openassessment',
+            }
+            submission = sub_api.create_submission(student_item, "test submission")
+            sub_api.set_score(submission['uuid'], 1, 2)
+            workflow_api.create_workflow(submission['uuid'], ['self'])
+
+    def _rows(self, output_buffer):
+        """
+        Parse the rows written to an output buffer, excluding the header.
+
+        Args:
+            output_buffer (StringIO): The output buffer.
+
+        Returns:
+            list of lists
+
+        """
+        return list(csv.reader(StringIO(output_buffer.getvalue())))[1:]
+
+    def _assert_output_format_matches_csv(self, output_format, course_id):
+        """
+        Check that exporting a course in an output format
+        writes the same rows as exporting it to CSV.
+
+        Args:
+            output_format (unicode): The key of the format in `OUTPUT_FORMATS`.
+            course_id (unicode): The course to export.
+
+        Returns:
+            None
+
+        """
+        csv_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(csv_streams).write_to_csv(course_id)
+        format_streams = self._output_streams(CsvWriter.MODELS)
+        CsvWriter(format_streams, output_format=output_format).write_to_csv(course_id)
+
+        for output_name in CsvWriter.MODELS:
+            self.assertEqual(
+                self._typed_rows(OUTPUT_FORMATS[output_format], format_streams[output_name], output_name),
+                self._typed_rows(CsvFormat, csv_streams[output_name], output_name),
+                msg="Output name: {}".format(output_name)
+            )
+
+    def _typed_rows(self, format_cls, output_buffer, output_name):
+        """
+        Read the rows written to an output buffer in a format,
+        converting the values to the types of their columns.
+
+        Args:
+            format_cls (type): The `OutputFormat` the rows were written in.
+            output_buffer (StringIO): The output buffer.
+            output_name (unicode): The name of the output.
+
+        Returns:
+            list of lists
+
+        """
+        converters = {'int': int, 'datetime': parse_datetime, 'string': unicode}
+        types = CsvWriter.TYPES[output_name]
+        reader = format_cls(StringIO(output_buffer.getvalue()), CsvWriter.HEADERS[output_name], types)
+        return [
+            [converters[column_type](value) for column_type, value in zip(types, row)]
+            for row in reader.read_rows()
+        ]
+
     def _output_streams(self, names):
         """
         Create in-memory buffers.
@@ -2,8 +2,12 @@
 Public interface for the Assessment Workflow.
 
 """
+from hashlib import sha1
+import json
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import DatabaseError
 
 from openassessment.assessment.api import peer as peer_api
@@ -13,7 +17,9 @@ from openassessment.assessment.errors import (
     PeerAssessmentError, StudentTrainingInternalError, AIError,
     PeerAssessmentInternalError)
 from submissions import api as sub_api
-from .models import AssessmentWorkflow, AssessmentWorkflowCancellation, AssessmentWorkflowStep
+from .models import (
+    AssessmentWorkflow, AssessmentWorkflowCancellation, AssessmentWorkflowStatusCount, AssessmentWorkflowStep
+)
 from .serializers import AssessmentWorkflowSerializer, AssessmentWorkflowCancellationSerializer
 from .errors import (
     AssessmentWorkflowError, AssessmentWorkflowInternalError,
@@ -22,6 +28,11 @@ from .errors import (
 
 logger = logging.getLogger(__name__)
 
+# Number of seconds to keep a snapshot of a workflow's information in the cache.
+# Rendering a page asks for the workflow once for each step of the problem,
+# so a short timeout lets the steps share a single evaluation of the workflow.
+DEFAULT_WORKFLOW_INFO_CACHE_TIMEOUT = 10
+
 
 def create_workflow(submission_uuid, steps, on_init_params=None):
     """Begins a new assessment workflow.
@@ -178,7 +189,15 @@ def get_workflow_for_submission(submission_uuid, assessment_requirements):
             }
         }
 
+    The information is cached for a few seconds (see the
+    `ORA2_WORKFLOW_INFO_CACHE_TIMEOUT` Django setting), so that the steps of a
+    page can share one evaluation of the workflow.  The cache is cleared when the
+    submission is assessed or the workflow is updated or cancelled.
+
     """
+    cached = cache.get(AssessmentWorkflow.info_cache_key(submission_uuid))
+    if cached is not None and cached['requirements_hash'] == _requirements_hash(assessment_requirements):
+        return cached['workflow']
     return update_from_assessments(submission_uuid, assessment_requirements)
 
 
@@ -268,17 +287,67 @@ def update_from_assessments(submission_uuid, assessment_requirements):
             u"Updated workflow for submission UUID {uuid} "
             u"with requirements {reqs}"
         ).format(uuid=submission_uuid, reqs=assessment_requirements))
-        return _serialized_with_details(workflow, assessment_requirements)
+        workflow_info = _serialized_with_details(workflow, assessment_requirements)
+        _cache_workflow_info(submission_uuid, assessment_requirements, workflow_info)
+        return workflow_info
     except PeerAssessmentError as err:
         err_msg = u"Could not update assessment workflow: {}".format(err)
         logger.exception(err_msg)
         raise AssessmentWorkflowInternalError(err_msg)
 
 
+def update_workflows_for_item(course_id, item_id, assessment_requirements):
+    """Update the status of every workflow for an item in a course.
+
+    This has the same effect as calling `update_from_assessments()` for each
+    submission to the item, but checks the assessment APIs for many submissions
+    at once, so it is suitable for refreshing a whole item after its
+    requirements change or a deadline passes.
+
+    Args:
+        course_id (unicode): The ID of the course.
+        item_id (unicode): The ID of the item in the course.
+        assessment_requirements (dict): Dictionary of requirements for each
+            assessment step. See `update_from_assessments()` for details.
+
+    Returns:
+        int: The number of workflows whose status changed.
+
+    Raises:
+        AssessmentWorkflowInternalError: Unexpected internal error, such as
+            a database configuration problem.
+
+    Examples:
+        >>> update_workflows_for_item(
+        ...     "ora2/1/1", "peer-assessment-problem",
+        ...     {"peer": {"must_grade":5, "must_be_graded_by":3}}
+        ... )
+        12
+
+    """
+    try:
+        num_changed = AssessmentWorkflow.update_workflows_for_item(course_id, item_id, assessment_requirements)
+        logger.info((
+            u"Updated {num} workflows for course {course_id} and item {item_id} "
+            u"with requirements {reqs}"
+        ).format(num=num_changed, course_id=course_id, item_id=item_id, reqs=assessment_requirements))
+        return num_changed
+    except (PeerAssessmentError, DatabaseError) as err:
+        err_msg = (
+            u"Could not update assessment workflows for course {course_id} and item {item_id}: {err}"
+        ).format(course_id=course_id, item_id=item_id, err=err)
+        logger.exception(err_msg)
+        raise AssessmentWorkflowInternalError(err_msg)
+
+
 def get_status_counts(course_id, item_id, steps):
     """
     Count how many workflows have each status, for a given item in a course.
 
+    If the `ORA2_WORKFLOW_STATUS_COUNTERS` Django setting is enabled, the counts
+    are read from counters that are updated as workflows change status; otherwise,
+    the workflows are counted with a single grouped query.
+
     Keyword Arguments:
         course_id (unicode): The ID of the course.
         item_id (unicode): The ID of the item in the course.
@@ -301,14 +370,15 @@ def get_status_counts(course_id, item_id, steps):
     # the AI status, so we should never return it.
     statuses = steps + AssessmentWorkflow.STATUSES
     if 'ai' in statuses: statuses.remove('ai')
+
+    if AssessmentWorkflowStatusCount.is_enabled():
+        counts = AssessmentWorkflowStatusCount.counts_for_item(course_id, item_id)
+    else:
+        counts = AssessmentWorkflow.count_statuses(course_id, item_id)
     return [
         {
             "status": status,
-            "count": AssessmentWorkflow.objects.filter(
-                status=status,
-                course_id=course_id,
-                item_id=item_id,
-            ).count()
+            "count": counts.get(status, 0)
         }
         for status in statuses
     ]
@@ -373,6 +443,27 @@ def _serialized_with_details(workflow, assessment_requirements):
     return data_dict
 
 
+def _requirements_hash(assessment_requirements):
+    """Return a hash identifying a set of assessment requirements."""
+    return sha1(json.dumps(assessment_requirements, sort_keys=True)).hexdigest()
+
+
+def _cache_workflow_info(submission_uuid, assessment_requirements, workflow_info):
+    """Cache a snapshot of a workflow's information for the given requirements.
+    See `get_workflow_for_submission()` for details.
+    """
+    timeout = getattr(settings, 'ORA2_WORKFLOW_INFO_CACHE_TIMEOUT', DEFAULT_WORKFLOW_INFO_CACHE_TIMEOUT)
+    if timeout:
+        cache.set(
+            AssessmentWorkflow.info_cache_key(submission_uuid),
+            {
+                'requirements_hash': _requirements_hash(assessment_requirements),
+                'workflow': workflow_info,
+            },
+            timeout
+        )
+
+
 def cancel_workflow(submission_uuid, comments, cancelled_by_id, assessment_requirements):
     """
     Add an entry in AssessmentWorkflowCancellation table for a AssessmentWorkflow.
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentWorkflowStatusCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', models.CharField(max_length=255)),
+                ('item_id', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='assessmentworkflow',
+            index_together=set([('course_id', 'item_id', 'status')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='assessmentworkflowstatuscount',
+            unique_together=set([('course_id', 'item_id', 'status')]),
+        ),
+    ]
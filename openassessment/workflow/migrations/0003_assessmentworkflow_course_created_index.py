@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0002_workflow_status_counts'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='assessmentworkflow',
+            index_together=set([('course_id', 'item_id', 'status'), ('course_id', 'created', 'id')]),
+        ),
+    ]
@@ -11,15 +11,21 @@ need to then generate a matching migration for it using:
 """
 import logging
 import importlib
+from collections import defaultdict
 from django.conf import settings
-from django.db import models, transaction, DatabaseError
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import models, transaction, DatabaseError, IntegrityError
+from django.db.models import Count, F
 from django.dispatch import receiver
 from django_extensions.db.fields import UUIDField
 from django.utils.timezone import now
 from model_utils import Choices
 from model_utils.models import StatusModel, TimeStampedModel
 from submissions import api as sub_api
-from openassessment.assessment.signals import assessment_complete_signal
+from openassessment.assessment.signals import (
+    assessment_complete_signal, assessments_complete_signal, assessment_created_signal
+)
 from .errors import AssessmentApiLoadError, AssessmentWorkflowError, AssessmentWorkflowInternalError
 
 
@@ -42,6 +48,250 @@ ASSESSMENT_API_DICT = getattr(
     DEFAULT_ASSESSMENT_API_DICT
 )
 
+
+class AssessmentStepApi(object):
+    """
+    The functions that an assessment API module provides to the workflow.
+
+    Assessment modules may omit any of these functions.  Which ones a module
+    defines is resolved once, when the module is loaded, so the workflow
+    does not need to look up fallbacks every time it calls the module.
+
+    If a module does not define `submitter_is_finished` or `assessment_is_finished`,
+    we default to True -- that is, automatically assume that the user has
+    met the requirements.  This prevents students from getting "stuck"
+    in the workflow in the event of a rollback that removes a step
+    from the problem definition.  Steps that are not configured at all
+    behave the same way, but have no other functions.
+
+    Functions are called through the module (rather than stored here),
+    so that they can still be patched in the test suite.
+    """
+
+    FUNCTION_NAMES = [
+        'submitter_is_finished', 'assessment_is_finished',
+        'submitters_are_finished', 'assessments_are_finished',
+        'get_score', 'on_init', 'on_start', 'on_cancel',
+    ]
+
+    def __init__(self, name, module):
+        """
+        Args:
+            name (unicode): The name of the assessment step.
+            module (module): The assessment API module, or None if the step is not configured.
+        """
+        self.name = name
+        self.module = module
+        self.functions = frozenset(
+            func_name for func_name in self.FUNCTION_NAMES
+            if callable(getattr(module, func_name, None))
+        )
+
+    @property
+    def is_configured(self):
+        """Whether an assessment API module is configured for the step."""
+        return self.module is not None
+
+    @property
+    def provides_score(self):
+        """Whether the assessment API can score submissions."""
+        return 'get_score' in self.functions
+
+    def submitter_is_finished(self, submission_uuid, requirements):
+        """
+        Check whether the submitter has met the requirements of the step.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+            requirements (dict): The requirements of the step, or None if unknown.
+
+        Returns:
+            bool: True if the module does not check the submitter.
+
+        """
+        if 'submitter_is_finished' not in self.functions:
+            return True
+        return self.module.submitter_is_finished(submission_uuid, requirements)
+
+    def assessment_is_finished(self, submission_uuid, requirements):
+        """
+        Check whether the submission has been fully assessed in the step.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+            requirements (dict): The requirements of the step, or None if unknown.
+
+        Returns:
+            bool: True if the module does not check the assessments.
+
+        """
+        if 'assessment_is_finished' not in self.functions:
+            return True
+        return self.module.assessment_is_finished(submission_uuid, requirements)
+
+    def submitters_are_finished(self, submission_uuids, requirements):
+        """
+        Return the set of submissions whose submitters are finished,
+        checking each submission in turn if the module has no bulk check.
+
+        Args:
+            submission_uuids (list of str): The UUIDs of the submissions.
+            requirements (dict): The requirements of the step, or None if unknown.
+
+        Returns:
+            set of str
+
+        """
+        if 'submitters_are_finished' in self.functions:
+            return self.module.submitters_are_finished(submission_uuids, requirements)
+        return set(
+            submission_uuid for submission_uuid in submission_uuids
+            if self.submitter_is_finished(submission_uuid, requirements)
+        )
+
+    def assessments_are_finished(self, submission_uuids, requirements):
+        """
+        Return the set of submissions that have been fully assessed,
+        checking each submission in turn if the module has no bulk check.
+
+        Args:
+            submission_uuids (list of str): The UUIDs of the submissions.
+            requirements (dict): The requirements of the step, or None if unknown.
+
+        Returns:
+            set of str
+
+        """
+        if 'assessments_are_finished' in self.functions:
+            return self.module.assessments_are_finished(submission_uuids, requirements)
+        return set(
+            submission_uuid for submission_uuid in submission_uuids
+            if self.assessment_is_finished(submission_uuid, requirements)
+        )
+
+    def get_score(self, submission_uuid, requirements):
+        """
+        Retrieve the score the step gives the submission.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+            requirements (dict): The requirements of the step, or None if unknown.
+
+        Returns:
+            dict with keys 'points_earned' and 'points_possible', or None if
+            the submission cannot be scored yet or the module does not score.
+
+        """
+        if not self.provides_score:
+            return None
+        return self.module.get_score(submission_uuid, requirements)
+
+    def on_init(self, submission_uuid, **params):
+        """
+        Notify the module that a workflow including the step has been created.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+
+        Keyword Arguments:
+            Parameters for the step, passed on to the module.
+
+        Returns:
+            None
+
+        """
+        if 'on_init' in self.functions:
+            self.module.on_init(submission_uuid, **params)
+
+    def on_start(self, submission_uuid):
+        """
+        Notify the module that the submitter is beginning the step.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+
+        Returns:
+            None
+
+        """
+        if 'on_start' in self.functions:
+            self.module.on_start(submission_uuid)
+
+    def on_cancel(self, submission_uuid):
+        """
+        Notify the module that the workflow has been cancelled.
+
+        Args:
+            submission_uuid (str): The UUID of the submission.
+
+        Returns:
+            None
+
+        """
+        if 'on_cancel' in self.functions:
+            self.module.on_cancel(submission_uuid)
+
+
+# Assessment step APIs loaded so far, keyed by step name.
+# This is cleared when the `ORA2_ASSESSMENTS` setting changes
+# (for example, with @override_settings in the test suite).
+_STEP_APIS = {}
+
+
+def get_step_api(name):
+    """
+    Retrieve the assessment API for a workflow step.
+
+    This relies on Django settings to map step names to
+    the assessment API implementation.  Each step's module is
+    imported once, the first time the step is used.
+
+    Args:
+        name (unicode): The name of the assessment step.
+
+    Returns:
+        AssessmentStepApi
+
+    Raises:
+        AssessmentApiLoadError
+
+    """
+    step_api = _STEP_APIS.get(name)
+    if step_api is not None:
+        return step_api
+
+    api_path = getattr(
+        settings, 'ORA2_ASSESSMENTS', DEFAULT_ASSESSMENT_API_DICT
+    ).get(name)
+    if api_path is not None:
+        try:
+            module = importlib.import_module(api_path)
+        except (ImportError, ValueError):
+            raise AssessmentApiLoadError(name, api_path)
+    else:
+        # It's possible for the database to contain steps for APIs
+        # that are not configured -- for example, if a new assessment
+        # type is added, then the code is rolled back.
+        msg = (
+            u"No assessment configured for '{name}'.  "
+            u"Check the ORA2_ASSESSMENTS Django setting."
+        ).format(name=name)
+        logger.warning(msg)
+        module = None
+
+    step_api = AssessmentStepApi(name, module)
+    _STEP_APIS[name] = step_api
+    return step_api
+
+
+@receiver(setting_changed)
+def clear_step_apis(sender, setting, **kwargs):     # pylint:disable=W0613
+    """
+    Reload the assessment step APIs when the `ORA2_ASSESSMENTS` setting changes.
+    """
+    if setting == 'ORA2_ASSESSMENTS':
+        _STEP_APIS.clear()
+
 # For now, we use a simple scoring mechanism:
 # Once a student has completed all assessments,
 # we search assessment APIs
@@ -83,6 +333,9 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
 
     STATUS = Choices(*STATUS_VALUES)  # implicit "status" field
 
+    # Number of workflows to update at a time in `update_workflows_for_item`
+    BULK_UPDATE_CHUNK_SIZE = 500
+
     submission_uuid = models.CharField(max_length=36, db_index=True, unique=True)
     uuid = UUIDField(version=1, db_index=True, unique=True)
 
@@ -95,7 +348,11 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
 
     class Meta:
         ordering = ["-created"]
-        # TODO: In migration, need a non-unique index on (course_id, item_id, status)
+        index_together = [
+            ("course_id", "item_id", "status"),
+            # Used to page through a course's workflows in the order they were created
+            ("course_id", "created", "id"),
+        ]
 
     @classmethod
     @transaction.atomic
@@ -143,11 +400,10 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
         for step in workflow_steps:
             api = step.api()
 
-            if api is not None:
+            if api.is_configured:
                 # Initialize the assessment module
                 # We do this for every assessment module
-                on_init_func = getattr(api, 'on_init', lambda submission_uuid, **params: None)
-                on_init_func(submission_uuid, **on_init_params.get(step.name, {}))
+                api.on_init(submission_uuid, **on_init_params.get(step.name, {}))
 
                 # For the first valid step, update the workflow status
                 # and notify the assessment module that it's being started
@@ -157,12 +413,14 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
                     workflow.save()
 
                     # Notify the assessment module that it's being started
-                    on_start_func = getattr(api, 'on_start', lambda submission_uuid: None)
-                    on_start_func(submission_uuid)
+                    api.on_start(submission_uuid)
 
                     # Remember that we've already started the first step
                     has_started_first_step = True
 
+        # Count the workflow in its initial status
+        AssessmentWorkflowStatusCount.record_change(workflow.course_id, workflow.item_id, None, workflow.status)
+
         # Update the workflow (in case some of the assessment modules are automatically complete)
         # We do NOT pass in requirements, on the assumption that any assessment module
         # that accepts requirements would NOT automatically complete.
@@ -171,6 +429,52 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
         # Return the newly created workflow
         return workflow
 
+    @classmethod
+    def count_statuses(cls, course_id, item_id):
+        """
+        Count the workflows with each status for an item in a course, in a single query.
+
+        Args:
+            course_id (unicode): The ID of the course.
+            item_id (unicode): The ID of the item in the course.
+
+        Returns:
+            dict mapping statuses to counts.  Statuses without workflows are omitted.
+
+        """
+        return dict(
+            cls.objects.filter(
+                course_id=course_id, item_id=item_id
+            ).order_by().values('status').annotate(count=Count('id')).values_list('status', 'count')
+        )
+
+    @staticmethod
+    def info_cache_key(submission_uuid):
+        """
+        Return the cache key for the snapshot of a workflow's information
+        kept by `workflow_api.get_workflow_for_submission`.
+
+        Args:
+            submission_uuid (str): The UUID of the workflow's submission.
+
+        Returns:
+            unicode
+
+        """
+        return u"workflow.info.{}".format(submission_uuid)
+
+    @classmethod
+    def clear_cached_info(cls, *submission_uuids):
+        """
+        Discard the cached snapshots of the information for workflows,
+        so that they are evaluated again the next time they are requested.
+
+        Args:
+            submission_uuids (str): The UUIDs of the workflows' submissions.
+
+        """
+        cache.delete_many([cls.info_cache_key(submission_uuid) for submission_uuid in submission_uuids])
+
     @property
     def score(self):
         """Latest score for the submission we're tracking.
@@ -185,21 +489,15 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
         steps = self._get_steps()
         for step in steps:
             api = step.api()
-            if api is not None:
+            if api.is_configured:
                 # If an assessment module does not define these functions,
-                # default to True -- that is, automatically assume that the user has
-                # met the requirements.  This prevents students from getting "stuck"
-                # in the workflow in the event of a rollback that removes a step
-                # from the problem definition.
-                submitter_finished_func = getattr(api, 'submitter_is_finished', lambda submission_uuid, reqs: True)
-                assessment_finished_func = getattr(api, 'assessment_is_finished', lambda submission_uuid, reqs: True)
-
+                # the step API defaults to True (see `AssessmentStepApi`).
                 status_dict[step.name] = {
-                    "complete": submitter_finished_func(
+                    "complete": api.submitter_is_finished(
                         self.submission_uuid,
                         assessment_requirements.get(step.name, {})
                     ),
-                    "graded": assessment_finished_func(
+                    "graded": api.assessment_is_finished(
                         self.submission_uuid,
                         assessment_requirements.get(step.name, {})
                     ),
@@ -232,13 +530,13 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
             if assessment_step is not None:
 
                 # Check if the assessment API defines a score function at all
-                get_score_func = getattr(assessment_step.api(), 'get_score', None)
-                if get_score_func is not None:
+                api = assessment_step.api()
+                if api.provides_score:
                     if assessment_requirements is None:
                         requirements = None
                     else:
                         requirements = assessment_requirements.get(assessment_step_name, {})
-                    score = get_score_func(self.submission_uuid, requirements)
+                    score = api.get_score(self.submission_uuid, requirements)
                     break
 
         return score
@@ -301,9 +599,7 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
         # appropriate assessment API.
         new_step = step_for_name.get(new_status)
         if new_step is not None:
-            on_start_func = getattr(new_step.api(), 'on_start', None)
-            if on_start_func is not None:
-                on_start_func(self.submission_uuid)
+            new_step.api().on_start(self.submission_uuid)
 
         # If the submitter has done all they need to do, let's check to see if
         # all steps have been fully assessed (i.e. we can score it).
@@ -317,13 +613,194 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
                 new_status = self.STATUS.done
 
         # Finally save our changes if the status has changed
-        if self.status != new_status:
-            self.status = new_status
-            self.save()
+        if self.status != new_status and self._change_status(new_status):
             logger.info((
                 u"Workflow for submission UUID {uuid} has updated status to {status}"
             ).format(uuid=self.submission_uuid, status=new_status))
 
+    @classmethod
+    def update_workflows_for_item(cls, course_id, item_id, assessment_requirements):
+        """Update the status of every workflow for an item in a course.
+
+        This is the bulk equivalent of calling `update_from_assessments` for
+        each workflow, for use when requirements change or a deadline passes.
+        Workflows are processed in chunks; for each chunk, the assessment APIs
+        are asked which submissions are finished with a handful of grouped
+        queries, and the step and status changes are written with bulk updates.
+
+        Workflows that become ready to be scored are updated individually,
+        since setting a score goes through the submissions API.
+
+        Args:
+            course_id (unicode): The ID of the course.
+            item_id (unicode): The ID of the item in the course.
+            assessment_requirements (dict): Dictionary passed to the assessment APIs.
+                See `update_from_assessments` for details.
+
+        Returns:
+            int: The number of workflows whose status changed.
+
+        """
+        workflows = cls.objects.filter(
+            course_id=course_id, item_id=item_id
+        ).exclude(
+            status__in=[cls.STATUS.done, cls.STATUS.cancelled]
+        ).order_by('id')
+
+        num_changed = 0
+        last_id = 0
+        while True:
+            chunk = list(workflows.filter(id__gt=last_id)[:cls.BULK_UPDATE_CHUNK_SIZE])
+            if not chunk:
+                break
+            num_changed += cls._bulk_update_from_assessments(chunk, assessment_requirements)
+            last_id = chunk[-1].id
+        return num_changed
+
+    @classmethod
+    def update_workflows_for_submissions(cls, submission_uuids, assessment_requirements):
+        """Update the status of the workflows for a batch of submissions.
+
+        This is the bulk equivalent of calling `update_from_assessments` for
+        the workflow of each submission, for use when many submissions
+        are assessed at once (for example, by AI grading).
+
+        Args:
+            submission_uuids (list): The UUIDs of the submissions.
+            assessment_requirements (dict): Dictionary passed to the assessment APIs.
+                See `update_from_assessments` for details.
+
+        Returns:
+            int: The number of workflows whose status changed.
+
+        """
+        workflows = cls.objects.filter(
+            submission_uuid__in=submission_uuids
+        ).exclude(
+            status__in=[cls.STATUS.done, cls.STATUS.cancelled]
+        ).order_by('id')
+
+        # Workflows are updated together for each item
+        workflows_by_item = defaultdict(list)
+        for workflow in workflows:
+            workflows_by_item[(workflow.course_id, workflow.item_id)].append(workflow)
+
+        num_changed = 0
+        for item_workflows in workflows_by_item.itervalues():
+            for start in range(0, len(item_workflows), cls.BULK_UPDATE_CHUNK_SIZE):
+                num_changed += cls._bulk_update_from_assessments(
+                    item_workflows[start:start + cls.BULK_UPDATE_CHUNK_SIZE], assessment_requirements
+                )
+        return num_changed
+
+    @classmethod
+    def _bulk_update_from_assessments(cls, workflows, assessment_requirements):
+        """
+        Update a chunk of workflows from the assessment APIs.
+
+        Args:
+            workflows (list of AssessmentWorkflow): Workflows for a single item that are not done or cancelled.
+            assessment_requirements (dict): Dictionary passed to the assessment APIs.
+
+        Returns:
+            int: The number of workflows whose status changed.
+
+        """
+        steps_for_workflow = defaultdict(list)
+        steps_for_name = defaultdict(list)
+        for step in AssessmentWorkflowStep.objects.filter(workflow__in=workflows, name__in=cls.STEPS):
+            steps_for_workflow[step.workflow_id].append(step)
+            steps_for_name[step.name].append(step)
+
+        submission_uuids = {workflow.id: workflow.submission_uuid for workflow in workflows}
+        for steps in steps_for_name.itervalues():
+            AssessmentWorkflowStep.bulk_update(steps, submission_uuids, assessment_requirements)
+
+        # The status details of the workflows may have changed along with the steps
+        cls.clear_cached_info(*submission_uuids.values())
+
+        num_changed = 0
+        status_changes = defaultdict(list)
+        for workflow in workflows:
+            steps = steps_for_workflow.get(workflow.id)
+            new_status = next(
+                (step.name for step in steps or [] if step.submitter_completed_at is None),
+                cls.STATUS.waiting
+            )
+
+            # Workflows without steps need the default steps added, and workflows
+            # that are ready to be scored need their score set, so we
+            # let the workflow update itself.
+            if not steps or (new_status == cls.STATUS.waiting and
+                             all(step.assessment_completed_at for step in steps)):
+                old_status = workflow.status
+                workflow.update_from_assessments(assessment_requirements)
+                if workflow.status != old_status:
+                    num_changed += 1
+                continue
+
+            if new_status != workflow.status:
+                # Notify the assessment API that the submitter is beginning the next step
+                new_step = next((step for step in steps if step.name == new_status), None)
+                if new_step is not None:
+                    new_step.api().on_start(workflow.submission_uuid)
+                status_changes[(workflow.status, new_status)].append(workflow.id)
+
+        timestamp = now()
+        for (old_status, new_status), workflow_ids in status_changes.iteritems():
+            # Workflows that another process has updated in the meantime are
+            # skipped, and only the workflows we changed are counted.
+            with transaction.atomic():
+                num_updated = cls.objects.filter(id__in=workflow_ids, status=old_status).update(
+                    status=new_status, status_changed=timestamp, modified=timestamp
+                )
+                if num_updated > 0:
+                    AssessmentWorkflowStatusCount.record_change(
+                        workflows[0].course_id, workflows[0].item_id, old_status, new_status, num=num_updated
+                    )
+            num_changed += num_updated
+            logger.info((
+                u"Updated status from {old_status} to {status} for {count} workflows"
+            ).format(old_status=old_status, status=new_status, count=num_updated))
+        return num_changed
+
+    def _change_status(self, new_status):
+        """
+        Change the status of the workflow, unless another process has changed it
+        since we read it.
+
+        The status is only updated if it still has the value we read, and the
+        status counts are only moved if this update changed it, in the same
+        transaction.  So when the same workflow is updated concurrently, only
+        one of the updates records the change, and a failed update records nothing.
+
+        Args:
+            new_status (unicode): The new status of the workflow.
+
+        Returns:
+            bool: Whether this call changed the status.  If not, the workflow's
+            status is reloaded from the database.
+
+        Raises:
+            DatabaseError
+
+        """
+        timestamp = now()
+        with transaction.atomic():
+            changed = AssessmentWorkflow.objects.filter(pk=self.pk, status=self.status).update(
+                status=new_status, status_changed=timestamp, modified=timestamp
+            ) == 1
+            if changed:
+                AssessmentWorkflowStatusCount.record_change(self.course_id, self.item_id, self.status, new_status)
+
+        if changed:
+            self.status = new_status
+            self.status_changed = timestamp
+            self.modified = timestamp
+        else:
+            self.refresh_from_db(fields=['status', 'status_changed', 'modified'])
+        return changed
+
     def _get_steps(self):
         """
         Simple helper function for retrieving all the steps in the given
@@ -380,9 +857,7 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
 
         # Cancel the workflow for each step.
         for step in steps:
-            on_cancel_func = getattr(step.api(), 'on_cancel', None)
-            if on_cancel_func is not None:
-                on_cancel_func(self.submission_uuid)
+            step.api().on_cancel(self.submission_uuid)
 
         score = self.get_score(assessment_requirements, step_for_name)
 
@@ -392,9 +867,8 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
             self.set_score(score)
 
         # Save status if it is not cancelled.
-        if self.status != self.STATUS.cancelled:
-            self.status = self.STATUS.cancelled
-            self.save()
+        if self.status != self.STATUS.cancelled and self._change_status(self.STATUS.cancelled):
+            self.clear_cached_info(self.submission_uuid)
             logger.info(
                 u"Workflow for submission UUID {uuid} has updated status to {status}".format(
                     uuid=self.submission_uuid, status=self.STATUS.cancelled
@@ -476,6 +950,134 @@ class AssessmentWorkflow(TimeStampedModel, StatusModel):
         return self.cancellations.exists()
 
 
+class AssessmentWorkflowStatusCount(models.Model):
+    """Cached count of the workflows with a status, for an item in a course.
+
+    The staff area shows how many students are in each step of a problem.
+    Counting the workflows requires scanning every workflow for the problem,
+    so when the `ORA2_WORKFLOW_STATUS_COUNTERS` Django setting is enabled,
+    we keep running totals here instead, updated whenever a workflow changes
+    status.  An item's counts are computed from its workflows the first time
+    they are needed (for example, when the counters are enabled for a course
+    that already has workflows), and again if they turn out to be missing a
+    status.  Counts can drift if workflows are edited directly (for example,
+    in the Django admin), in which case they can be recomputed with `rebuild`.
+    """
+    course_id = models.CharField(max_length=255)
+    item_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("course_id", "item_id", "status")
+
+    @staticmethod
+    def is_enabled():
+        """
+        Check whether the counters are enabled.
+
+        We retrieve the setting in-line (rather than using a module-level
+        constant), so that @override_settings will work in the test suite.
+
+        Returns:
+            bool
+
+        """
+        return getattr(settings, 'ORA2_WORKFLOW_STATUS_COUNTERS', False)
+
+    @classmethod
+    def record_change(cls, course_id, item_id, old_status, new_status, num=1):
+        """
+        Move workflows from one status count to another.
+
+        Does nothing unless the counters are enabled.  The workflows must
+        already have their new status, since if the item has not been counted
+        yet, or its counts do not include the old status, the counts are
+        rebuilt from the workflows instead.
+
+        Args:
+            course_id (unicode): The course of the workflows.
+            item_id (unicode): The item of the workflows.
+            old_status (unicode): The previous status of the workflows, or None for new workflows.
+            new_status (unicode): The new status of the workflows.
+
+        Keyword Arguments:
+            num (int): The number of workflows that changed status.
+
+        Raises:
+            DatabaseError
+
+        """
+        if not cls.is_enabled():
+            return
+
+        counts = cls.objects.filter(course_id=course_id, item_id=item_id)
+        if not counts.exists():
+            cls._rebuild_missing(course_id, item_id)
+            return
+        if old_status is not None and not counts.filter(status=old_status).update(count=F('count') - num):
+            # The counts never included the workflows, so they are out of date
+            cls._rebuild_missing(course_id, item_id)
+            return
+        if not counts.filter(status=new_status).update(count=F('count') + num):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(course_id=course_id, item_id=item_id, status=new_status, count=num)
+            except IntegrityError:
+                # Someone else created the counter first, so add to theirs.
+                counts.filter(status=new_status).update(count=F('count') + num)
+
+    @classmethod
+    def counts_for_item(cls, course_id, item_id):
+        """
+        Retrieve the cached status counts for an item in a course,
+        counting its workflows if the item has not been counted yet.
+
+        Returns:
+            dict mapping statuses to counts
+
+        """
+        counts = dict(
+            cls.objects.filter(course_id=course_id, item_id=item_id).values_list('status', 'count')
+        )
+        if not counts:
+            counts = cls._rebuild_missing(course_id, item_id)
+        return counts
+
+    @classmethod
+    def _rebuild_missing(cls, course_id, item_id):
+        """
+        Compute the status counts for an item whose counts are missing or incomplete.
+
+        Returns:
+            dict mapping statuses to counts
+
+        """
+        try:
+            return cls.rebuild(course_id, item_id)
+        except IntegrityError:
+            # Another process is rebuilding the counts at the same time
+            return AssessmentWorkflow.count_statuses(course_id, item_id)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, course_id, item_id):
+        """
+        Recompute the status counts for an item in a course from its workflows.
+
+        Returns:
+            dict mapping statuses to counts
+
+        """
+        counts = AssessmentWorkflow.count_statuses(course_id, item_id)
+        cls.objects.filter(course_id=course_id, item_id=item_id).delete()
+        cls.objects.bulk_create([
+            cls(course_id=course_id, item_id=item_id, status=status, count=count)
+            for status, count in counts.iteritems()
+        ])
+        return counts
+
+
 class AssessmentWorkflowStep(models.Model):
     """An individual step in the overall workflow process.
 
@@ -504,33 +1106,17 @@ class AssessmentWorkflowStep(models.Model):
 
     def api(self):
         """
-        Returns an API associated with this workflow step. If no API is
-        associated with this workflow step, None is returned.
+        Returns the API associated with this workflow step.
+        See `get_step_api` for details.
+
+        Returns:
+            AssessmentStepApi
+
+        Raises:
+            AssessmentApiLoadError
 
-        This relies on Django settings to map step names to
-        the assessment API implementation.
         """
-        # We retrieve the settings in-line here (rather than using the
-        # top-level constant), so that @override_settings will work
-        # in the test suite.
-        api_path = getattr(
-            settings, 'ORA2_ASSESSMENTS', DEFAULT_ASSESSMENT_API_DICT
-        ).get(self.name)
-        if api_path is not None:
-            try:
-                return importlib.import_module(api_path)
-            except (ImportError, ValueError):
-                raise AssessmentApiLoadError(self.name, api_path)
-        else:
-            # It's possible for the database to contain steps for APIs
-            # that are not configured -- for example, if a new assessment
-            # type is added, then the code is rolled back.
-            msg = (
-                u"No assessment configured for '{name}'.  "
-                u"Check the ORA2_ASSESSMENTS Django setting."
-            ).format(name=self.name)
-            logger.warning(msg)
-            return None
+        return get_step_api(self.name)
 
     def update(self, submission_uuid, assessment_requirements):
         """
@@ -547,23 +1133,62 @@ class AssessmentWorkflowStep(models.Model):
         else:
             step_reqs = assessment_requirements.get(self.name, {})
 
-        default_finished = lambda submission_uuid, step_reqs: True
-        submitter_finished = getattr(self.api(), 'submitter_is_finished', default_finished)
-        assessment_finished = getattr(self.api(), 'assessment_is_finished', default_finished)
+        api = self.api()
 
         # Has the user completed their obligations for this step?
-        if (not self.is_submitter_complete() and submitter_finished(submission_uuid, step_reqs)):
+        if (not self.is_submitter_complete() and api.submitter_is_finished(submission_uuid, step_reqs)):
             self.submitter_completed_at = now()
             step_changed = True
 
         # Has the step received a score?
-        if (not self.is_assessment_complete() and assessment_finished(submission_uuid, step_reqs)):
+        if (not self.is_assessment_complete() and api.assessment_is_finished(submission_uuid, step_reqs)):
             self.assessment_completed_at = now()
             step_changed = True
 
         if step_changed:
             self.save()
 
+    @classmethod
+    def bulk_update(cls, steps, submission_uuids, assessment_requirements):
+        """
+        Update many AssessmentWorkflowStep models with the same name at once.
+
+        This is the bulk equivalent of `update()`.  The step's assessment API
+        checks all the submissions at once if it can (see `AssessmentStepApi`),
+        and completed steps are saved with one UPDATE for each kind of completion.
+
+        Args:
+            steps (list of AssessmentWorkflowStep): Steps that all have the same name.
+            submission_uuids (dict): Map of workflow IDs to the submission UUIDs of the steps.
+            assessment_requirements (dict): Dictionary passed to the assessment API.
+
+        """
+        if not steps:
+            return
+
+        name = steps[0].name
+        if assessment_requirements is None:
+            step_reqs = None
+        else:
+            step_reqs = assessment_requirements.get(name, {})
+
+        api = steps[0].api()
+        timestamp = now()
+        for completed_field, finished_func in [
+            ('submitter_completed_at', api.submitters_are_finished),
+            ('assessment_completed_at', api.assessments_are_finished),
+        ]:
+            pending = [step for step in steps if getattr(step, completed_field) is None]
+            if not pending:
+                continue
+
+            finished = finished_func([submission_uuids[step.workflow_id] for step in pending], step_reqs)
+            completed = [step for step in pending if submission_uuids[step.workflow_id] in finished]
+            for step in completed:
+                setattr(step, completed_field, timestamp)
+            if completed:
+                cls.objects.filter(id__in=[step.id for step in completed]).update(**{completed_field: timestamp})
+
 
 @receiver(assessment_complete_signal)
 def update_workflow_async(sender, **kwargs):
@@ -605,6 +1230,70 @@ def update_workflow_async(sender, **kwargs):
             u"for submission UUID {}"
         ).format(submission_uuid)
         logger.exception(msg)
+    finally:
+        AssessmentWorkflow.clear_cached_info(submission_uuid)
+
+
+@receiver(assessments_complete_signal)
+def update_workflows_async(sender, **kwargs):
+    """
+    Register a receiver for the signal that a batch of assessments has completed.
+    This allows asynchronous processes to update many workflows at once.
+
+    Args:
+        sender (object): Not used
+
+    Keyword Arguments:
+        submission_uuids (list): The UUIDs of the submissions associated
+            with the workflows being updated.
+
+    Returns:
+        None
+
+    """
+    submission_uuids = kwargs.get('submission_uuids')
+    if not submission_uuids:
+        return
+
+    try:
+        AssessmentWorkflow.update_workflows_for_submissions(submission_uuids, None)
+    except DatabaseError:
+        msg = (
+            u"Database error occurred while updating "
+            u"the workflows for submission UUIDs {}"
+        ).format(submission_uuids)
+        logger.exception(msg)
+    except:
+        msg = (
+            u"Unexpected error occurred while updating the workflows "
+            u"for submission UUIDs {}"
+        ).format(submission_uuids)
+        logger.exception(msg)
+    finally:
+        AssessmentWorkflow.clear_cached_info(*submission_uuids)
+
+
+@receiver(assessment_created_signal)
+def clear_cached_workflow_info(sender, **kwargs):
+    """
+    Discard the cached information for the workflows affected by a new assessment.
+
+    Args:
+        sender (object): Not used
+
+    Keyword Arguments:
+        submission_uuid (str): The UUID of the submission that was assessed.
+        scorer_submission_uuid (str): The UUID of the scorer's submission.
+
+    Returns:
+        None
+
+    """
+    submission_uuids = set(
+        kwargs.get(arg) for arg in ['submission_uuid', 'scorer_submission_uuid']
+    )
+    submission_uuids.discard(None)
+    AssessmentWorkflow.clear_cached_info(*submission_uuids)
 
 
 class AssessmentWorkflowCancellation(models.Model):
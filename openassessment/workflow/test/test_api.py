@@ -1,5 +1,5 @@
-from django.db import DatabaseError
-from django.test.utils import override_settings
+from django.db import connection, DatabaseError
+from django.test.utils import CaptureQueriesContext, override_settings
 import ddt
 from mock import patch
 from nose.tools import raises
@@ -12,10 +12,11 @@ import openassessment.workflow.api as workflow_api
 from openassessment.assessment.api import ai as ai_api
 from openassessment.assessment.errors import AIError
 from openassessment.assessment.models import StudentTrainingWorkflow
+from openassessment.assessment.signals import assessment_complete_signal
 import submissions.api as sub_api
 from openassessment.assessment.api import peer as peer_api
 from openassessment.assessment.api import self as self_api
-from openassessment.workflow.models import AssessmentWorkflow
+from openassessment.workflow.models import AssessmentWorkflow, AssessmentWorkflowStatusCount
 from openassessment.workflow.errors import AssessmentWorkflowInternalError
 
 
@@ -95,6 +96,41 @@ class TestAssessmentWorkflowApi(CacheResetTest):
             peer_workflows = list(PeerWorkflow.objects.filter(submission_uuid=submission["uuid"]))
             self.assertFalse(peer_workflows)
 
+    def test_workflow_info_cached(self):
+        requirements = {"peer": {"must_grade": 1, "must_be_graded_by": 1}}
+        workflow, submission = self._create_workflow_with_status("user 1", "test/1/1", "peer-problem", "peer")
+        first = workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+
+        # The second request uses the cached snapshot
+        with self.assertNumQueries(0):
+            second = workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+        self.assertEqual(first, second)
+
+        # Different requirements are evaluated again
+        with patch.object(AssessmentWorkflow, 'update_from_assessments') as mock_update:
+            workflow_api.get_workflow_for_submission(submission['uuid'], {"peer": {"must_grade": 2, "must_be_graded_by": 1}})
+        self.assertTrue(mock_update.called)
+
+    def test_workflow_info_cache_cleared(self):
+        requirements = {"peer": {"must_grade": 1, "must_be_graded_by": 1}}
+        workflow, submission = self._create_workflow_with_status("user 1", "test/1/1", "peer-problem", "self")
+        workflow = workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+        self.assertFalse(workflow['status_details']['self']['complete'])
+
+        # Creating an assessment discards the cached workflow
+        self_api.create_assessment(submission['uuid'], "user 1", {"secret": "yes"}, {}, "", RUBRIC_DICT)
+        workflow = workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+        self.assertTrue(workflow['status_details']['self']['complete'])
+
+        # So does completing an assessment asynchronously
+        workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+        assessment_complete_signal.send(sender=None, submission_uuid=submission['uuid'])
+        with patch.object(AssessmentWorkflow, 'update_from_assessments') as mock_update:
+            workflow_api.get_workflow_for_submission(submission['uuid'], requirements)
+        self.assertTrue(mock_update.called)
+
+    # The assessment modules are patched between calls, so the workflow must not be cached
+    @override_settings(ORA2_WORKFLOW_INFO_CACHE_TIMEOUT=0)
     def test_assessment_module_rollback_update_workflow(self):
         """
         Test that updates work when assessment modules roll back
@@ -349,6 +385,174 @@ class TestAssessmentWorkflowApi(CacheResetTest):
         )
         self.assertEqual(counts, updated_counts)
 
+    def test_get_status_counts_num_queries(self):
+        self._create_workflow_with_status("user 1", "test/1/1", "peer-problem", "peer")
+        self._create_workflow_with_status("user 2", "test/1/1", "peer-problem", "done")
+        with self.assertNumQueries(1):
+            workflow_api.get_status_counts("test/1/1", "peer-problem", ["peer", "self"])
+
+    @override_settings(ORA2_WORKFLOW_STATUS_COUNTERS=True)
+    def test_status_counters(self):
+        requirements = {"peer": {"must_grade": 0, "must_be_graded_by": 1}}
+        submissions = []
+        for num in range(4):
+            submission = sub_api.create_submission({
+                "student_id": "user {}".format(num),
+                "course_id": "test/1/1",
+                "item_id": "peer-problem",
+                "item_type": "openassessment",
+            }, "answer")
+            workflow_api.create_workflow(submission['uuid'], ["peer", "self"])
+            submissions.append(submission)
+
+        # Change statuses individually, in bulk, and by cancelling
+        workflow_api.update_from_assessments(submissions[0]['uuid'], requirements)
+        self_api.create_assessment(submissions[0]['uuid'], "user 0", {"secret": "yes"}, {}, "", RUBRIC_DICT)
+        workflow_api.update_from_assessments(submissions[0]['uuid'], requirements)
+        workflow_api.cancel_workflow(submissions[1]['uuid'], "Cancelled", "staff", requirements)
+        workflow_api.update_workflows_for_item("test/1/1", "peer-problem", requirements)
+
+        # The counters can be read without counting the workflows
+        with self.assertNumQueries(1):
+            counts = workflow_api.get_status_counts("test/1/1", "peer-problem", ["peer", "self"])
+        self.assertEqual(counts, [
+            {"status": "peer", "count": 0},
+            {"status": "self", "count": 2},
+            {"status": "waiting", "count": 1},
+            {"status": "done", "count": 0},
+            {"status": "cancelled", "count": 1},
+        ])
+
+        # They agree with the workflows
+        counters = AssessmentWorkflowStatusCount.counts_for_item("test/1/1", "peer-problem")
+        self.assertEqual(
+            {status: count for status, count in counters.iteritems() if count},
+            AssessmentWorkflow.count_statuses("test/1/1", "peer-problem")
+        )
+
+    @override_settings(ORA2_WORKFLOW_STATUS_COUNTERS=True)
+    def test_status_counters_concurrent_updates(self):
+        requirements = {"peer": {"must_grade": 0, "must_be_graded_by": 1}}
+        submission = sub_api.create_submission({
+            "student_id": "user",
+            "course_id": "test/1/1",
+            "item_id": "peer-problem",
+            "item_type": "openassessment",
+        }, "answer")
+        workflow_api.create_workflow(submission['uuid'], ["peer", "self"])
+
+        # Two processes load the workflow, then both move it from peer to self
+        first = AssessmentWorkflow.objects.get(submission_uuid=submission['uuid'])
+        second = AssessmentWorkflow.objects.get(submission_uuid=submission['uuid'])
+        first.update_from_assessments(requirements)
+        second.update_from_assessments(requirements)
+        self.assertEqual(second.status, "self")
+
+        # The change is only counted once
+        counters = AssessmentWorkflowStatusCount.counts_for_item("test/1/1", "peer-problem")
+        self.assertEqual(counters, {"peer": 0, "self": 1})
+
+    def test_status_counters_enabled_later(self):
+        # Workflows are created before the counters are enabled
+        self._create_workflow_with_status("user 1", "test/1/1", "peer-problem", "peer")
+        self._create_workflow_with_status("user 2", "test/1/1", "peer-problem", "peer")
+        self._create_workflow_with_status("user 3", "test/1/1", "peer-problem", "done")
+        self._create_workflow_with_status("user 4", "test/1/1", "other problem", "self")
+
+        with override_settings(ORA2_WORKFLOW_STATUS_COUNTERS=True):
+            # Reading the counts for an item counts its workflows
+            counts = workflow_api.get_status_counts("test/1/1", "peer-problem", ["peer", "self"])
+            self.assertEqual(
+                {count['status']: count['count'] for count in counts if count['count']},
+                {"peer": 2, "done": 1}
+            )
+            with self.assertNumQueries(1):
+                workflow_api.get_status_counts("test/1/1", "peer-problem", ["peer", "self"])
+
+            # A change to an item that has not been counted counts its workflows
+            submission = sub_api.create_submission({
+                "student_id": "user 5",
+                "course_id": "test/1/1",
+                "item_id": "other problem",
+                "item_type": "openassessment",
+            }, "answer")
+            workflow = workflow_api.create_workflow(submission['uuid'], ["peer", "self"], ON_INIT_PARAMS)
+            self.assertEqual(
+                AssessmentWorkflowStatusCount.counts_for_item("test/1/1", "other problem"),
+                {"self": 1, "peer": 1}
+            )
+
+            # Counts that are missing the old status are rebuilt
+            AssessmentWorkflowStatusCount.objects.filter(item_id="other problem", status="peer").delete()
+            AssessmentWorkflow.objects.filter(uuid=workflow['uuid']).update(status="done")
+            AssessmentWorkflowStatusCount.record_change("test/1/1", "other problem", "peer", "done")
+            self.assertEqual(
+                AssessmentWorkflowStatusCount.counts_for_item("test/1/1", "other problem"),
+                {"self": 1, "done": 1}
+            )
+
+    def test_update_workflows_for_item(self):
+        requirements = {
+            "peer": {
+                "must_grade": 1,
+                "must_be_graded_by": 1
+            }
+        }
+        submissions = {}
+        for student_id in ["alice", "bob", "carol"]:
+            workflow, submission = self._create_workflow_with_status(student_id, "test/1/1", "peer-problem", "peer")
+            submissions[student_id] = submission
+
+        # A workflow for another item is not updated
+        __, other_submission = self._create_workflow_with_status("alice", "test/1/1", "other problem", "peer")
+
+        # Alice and Bob assess each other, and Alice assesses herself
+        for scorer, author in [("alice", "bob"), ("bob", "alice")]:
+            peer_sub = peer_api.get_submission_to_assess(submissions[scorer]['uuid'], 1)
+            self.assertEqual(peer_sub['uuid'], submissions[author]['uuid'])
+            peer_api.create_assessment(
+                submissions[scorer]['uuid'], scorer, {"secret": "yes"}, {}, "", RUBRIC_DICT, 1
+            )
+        self_api.create_assessment(
+            submissions["alice"]['uuid'], "alice", {"secret": "yes"}, {}, "", RUBRIC_DICT
+        )
+
+        num_changed = workflow_api.update_workflows_for_item("test/1/1", "peer-problem", requirements)
+        self.assertEqual(num_changed, 2)
+
+        statuses = {
+            student_id: AssessmentWorkflow.objects.get(submission_uuid=submission['uuid']).status
+            for student_id, submission in submissions.iteritems()
+        }
+        self.assertEqual(statuses, {"alice": "done", "bob": "self", "carol": "peer"})
+        self.assertEqual(sub_api.get_latest_score_for_submission(submissions["alice"]['uuid'])['points_earned'], 1)
+        self.assertEqual(AssessmentWorkflow.objects.get(submission_uuid=other_submission['uuid']).status, "peer")
+
+        # Updating each workflow individually agrees with the bulk update
+        for student_id, submission in submissions.iteritems():
+            workflow = workflow_api.update_from_assessments(submission['uuid'], requirements)
+            self.assertEqual(workflow['status'], statuses[student_id])
+
+    def test_update_workflows_for_item_num_queries(self):
+        requirements = {"peer": {"must_grade": 1, "must_be_graded_by": 1}}
+        for num in range(2):
+            self._create_workflow_with_status("user {}".format(num), "test/1/1", "peer-problem", "peer")
+        with CaptureQueriesContext(connection) as few_workflows:
+            workflow_api.update_workflows_for_item("test/1/1", "peer-problem", requirements)
+
+        for num in range(2, 6):
+            self._create_workflow_with_status("user {}".format(num), "test/1/1", "peer-problem", "peer")
+        with CaptureQueriesContext(connection) as many_workflows:
+            workflow_api.update_workflows_for_item("test/1/1", "peer-problem", requirements)
+
+        self.assertEqual(len(few_workflows), len(many_workflows))
+
+    @patch.object(AssessmentWorkflow.objects, 'filter')
+    @raises(workflow_api.AssessmentWorkflowInternalError)
+    def test_update_workflows_for_item_database_error(self, mock_filter):
+        mock_filter.side_effect = DatabaseError("Kaboom!")
+        workflow_api.update_workflows_for_item("test/1/1", "peer-problem", {})
+
     @override_settings(ORA2_ASSESSMENTS={'self': 'not.a.module'})
     def test_unable_to_load_api(self):
         submission = sub_api.create_submission({